@@ -0,0 +1,133 @@
+#! python3
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import atexit
+import os
+import threading
+import time
+
+# saves of a config file requested within this period (seconds) are merged into one write
+CONFIG_SAVE_DELAY = 0.5
+
+
+# Write-behind worker shared by the whole server process.
+# File writes are queued here instead of being done on the request thread.
+# Pending writes are keyed (normally by the target filename), so scheduling
+# the same key again before it runs replaces the queued write.
+class BackgroundWriter:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending = {}  # key => (due time, callable)
+        self.thread = None
+
+    # schedule func() to be called in the worker thread after delay seconds
+    def schedule(self, key, func, delay=0.0):
+        with self.cond:
+            self.pending[key] = (time.monotonic() + delay, func)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="BackgroundWriter")
+                self.thread.daemon = True
+                self.thread.start()
+            self.cond.notify()
+
+    def isPending(self, key):
+        with self.cond:
+            return key in self.pending
+
+    # run all queued writes right now in the calling thread
+    def flush(self):
+        with self.cond:
+            pending = sorted(self.pending.values(), key=lambda item: item[0])
+            self.pending.clear()
+        for due, func in pending:
+            self.runTask(func)
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                key, (due, func) = min(self.pending.items(), key=lambda item: item[1][0])
+                timeout = due - time.monotonic()
+                if timeout > 0:
+                    self.cond.wait(timeout)
+                    continue
+                del self.pending[key]
+            self.runTask(func)
+
+    def runTask(self, func):
+        try:
+            func()
+        except Exception:
+            pass # FIXME: handle I/O errors?
+
+
+# replace filename with data atomically (write a temp file and rename it)
+# so readers never see a partially written file
+def writeFileAtomic(filename, data, encoding="utf-8"):
+    tempFile = filename + ".tmp"
+    with open(tempFile, "w", encoding=encoding) as f:
+        f.write(data)
+    os.replace(tempFile, filename)
+
+
+def getMtime(filename):
+    try:
+        return os.path.getmtime(filename)
+    except OSError:
+        return None
+
+
+# Delayed, atomic saving of a config file that the config tools also write.
+# The settings are written CONFIG_SAVE_DELAY seconds later, and saving again
+# before that only writes the latest settings once. save() records the mtime
+# of the file it is going to replace; if another process changes the file
+# before the write runs, the write is dropped so the newer file gets loaded.
+class ConfigFileWriter:
+    def __init__(self, delay=CONFIG_SAVE_DELAY):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.pending = False
+        self.expectedTime = None  # mtime of the file when the pending save was requested
+        self.savedTime = None  # mtime of the file last written by us
+
+    def save(self, filename, data):
+        with self.lock:
+            if not self.pending:
+                self.expectedTime = getMtime(filename)
+                self.pending = True
+        backgroundWriter.schedule(filename, lambda: self.write(filename, data), self.delay)
+
+    def write(self, filename, data):
+        with self.lock:
+            self.pending = False
+            configTime = getMtime(filename)
+            if not (configTime == self.expectedTime or (configTime is not None and configTime == self.savedTime)):
+                return  # changed by someone else, keep the newer file
+            writeFileAtomic(filename, data)
+            self.savedTime = getMtime(filename)
+
+    # the file with this mtime was written by ourselves, no need to reload it
+    def isSavedByUs(self, configTime):
+        with self.lock:
+            return configTime is not None and configTime == self.savedTime
+
+
+backgroundWriter = BackgroundWriter()
+
+# the worker is a daemon thread, so write out anything still queued on exit
+atexit.register(backgroundWriter.flush)
+
+__all__ = ["BackgroundWriter", "ConfigFileWriter", "backgroundWriter", "writeFileAtomic"]
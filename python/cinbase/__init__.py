@@ -35,12 +35,20 @@ from .dsymbols import dsymbols
 from .fsymbols import fsymbols
 from .msymbols import msymbols
 from .flangs import flangs
-from .phrase import phrase
+from .phrasestore import phrasestore
+from .phraserank import PhraseRanker
+from .phraseview import PhraseViews
+from .candpages import CandidatePages
+from .compbuffer import CompositionBuffer
+from .candfreq import CandFrequencies
+from .datacache import DataCache
 from .userphrase import userphrase
-from .emoji import emoji
+from .emoji import emoji, EMOJI_TYPES
 from .extendtable import extendtable
 
 from .debug import Debug
+from .keycontext import KeyContext
+from .keystats import KeyStatsRegistry, NullKeyStats, LOG_INTERVAL
 
 CHINESE_MODE = 1
 ENGLISH_MODE = 0
@@ -108,6 +116,14 @@ class CinBase:
         cbTS.easySymbolsWithShift = False
         cbTS.showPhrase = False
         cbTS.sortByPhrase = False
+        cbTS.learnCandFrequency = False
+        cbTS.candFrequency = None
+        cbTS.phraseRanker = PhraseRanker()
+        cbTS.configOverrides = {}
+        cbTS.configSnapshot = None
+        cbTS.configGeneration = -1
+        cbTS.keyStats = NullKeyStats
+        cbTS.keyContext = None # filterKeyDown 算好的按鍵資訊，給 onKeyDown 沿用
         cbTS.compositionBufferMode = False
         cbTS.autoMoveCursorInBrackets = False
         cbTS.imeReverseLookup = False
@@ -122,6 +138,7 @@ class CinBase:
         cbTS.lastKeyDownTime = 0.0
 
         cbTS.menucandidates = []
+        cbTS.menupages = None
         cbTS.smenucandidates = []
         cbTS.wildcardcandidates = []
         cbTS.wildcardpagecandidates = []
@@ -135,7 +152,7 @@ class CinBase:
         cbTS.compositionBufferString = ""
         cbTS.compositionBufferCursor = 0
         cbTS.compositionBufferType = "default"
-        cbTS.compositionBufferChar = {}
+        cbTS.compositionBuffer = CompositionBuffer() # 組字區文字及每個字元的字根資訊
         cbTS.compositionBufferMenuItem = ""
         cbTS.tempengcandidates = []
         cbTS.keyUsedState = False
@@ -182,6 +199,7 @@ class CinBase:
         cbTS.homophoneStr = ""
         cbTS.isHomophoneChardefs = False
         cbTS.homophonecandidates = []
+        cbTS.homophonepagecandidates = []
 
         cbTS.showMessageOnKeyUp = False
         cbTS.hideMessageOnKeyUp = False
@@ -204,7 +222,7 @@ class CinBase:
 
         if DEBUG_MODE:
             cbTS.debug = Debug(cbTS.imeDirName)
-            cbTS.debugLog = cbTS.debug.loadDebugLog()
+            cbTS.keyStats = KeyStatsRegistry.getStats(cbTS.imeDirName)
 
 
     # 輸入法被使用者啟用
@@ -295,17 +313,21 @@ class CinBase:
     # return False，表示我們不需要這個鍵，系統會原封不動把按鍵傳給應用程式
     def filterKeyDown(self, cbTS, keyEvent, CinTable, RCinTable, HCinTable):
         charCode = keyEvent.charCode
-        charStr = chr(charCode)
-        charStrLow = charStr.lower()
 
         # 紀錄最後一次按下的鍵和按下的時間，在 filterKeyUp() 中要用
         cbTS.lastKeyDownCode = keyEvent.keyCode
         if cbTS.lastKeyDownTime == 0.0:
             cbTS.lastKeyDownTime = time.time()
 
+        # 碼表載入中，cbTS.cin 可能還沒設定，先接收按鍵但不處理
         if CinTable.loading:
             return True
 
+        keyContext = KeyContext(cbTS, keyEvent)
+        cbTS.keyContext = keyContext
+        charStr = keyContext.charStr
+        charStrLow = keyContext.charStrLow
+
         # 使用者開始輸入，還沒送出前的編輯區內容稱 composition string
         # isComposing() 是 False，表示目前編輯區是空的
         # 若正在編輯中文，則任何按鍵我們都需要送給輸入法處理，直接 return True
@@ -320,13 +342,13 @@ class CinBase:
         # --------------   以下都是「沒有」正在輸入中文的狀況   --------------
 
         # 如果按下 Alt，可能是應用程式熱鍵，輸入法不做處理
-        if keyEvent.isKeyDown(VK_MENU):
+        if keyContext.isAltDown:
             if cbTS.isShowMessage:
                 cbTS.hideMessageOnKeyUp = True
             return False
 
         # 如果按下 Ctrl 鍵
-        if keyEvent.isKeyDown(VK_CONTROL):
+        if keyContext.isCtrlDown:
             # 若按下的是指定的符號鍵，輸入法需要處理此按鍵
             if self.isCtrlSymbolsChar(keyEvent.keyCode) and cbTS.langMode == CHINESE_MODE:
                 return True
@@ -336,8 +358,8 @@ class CinBase:
                 return False
 
         # 若按下 Shift 鍵
-        if keyEvent.isKeyDown(VK_SHIFT):
-            if cbTS.langMode == CHINESE_MODE and not keyEvent.isKeyDown(VK_CONTROL):
+        if keyContext.isShiftDown:
+            if cbTS.langMode == CHINESE_MODE and not keyContext.isCtrlDown:
                 # 若開啟 Shift 快速輸入符號，輸入法需要處理此按鍵
                 if cbTS.easySymbolsWithShift and self.isLetterChar(keyEvent.keyCode):
                     return True
@@ -351,7 +373,7 @@ class CinBase:
                     return False
 
         # 不論中英文模式，NumPad 都允許直接輸入數字，輸入法不處理
-        if keyEvent.isKeyToggled(VK_NUMLOCK): # NumLock is on
+        if keyContext.isNumLockOn: # NumLock is on
             # if this key is Num pad 0-9, +, -, *, /, pass it back to the system
             if keyEvent.keyCode >= VK_NUMPAD0 and keyEvent.keyCode <= VK_DIVIDE:
                 if cbTS.isShowMessage:
@@ -360,10 +382,10 @@ class CinBase:
 
         # 不管中英文模式，只要是全形可見字元或空白，輸入法都需要進一步處理(半形轉為全形)
         if cbTS.shapeMode == FULLSHAPE_MODE:
-            if keyEvent.isPrintableChar() or keyEvent.keyCode == VK_SPACE:
+            if keyContext.isPrintable or keyEvent.keyCode == VK_SPACE:
                 return True
             else:
-                if cbTS.isShowMessage and not keyEvent.isKeyDown(VK_SHIFT):
+                if cbTS.isShowMessage and not keyContext.isShiftDown:
                     cbTS.hideMessageOnKeyUp = True
                 return False
 
@@ -372,7 +394,7 @@ class CinBase:
 
         # 如果是英文半形模式，輸入法不做任何處理
         if cbTS.langMode == ENGLISH_MODE:
-            if cbTS.isShowMessage and not keyEvent.isKeyDown(VK_SHIFT):
+            if cbTS.isShowMessage and not keyContext.isShiftDown:
                 cbTS.hideMessageOnKeyUp = True
             return False
 
@@ -384,13 +406,13 @@ class CinBase:
 
         # 中文模式下，當中文編輯區是空的，輸入法只需處理倉頡字根
         # 檢查按下的鍵是否為倉頡字根
-        if cbTS.cin.isInKeyName(chr(keyEvent.charCode).lower()):
+        if keyContext.isInKeyName:
             return True
 
         # 中文模式下，當中文編輯區是空的，且不是預設鍵盤,輸入法需處理其它鍵盤所定義的字根
         # 檢查按下的鍵是否為其它鍵盤定義的字根
         if not cbTS.keyboardLayout == 0:
-            if chr(keyEvent.charCode).lower() in cbTS.kbtypelist[cbTS.keyboardLayout]:
+            if keyContext.layoutCharStr is not None:
                 return True
 
         # 中文模式下，若按下 ` 鍵，讓輸入法進行處理
@@ -407,15 +429,38 @@ class CinBase:
                     return True
 
         # 其餘狀況一律不處理，原按鍵輸入直接送還給應用程式
-        if cbTS.isShowMessage and not keyEvent.isKeyDown(VK_SHIFT):
+        if cbTS.isShowMessage and not keyContext.isShiftDown:
             cbTS.hideMessageOnKeyUp = True
         return False
 
     def onKeyDown(self, cbTS, keyEvent, CinTable, RCinTable, HCinTable):
+        keyStats = cbTS.keyStats
+        if not keyStats.enabled:
+            return self.processKeyDown(cbTS, keyEvent, CinTable, RCinTable, HCinTable)
+
+        start = keyStats.begin()
+        KeyState = self.processKeyDown(cbTS, keyEvent, CinTable, RCinTable, HCinTable)
+        keyStats.end("onKeyDown", start)
+        if keyStats.getCount("onKeyDown") % LOG_INTERVAL == 0:
+            cbTS.debug.log("K", keyStats.getSummary())
+        return KeyState
+
+
+    # 取得這次按鍵的 KeyContext，若 filterKeyDown 已經算過同一個按鍵就直接沿用
+    def getKeyContext(self, cbTS, keyEvent):
+        keyContext = cbTS.keyContext
+        cbTS.keyContext = None
+        if keyContext is not None and keyContext.matches(cbTS, keyEvent):
+            cbTS.keyStats.count("keyContextHit")
+            return keyContext
+        cbTS.keyStats.count("keyContextMiss")
+        return KeyContext(cbTS, keyEvent)
+
+
+    # onKeyDown 的實際處理
+    def processKeyDown(self, cbTS, keyEvent, CinTable, RCinTable, HCinTable):
         charCode = keyEvent.charCode
         keyCode = keyEvent.keyCode
-        charStr = chr(charCode)
-        charStrLow = charStr.lower()
 
         if CinTable.loading:
             if not cbTS.client.isUiLess:
@@ -424,8 +469,13 @@ class CinBase:
                 cbTS.showMessage(messagestr, cbTS.messageDurationTime)
             return True
 
+        keyContext = self.getKeyContext(cbTS, keyEvent)
+        charStr = keyContext.charStr
+        charStrLow = keyContext.charStrLow
+        isInKeyName = keyContext.isInKeyName
+
         # NumPad 某些狀況允許輸入法處理
-        if keyEvent.isKeyToggled(VK_NUMLOCK): # NumLock is on
+        if keyContext.isNumLockOn: # NumLock is on
             # if this key is Num pad 0-9, +, -, *, /, pass it back to the system
             if keyEvent.keyCode >= VK_NUMPAD0 and keyEvent.keyCode <= VK_DIVIDE:
                 if not cbTS.compositionBufferMode or cbTS.showCandidates:
@@ -433,7 +483,7 @@ class CinBase:
 
         if cbTS.compositionBufferMode and not cbTS.isComposing():
             cbTS.compositionBufferType = "default"
-            cbTS.compositionBufferChar = {}
+            cbTS.compositionBuffer.clearInfo()
 
         if cbTS.langMode == ENGLISH_MODE:
             if cbTS.isComposing() or cbTS.showCandidates:
@@ -442,7 +492,7 @@ class CinBase:
             cbTS.tempEnglishMode = False
 
         if cbTS.tempEnglishMode:
-            if not cbTS.showCandidates and keyEvent.isPrintableChar() and not keyEvent.isKeyDown(VK_CONTROL):
+            if not cbTS.showCandidates and keyContext.isPrintable and not keyContext.isCtrlDown:
                 if cbTS.shapeMode == HALFSHAPE_MODE:
                     cbTS.compositionBufferType = "english"
                     self.setCompositionBufferString(cbTS, charStr, 0)
@@ -456,11 +506,11 @@ class CinBase:
                 self.setCompositionBufferChar(cbTS, cbTS.compositionBufferType, charStr, cbTS.compositionBufferCursor)
 
         # 鍵盤對映 (注音)
-        if not cbTS.keyboardLayout == 0 and charStr.lower() in cbTS.kbtypelist[cbTS.keyboardLayout] and not cbTS.tempEnglishMode:
-            if not keyEvent.isKeyDown(VK_SHIFT) and not keyEvent.isKeyDown(VK_CONTROL):
-                charIndex = cbTS.kbtypelist[cbTS.keyboardLayout].index(charStr.lower())
-                charStr = cbTS.kbtypelist[0][charIndex]
+        if keyContext.layoutCharStr is not None and not cbTS.tempEnglishMode:
+            if not keyContext.isShiftDown and not keyContext.isCtrlDown:
+                charStr = keyContext.layoutCharStr
                 charStrLow = charStr.lower()
+                isInKeyName = keyContext.layoutIsInKeyName
 
         # 檢查選字鍵
         if not cbTS.imeDirName == "chedayi":
@@ -471,7 +521,7 @@ class CinBase:
                 cbTS.isSelKeysChanged = True
 
         if cbTS.autoMoveCursorInBrackets:
-            if cbTS.compositionBufferMode and keyEvent.isPrintableChar() and not keyEvent.isKeyDown(VK_SPACE):
+            if cbTS.compositionBufferMode and keyContext.isPrintable and not keyEvent.isKeyDown(VK_SPACE):
                 if len(cbTS.compositionBufferString) >= 2 and cbTS.compositionBufferCursor >= 2:
                     self.moveCursorInBrackets(cbTS)
 
@@ -637,8 +687,8 @@ class CinBase:
         if cbTS.multifunctionmode and not cbTS.menusymbolsmode and cbTS.directCommitSymbol:
             if cbTS.msymbols.isInCharDef(cbTS.compositionChar[1:]):
                 cbTS.menusymbolsmode = True
-        elif cbTS.multifunctionmode and cbTS.menusymbolsmode and cbTS.directCommitSymbol and keyEvent.isPrintableChar():
-            if not cbTS.msymbols.isInCharDef(cbTS.compositionChar[1:] + charStr) and cbTS.cin.isInKeyName(charStrLow):
+        elif cbTS.multifunctionmode and cbTS.menusymbolsmode and cbTS.directCommitSymbol and keyContext.isPrintable:
+            if not cbTS.msymbols.isInCharDef(cbTS.compositionChar[1:] + charStr) and isInKeyName:
                 if not cbTS.compositionBufferMode:
                     cbTS.setCommitString(cbTS.compositionString)
                     self.resetComposition(cbTS)
@@ -732,11 +782,11 @@ class CinBase:
                 candidates = cbTS.menucandidates
                 candCursor = cbTS.candidateCursor  # 目前的游標位置
                 candCount = len(cbTS.candidateList)  # 目前選字清單項目數
-                currentCandPageCount = math.ceil(len(candidates) / cbTS.candPerPage) # 目前的選字清單總頁數
                 currentCandPage = cbTS.currentCandPage # 目前的選字清單頁數
 
                 # 候選清單分頁
-                pagecandidates = list(self.chunks(candidates, cbTS.candPerPage))
+                pagecandidates = self.getMenuPages(cbTS)
+                currentCandPageCount = len(pagecandidates) # 目前的選字清單總頁數
                 cbTS.setCandidateList(pagecandidates[currentCandPage])
                 if not cbTS.isSelKeysChanged:
                     cbTS.setShowCandidates(True)
@@ -758,7 +808,7 @@ class CinBase:
                             currentCandPage += 1
                             candCursor = 0
                     else:
-                        if (candCursor + cbTS.candPerRow) < len(pagecandidates[currentCandPage]):
+                        if (candCursor + cbTS.candPerRow) < pagecandidates.getPageSize(currentCandPage):
                             candCursor = candCursor + cbTS.candPerRow
                 elif keyCode == VK_LEFT:  # 游標左移
                     if candCursor > 0:
@@ -777,7 +827,7 @@ class CinBase:
                 elif keyCode == VK_HOME:  # Home 鍵
                     candCursor = 0
                 elif keyCode == VK_END:  # End 鍵
-                    candCursor = len(pagecandidates[currentCandPage]) - 1
+                    candCursor = pagecandidates.getPageSize(currentCandPage) - 1
                 elif keyCode == VK_PRIOR:  # Page UP 鍵
                     if currentCandPage > 0:
                         currentCandPage -= 1
@@ -797,7 +847,7 @@ class CinBase:
                     if cbTS.compositionBufferMode:
                         self.removeCompositionBufferString(cbTS, len(cbTS.compositionChar), True)
                     self.resetComposition(cbTS)
-                elif self.isInSelKeys(cbTS, charCode) and not keyEvent.isKeyDown(VK_SHIFT): # 使用選字鍵執行項目或輸出候選字
+                elif self.isInSelKeys(cbTS, charCode) and not keyContext.isShiftDown: # 使用選字鍵執行項目或輸出候選字
                     if cbTS.selKeys.index(charStr) < cbTS.candPerPage and cbTS.selKeys.index(charStr) < len(cbTS.candidateList):
                         candCursor = cbTS.selKeys.index(charStr)
                         itemName = cbTS.candidateList[candCursor]
@@ -833,23 +883,22 @@ class CinBase:
                     cbTS.switchmenu = False
                     if cbTS.menutype == 0 and itemName == "功能開關": # 切至功能開關頁面
                         cbTS.menucandidates = cbTS.smenucandidates
-                        pagecandidates = list(self.chunks(cbTS.menucandidates, cbTS.candPerPage))
+                        pagecandidates = CandidatePages(cbTS.menucandidates, cbTS.candPerPage)
                         cbTS.resetMenuCand = self.switchMenuType(cbTS, 1, ["0," + str(candCursor) + "," + str(currentCandPage)])
                     elif cbTS.menutype == 0 and itemName == "特殊符號": # 切至特殊符號頁面
                         cbTS.menucandidates = cbTS.symbols.getKeyNames()
-                        pagecandidates = list(self.chunks(cbTS.menucandidates, cbTS.candPerPage))
+                        pagecandidates = CandidatePages(cbTS.menucandidates, cbTS.candPerPage)
                         cbTS.resetMenuCand = self.switchMenuType(cbTS, 2, ["0," + str(candCursor) + "," + str(currentCandPage)])
                     elif cbTS.menutype == 0 and itemName == "注音符號": # 切至注音符號頁面
                         cbTS.menucandidates = cbTS.bopomofolist
-                        pagecandidates = list(self.chunks(cbTS.menucandidates, cbTS.candPerPage))
+                        pagecandidates = CandidatePages(cbTS.menucandidates, cbTS.candPerPage)
                         cbTS.resetMenuCand = self.switchMenuType(cbTS, 4, ["0," + str(candCursor) + "," + str(currentCandPage)])
                     elif cbTS.menutype == 0 and itemName == "外語文字": # 切至外語文字頁面
                         cbTS.menucandidates = cbTS.flangs.getKeyNames()
-                        pagecandidates = list(self.chunks(cbTS.menucandidates, cbTS.candPerPage))
+                        pagecandidates = CandidatePages(cbTS.menucandidates, cbTS.candPerPage)
                         cbTS.resetMenuCand = self.switchMenuType(cbTS, 5, ["0," + str(candCursor) + "," + str(currentCandPage)])
                     elif cbTS.menutype == 0 and itemName == "表情符號": # 切至表情符號頁面
-                        cbTS.menucandidates = self.emojimenulist
-                        pagecandidates = list(self.chunks(cbTS.menucandidates, cbTS.candPerPage))
+                        pagecandidates = self.setMenuPages(cbTS, self.emoji.getPages("menu", self.emojimenulist, cbTS.candPerPage))
                         if not cbTS.emojimenumode:
                             cbTS.resetMenuCand = self.switchMenuType(cbTS, 7, ["0," + str(candCursor) + "," + str(currentCandPage)])
                         else:
@@ -871,7 +920,7 @@ class CinBase:
                         if cbTS.compositionBufferMode:
                             cbTS.compositionBufferMenuItem = cbTS.candidateList[candCursor]
                         cbTS.menucandidates = cbTS.symbols.getCharDef(cbTS.candidateList[candCursor])
-                        pagecandidates = list(self.chunks(cbTS.menucandidates, cbTS.candPerPage))
+                        pagecandidates = CandidatePages(cbTS.menucandidates, cbTS.candPerPage)
                         cbTS.resetMenuCand = self.switchMenuType(cbTS, 3, ["2," + str(candCursor) + "," + str(currentCandPage)])
                     elif cbTS.menutype == 3: # 執行特殊符號子頁面項目
                         if cbTS.compositionBufferMode:
@@ -895,7 +944,7 @@ class CinBase:
                         if cbTS.compositionBufferMode:
                             cbTS.compositionBufferMenuItem = cbTS.candidateList[candCursor]
                         cbTS.menucandidates = cbTS.flangs.getCharDef(cbTS.candidateList[candCursor])
-                        pagecandidates = list(self.chunks(cbTS.menucandidates, cbTS.candPerPage))
+                        pagecandidates = CandidatePages(cbTS.menucandidates, cbTS.candPerPage)
                         cbTS.resetMenuCand = self.switchMenuType(cbTS, 6, ["5," + str(candCursor) + "," + str(currentCandPage)])
                     elif cbTS.menutype == 6: # 執行外語文字子頁面項目
                         if cbTS.compositionBufferMode:
@@ -909,49 +958,19 @@ class CinBase:
                     elif cbTS.menutype == 7: # 切換至表情符號分類頁面
                         menutype = 8
                         i = self.emojimenulist.index(cbTS.candidateList[candCursor])
-                        if i == 0:
-                            cbTS.emojitype = 0
-                            cbTS.menucandidates = self.emoji.emoticons_keynames
-                        elif i == 1:
-                            cbTS.emojitype = 1
-                            cbTS.menucandidates = self.emoji.pictographs_keynames
-                        elif i == 2:
-                            cbTS.emojitype = 2
-                            cbTS.menucandidates = self.emoji.miscellaneous_keynames
-                        elif i == 3:
-                            cbTS.emojitype = 3
-                            cbTS.menucandidates = self.emoji.dingbats_keynames
-                        elif i == 4:
-                            cbTS.emojitype = 4
-                            cbTS.menucandidates = self.emoji.transport_keynames
+                        cbTS.emojitype = i
+                        if i < len(EMOJI_TYPES):
+                            pagecandidates = self.setMenuPages(cbTS, self.emoji.getKeyNamePages(EMOJI_TYPES[i], cbTS.candPerPage))
                         elif i == 5:
-                            cbTS.emojitype = 5
-                            cbTS.menucandidates = self.emoji.modifiercolor
+                            pagecandidates = self.setMenuPages(cbTS, self.emoji.getModifierColorPages(cbTS.candPerPage))
                             menutype = 9
-                        pagecandidates = list(self.chunks(cbTS.menucandidates, cbTS.candPerPage))
                         cbTS.resetMenuCand = self.switchMenuType(cbTS, menutype, ["7," + str(candCursor) + "," + str(currentCandPage)])
                     elif cbTS.menutype == 8: # 切換至表情符號分類子頁面
-                        if cbTS.emojitype == 0:
-                            if cbTS.compositionBufferMode:
-                                cbTS.compositionBufferMenuItem = "emoticons," + cbTS.candidateList[candCursor]
-                            cbTS.menucandidates = self.emoji.getCharDef("emoticons", cbTS.candidateList[candCursor])
-                        elif cbTS.emojitype == 1:
-                            if cbTS.compositionBufferMode:
-                                cbTS.compositionBufferMenuItem = "pictographs," + cbTS.candidateList[candCursor]
-                            cbTS.menucandidates = self.emoji.getCharDef("pictographs", cbTS.candidateList[candCursor])
-                        elif cbTS.emojitype == 2:
-                            if cbTS.compositionBufferMode:
-                                cbTS.compositionBufferMenuItem = "miscellaneous," + cbTS.candidateList[candCursor]
-                            cbTS.menucandidates = self.emoji.getCharDef("miscellaneous", cbTS.candidateList[candCursor])
-                        elif cbTS.emojitype == 3:
+                        if cbTS.emojitype < len(EMOJI_TYPES):
+                            emojitype = EMOJI_TYPES[cbTS.emojitype]
                             if cbTS.compositionBufferMode:
-                                cbTS.compositionBufferMenuItem = "dingbats," + cbTS.candidateList[candCursor]
-                            cbTS.menucandidates = self.emoji.getCharDef("dingbats", cbTS.candidateList[candCursor])
-                        elif cbTS.emojitype == 4:
-                            if cbTS.compositionBufferMode:
-                                cbTS.compositionBufferMenuItem = "transport," + cbTS.candidateList[candCursor]
-                            cbTS.menucandidates = self.emoji.getCharDef("transport", cbTS.candidateList[candCursor])
-                        pagecandidates = list(self.chunks(cbTS.menucandidates, cbTS.candPerPage))
+                                cbTS.compositionBufferMenuItem = emojitype + "," + cbTS.candidateList[candCursor]
+                            pagecandidates = self.setMenuPages(cbTS, self.emoji.getCharDefPages(emojitype, cbTS.candidateList[candCursor], cbTS.candPerPage))
                         cbTS.resetMenuCand = self.switchMenuType(cbTS, 9, ["8," + str(candCursor) + "," + str(currentCandPage)])
                     elif cbTS.menutype == 9: # 執行表情符號分類子頁面項目
                         if cbTS.compositionBufferMode:
@@ -985,11 +1004,11 @@ class CinBase:
                 return False
 
         # 若按下 Shift 鍵,且沒有按下其它的按鍵
-        if keyEvent.isKeyDown(VK_SHIFT) and not keyEvent.isPrintableChar():
+        if keyContext.isShiftDown and not keyContext.isPrintable:
             return False
 
         # 若按下 Ctrl 鍵
-        if cbTS.langMode == CHINESE_MODE and keyEvent.isKeyDown(VK_CONTROL):
+        if cbTS.langMode == CHINESE_MODE and keyContext.isCtrlDown:
             # 若按下的是指定的符號鍵，輸入法需要處理此按鍵
             if self.isCtrlSymbolsChar(keyCode):
                 if cbTS.msymbols.isInCharDef(charStr) and cbTS.closemenu and not cbTS.multifunctionmode:
@@ -1054,8 +1073,8 @@ class CinBase:
             self.resetComposition(cbTS)
             self.resetCompositionBuffer(cbTS)
 
-        if cbTS.ctrlsymbolsmode and cbTS.directCommitSymbol and not keyEvent.isKeyDown(VK_CONTROL) and keyEvent.isPrintableChar():
-            if not cbTS.msymbols.isInCharDef(cbTS.compositionChar + charStr) and cbTS.cin.isInKeyName(charStrLow):
+        if cbTS.ctrlsymbolsmode and cbTS.directCommitSymbol and not keyContext.isCtrlDown and keyContext.isPrintable:
+            if not cbTS.msymbols.isInCharDef(cbTS.compositionChar + charStr) and isInKeyName:
                 if not cbTS.compositionBufferMode:
                     cbTS.setCommitString(cbTS.compositionString)
                     self.resetComposition(cbTS)
@@ -1087,9 +1106,9 @@ class CinBase:
                     cbTS.isSelKeysChanged = True
 
         # 按下的鍵為 CIN 內有定義的字根
-        if cbTS.cin.isInKeyName(charStrLow) and cbTS.closemenu and not cbTS.multifunctionmode and not keyEvent.isKeyDown(VK_CONTROL) and not cbTS.ctrlsymbolsmode and not cbTS.dayisymbolsmode and not cbTS.selcandmode and not cbTS.tempEnglishMode and not cbTS.phrasemode:
+        if isInKeyName and cbTS.closemenu and not cbTS.multifunctionmode and not keyContext.isCtrlDown and not cbTS.ctrlsymbolsmode and not cbTS.dayisymbolsmode and not cbTS.selcandmode and not cbTS.tempEnglishMode and not cbTS.phrasemode:
             # 若按下 Shift 鍵
-            if keyEvent.isKeyDown(VK_SHIFT) and cbTS.langMode == CHINESE_MODE and not cbTS.imeDirName == "cheez":
+            if keyContext.isShiftDown and cbTS.langMode == CHINESE_MODE and not cbTS.imeDirName == "cheez":
                 CommitStr = charStr
                 # 如果按鍵及萬用字元為*
                 if charStr == '*' and cbTS.supportWildcard and cbTS.selWildcardChar == charStr: 
@@ -1137,7 +1156,7 @@ class CinBase:
                         if cbTS.fsymbols.isInCharDef(charStr):
                             self.setOutputFSymbols(cbTS, charStr)
                         else:
-                            if cbTS.cin.isInKeyName(charStrLow): # 如果是 CIN 所定義的字根
+                            if isInKeyName: # 如果是 CIN 所定義的字根
                                 RemoveStringLength = 0
                                 if cbTS.compositionBufferMode:
                                     if not cbTS.compositionChar == '':
@@ -1183,7 +1202,7 @@ class CinBase:
                             cbTS.setCommitString(CommitStr)
                         self.resetComposition(cbTS)
                 else: # 如果未使用 SHIFT 輸入快速符號或全形標點
-                    if cbTS.cin.isInKeyName(charStrLow) and (self.isSymbolsChar(keyCode) or self.isNumberChar(keyCode)): # 如果是 CIN 所定義的字根
+                    if isInKeyName and (self.isSymbolsChar(keyCode) or self.isNumberChar(keyCode)): # 如果是 CIN 所定義的字根
                         cbTS.compositionChar = charStrLow
                         keyname = cbTS.cin.getKeyName(charStrLow)
                         if cbTS.compositionBufferMode:
@@ -1250,6 +1269,9 @@ class CinBase:
                             if not cbTS.menusymbolsmode:
                                 cbTS.compositionChar += charStrLow
                                 keyname = cbTS.cin.getKeyName(charStrLow)
+                                # 碼表中沒有以此開頭的字根，再輸入任何字根都不會有候選字
+                                if cbTS.keyStats.enabled and not cbTS.selWildcardChar in cbTS.compositionChar and cbTS.cin.isDeadEnd(cbTS.compositionChar):
+                                    cbTS.keyStats.count("deadEndKey")
 
                                 if cbTS.compositionBufferMode:
                                     if (len(cbTS.compositionChar) <= cbTS.maxCharLength):
@@ -1262,9 +1284,9 @@ class CinBase:
                             else:
                                 cbTS.menusymbolsmode = False
         # 按下的鍵不存在於 CIN 所定義的字根
-        elif not cbTS.cin.isInKeyName(charStrLow) and cbTS.closemenu and not cbTS.multifunctionmode and not keyEvent.isKeyDown(VK_CONTROL) and not cbTS.ctrlsymbolsmode and not cbTS.dayisymbolsmode and not cbTS.selcandmode and not cbTS.tempEnglishMode and not cbTS.phrasemode:
+        elif not isInKeyName and cbTS.closemenu and not cbTS.multifunctionmode and not keyContext.isCtrlDown and not cbTS.ctrlsymbolsmode and not cbTS.dayisymbolsmode and not cbTS.selcandmode and not cbTS.tempEnglishMode and not cbTS.phrasemode:
             # 若按下 Shift 鍵
-            if keyEvent.isKeyDown(VK_SHIFT) and cbTS.langMode == CHINESE_MODE:
+            if keyContext.isShiftDown and cbTS.langMode == CHINESE_MODE:
                 # 如果按鍵及萬用字元為*
                 if charStr == '*' and cbTS.supportWildcard and cbTS.selWildcardChar == charStr: 
                     keyname = '＊'
@@ -1332,7 +1354,7 @@ class CinBase:
             else: # 若沒按下 Shift 鍵
                 # 如果是全形模式，將字串轉為全形再輸出
                 if cbTS.shapeMode == FULLSHAPE_MODE and len(cbTS.compositionChar) == 0:
-                    if keyEvent.isPrintableChar():
+                    if keyContext.isPrintable:
                         if not(cbTS.phrasemode and (self.isNumberChar(keyCode) or keyCode == VK_SPACE)):
                             if self.isSymbolsChar(keyCode) or self.isNumberChar(keyCode):
                                 CommitStr = self.SymbolscharCodeToFullshape(charCode)
@@ -1354,7 +1376,7 @@ class CinBase:
                                 self.resetComposition(cbTS)
                 else: # 半形模式
                     if cbTS.compositionBufferMode:
-                        if cbTS.isComposing() and keyEvent.isPrintableChar() and not cbTS.showCandidates and cbTS.compositionChar == '':
+                        if cbTS.isComposing() and keyContext.isPrintable and not cbTS.showCandidates and cbTS.compositionChar == '':
                             self.setCompositionBufferString(cbTS, charStr, 0)
                             cbTS.compositionBufferType = "english"
                             self.setCompositionBufferChar(cbTS, cbTS.compositionBufferType, charStr, cbTS.compositionBufferCursor)
@@ -1431,19 +1453,20 @@ class CinBase:
                     cbTS.setCompositionString(cbTS.compositionString[:-keyLength])
                 cbTS.compositionChar = cbTS.compositionChar[:-1]
 
+            phaseStart = cbTS.keyStats.begin()
             if cbTS.homophoneQuery and cbTS.homophonemode and cbTS.homophoneChar == cbTS.compositionChar:
                 candidates = cbTS.homophonecandidates
             elif cbTS.cin.isInCharDef(cbTS.compositionChar) and cbTS.closemenu and not cbTS.ctrlsymbolsmode and not cbTS.dayisymbolsmode:
                 candidates = cbTS.cin.getCharDef(cbTS.compositionChar)
-                if cbTS.sortByPhrase and candidates:
-                    candidates = self.sortByPhrase(cbTS, copy.deepcopy(candidates))
+                if candidates:
+                    candidates = self.rankCandidates(cbTS, candidates)
                 if cbTS.compositionBufferMode and not cbTS.selcandmode:
                     cbTS.compositionBufferType = "default"
             elif cbTS.imeDirName == "chepinyin" and cbTS.cinFileList[cbTS.cfg.selCinType] == "thpinyin.json" and not cbTS.ctrlsymbolsmode:
                 if cbTS.cin.isInCharDef(cbTS.compositionChar + "1") and cbTS.closemenu and not cbTS.ctrlsymbolsmode:
                     candidates = cbTS.cin.getCharDef(cbTS.compositionChar + '1')
-                    if cbTS.sortByPhrase and candidates:
-                        candidates = self.sortByPhrase(cbTS, copy.deepcopy(candidates))
+                    if candidates:
+                        candidates = self.rankCandidates(cbTS, candidates)
                     if cbTS.compositionBufferMode and not cbTS.selcandmode:
                         cbTS.compositionBufferType = "default"
             elif cbTS.fullShapeSymbols and cbTS.fsymbols.isInCharDef(cbTS.compositionChar) and cbTS.closemenu:
@@ -1465,7 +1488,9 @@ class CinBase:
             elif cbTS.supportWildcard and cbTS.selWildcardChar in cbTS.compositionChar and cbTS.closemenu:
                 if cbTS.wildcardcandidates and cbTS.wildcardcompositionChar == cbTS.compositionChar:
                     candidates = cbTS.wildcardcandidates
+                    cbTS.keyStats.count("wildcardCacheHit")
                 else:
+                    cbTS.keyStats.count("wildcardLookup")
                     cbTS.setCandidateCursor(0)
                     cbTS.setCandidatePage(0)
                     cbTS.wildcardcandidates = cbTS.cin.getWildcardCharDefs(cbTS.compositionChar, cbTS.selWildcardChar, cbTS.candMaxItems)
@@ -1478,8 +1503,9 @@ class CinBase:
                     if cbTS.compositionBufferMode and not cbTS.selcandmode:
                         cbTS.compositionBufferType = "default"
                 cbTS.isWildcardChardefs = True
-                if cbTS.sortByPhrase and candidates:
-                    candidates = self.sortByPhrase(cbTS, copy.deepcopy(candidates))
+                if candidates:
+                    candidates = self.rankCandidates(cbTS, candidates)
+            cbTS.keyStats.end("lookup", phaseStart)
 
         # 組字編輯模式
         if cbTS.compositionBufferMode and cbTS.isComposing() and cbTS.compositionChar == "" and cbTS.closemenu and not cbTS.multifunctionmode and not cbTS.phrasemode and not cbTS.selcandmode:
@@ -1504,49 +1530,35 @@ class CinBase:
                 changelastCommitString = True
             elif keyCode == VK_BACK:
                 if cbTS.compositionBufferCursor != 0 and cbTS.compositionBufferString != "" and not cbTS.keyUsedState:
-                    if cbTS.compositionBufferCursor - 1 in cbTS.compositionBufferChar:
-                        del cbTS.compositionBufferChar[cbTS.compositionBufferCursor - 1]
-                    for key in cbTS.compositionBufferChar:
-                        if key > cbTS.compositionBufferCursor - 1:
-                            cbTS.compositionBufferChar[key - 1] = cbTS.compositionBufferChar.pop(key)
                     self.removeCompositionBufferString(cbTS, 1, True)
                     changelastCommitString = True
                 if cbTS.compositionBufferString == '':
-                    cbTS.compositionBufferChar = {}
                     self.resetComposition(cbTS)
                     self.resetCompositionBuffer(cbTS)
                     cbTS.tempEnglishMode = False
             elif keyCode == VK_DELETE:
                 if cbTS.compositionBufferCursor != len(cbTS.compositionBufferString) and cbTS.compositionBufferString != "":
-                    if cbTS.compositionBufferCursor in cbTS.compositionBufferChar:
-                        del cbTS.compositionBufferChar[cbTS.compositionBufferCursor]
-                    for key in cbTS.compositionBufferChar:
-                        if key > cbTS.compositionBufferCursor:
-                            cbTS.compositionBufferChar[key - 1] = cbTS.compositionBufferChar.pop(key)
                     self.removeCompositionBufferString(cbTS, 1, False)
                     changelastCommitString = True
                 if cbTS.compositionBufferString == '':
-                    cbTS.compositionBufferChar = {}
                     self.resetComposition(cbTS)
                     self.resetCompositionBuffer(cbTS)
                     cbTS.tempEnglishMode = False
             elif keyCode == VK_ESCAPE and not cbTS.keyUsedState:
                 self.resetComposition(cbTS)
                 self.resetCompositionBuffer(cbTS)
-                cbTS.compositionBufferChar = {}
                 cbTS.tempEnglishMode = False
             elif keyCode == VK_RETURN:
                 cbTS.setCommitString(cbTS.compositionBufferString)
                 self.resetComposition(cbTS)
                 self.resetCompositionBuffer(cbTS)
-                cbTS.compositionBufferChar = {}
                 cbTS.tempEnglishMode = False
             elif keyCode == VK_DOWN:
                 cbTS.tempengcandidates = []
                 selStringPos = cbTS.compositionBufferCursor if cbTS.compositionBufferCursor <= len(cbTS.compositionBufferString) - 1 else cbTS.compositionBufferCursor - 1
 
-                if selStringPos in cbTS.compositionBufferChar:
-                    sellist = cbTS.compositionBufferChar[selStringPos]
+                sellist = cbTS.compositionBuffer.getInfo(selStringPos)
+                if sellist is not None:
                     if sellist[0] == 'msymbols':
                         cbTS.compositionChar = sellist[1] if sellist[1][0] != "`" else sellist[1][1:]
                         candidates = cbTS.msymbols.getCharDef(cbTS.compositionChar)
@@ -1580,15 +1592,15 @@ class CinBase:
                         if cbTS.cin.isInCharDef(sellist[1]):
                             cbTS.compositionChar = sellist[1]
                             candidates = cbTS.cin.getCharDef(sellist[1])
-                            if cbTS.sortByPhrase and candidates:
-                                candidates = self.sortByPhrase(cbTS, copy.deepcopy(candidates))
+                            if candidates:
+                                candidates = self.rankCandidates(cbTS, candidates)
                             cbTS.selcandmode = True
                     else:
                         if cbTS.cin.isHaveKey(cbTS.compositionBufferString[cbTS.compositionBufferCursor]):
                             cbTS.compositionChar = cbTS.cin.getKey(cbTS.compositionBufferString[cbTS.compositionBufferCursor])
                             candidates = cbTS.cin.getCharDef(cbTS.compositionChar)
-                            if cbTS.sortByPhrase and candidates:
-                                candidates = self.sortByPhrase(cbTS, copy.deepcopy(candidates))
+                            if candidates:
+                                candidates = self.rankCandidates(cbTS, candidates)
                             cbTS.selcandmode = True
                         else:
                             cbTS.selcandmode = False
@@ -1631,8 +1643,8 @@ class CinBase:
                                 cbTS.setCompositionCursor(len(cbTS.compositionString))
                             if cbTS.cin.isInCharDef(cbTS.compositionChar):
                                 candidates = cbTS.cin.getCharDef(cbTS.compositionChar)
-                                if cbTS.sortByPhrase and candidates:
-                                    candidates = self.sortByPhrase(cbTS, copy.deepcopy(candidates))
+                                if candidates:
+                                    candidates = self.rankCandidates(cbTS, candidates)
                 # 如果是碼表標點
                 if cbTS.cin.isInKeyName(cbTS.compositionChar[0]):
                     if cbTS.cin.getKeyName(cbTS.compositionChar[0]) in cbTS.directCommitSymbolList:
@@ -1656,8 +1668,8 @@ class CinBase:
                                     cbTS.setCompositionCursor(len(cbTS.compositionString))
                             if cbTS.cin.isInCharDef(cbTS.compositionChar):
                                 candidates = cbTS.cin.getCharDef(cbTS.compositionChar)
-                                if cbTS.sortByPhrase and candidates:
-                                    candidates = self.sortByPhrase(cbTS, copy.deepcopy(candidates))
+                                if candidates:
+                                    candidates = self.rankCandidates(cbTS, candidates)
 
             if cbTS.langMode == CHINESE_MODE and cbTS.dayisymbolsmode and len(cbTS.compositionChar) == 1 and (keyCode == VK_SPACE or keyCode == VK_RETURN):
                 candidates = cbTS.cin.getCharDef(cbTS.compositionChar)
@@ -1739,10 +1751,10 @@ class CinBase:
 
                                     if cbTS.imeReverseLookup:
                                         if RCinTable.cin is not None:
-                                            if not RCinTable.cin.getCharEncode(commitStr) == "":
+                                            message = RCinTable.cin.getCharEncode(commitStr)
+                                            if not message == "":
                                                 if not cbTS.client.isUiLess:
                                                     cbTS.isShowMessage = True
-                                                    message = RCinTable.cin.getCharEncode(commitStr)
                                                     if not cbTS.client.isMetroApp:
                                                         cbTS.showMessageOnKeyUp = True
                                                         cbTS.onKeyUpMessage = message
@@ -1759,7 +1771,9 @@ class CinBase:
 
                                     # 如果使用打繁出簡，就轉成簡體中文
                                     if cbTS.outputSimpChinese:
+                                        phaseStart = cbTS.keyStats.begin()
                                         commitStr = cbTS.opencc.convert(commitStr)
+                                        cbTS.keyStats.end("opencc", phaseStart)
 
                                     if cbTS.compositionBufferMode:
                                         RemoveStringLength = 0
@@ -1799,18 +1813,22 @@ class CinBase:
                 if cbTS.isShowCandidates:
                     candCursor = cbTS.candidateCursor  # 目前的游標位置
                     candCount = len(cbTS.candidateList)  # 目前選字清單項目數
-                    currentCandPageCount = math.ceil(len(candidates) / cbTS.candPerPage) # 目前的選字清單總頁數
                     currentCandPage = cbTS.currentCandPage # 目前的選字清單頁數
 
                     # 候選清單分頁
+                    phaseStart = cbTS.keyStats.begin()
                     if cbTS.isWildcardChardefs:
                         if cbTS.wildcardpagecandidates:
                             pagecandidates = cbTS.wildcardpagecandidates
                         else:
-                            cbTS.wildcardpagecandidates = list(self.chunks(candidates, cbTS.candPerPage))
+                            cbTS.wildcardpagecandidates = CandidatePages(candidates, cbTS.candPerPage)
                             pagecandidates = cbTS.wildcardpagecandidates
+                    elif cbTS.homophoneQuery and cbTS.homophonemode and candidates is cbTS.homophonecandidates and cbTS.homophonepagecandidates:
+                        pagecandidates = cbTS.homophonepagecandidates
                     else:
-                        pagecandidates = list(self.chunks(candidates, cbTS.candPerPage))
+                        pagecandidates = CandidatePages(candidates, cbTS.candPerPage)
+                    currentCandPageCount = len(pagecandidates) # 目前的選字清單總頁數
+                    cbTS.keyStats.end("paging", phaseStart)
                     cbTS.setCandidateList(pagecandidates[currentCandPage])
 
                     if not cbTS.isSelKeysChanged:
@@ -1830,7 +1848,7 @@ class CinBase:
 
                 if cbTS.isShowCandidates:
                     # 使用選字鍵執行項目或輸出候選字
-                    if self.isInSelKeys(cbTS, charCode) and not keyEvent.isKeyDown(VK_SHIFT) and cbTS.canUseSelKey:
+                    if self.isInSelKeys(cbTS, charCode) and not keyContext.isShiftDown and cbTS.canUseSelKey:
                         if not cbTS.homophoneselpinyinmode:
                             if cbTS.imeDirName == "chedayi":
                                 i = cbTS.selKeys.index(charStr) + 1
@@ -1857,8 +1875,9 @@ class CinBase:
                             cbTS.homophonemode = True
                             cbTS.homophoneChar = cbTS.compositionChar
                             cbTS.isHomophoneChardefs = True
-                            cbTS.homophonecandidates = HCinTable.cin.getCharDef(HCinTable.cin.getKeyList(cbTS.homophoneStr)[i])
-                            pagecandidates = list(self.chunks(cbTS.homophonecandidates, cbTS.candPerPage))
+                            cbTS.homophonecandidates = HCinTable.cin.getHomophoneCandidates(cbTS.homophoneStr, i)
+                            cbTS.homophonepagecandidates = HCinTable.cin.getHomophonePages(cbTS.homophoneStr, i, cbTS.candPerPage)
+                            pagecandidates = cbTS.homophonepagecandidates
                             cbTS.setCandidateList(pagecandidates[currentCandPage])
                     elif keyCode == VK_UP:  # 游標上移
                         if (candCursor - cbTS.candPerRow) < 0:
@@ -1874,7 +1893,7 @@ class CinBase:
                                 currentCandPage += 1
                                 candCursor = 0
                         else:
-                            if (candCursor + cbTS.candPerRow) < len(pagecandidates[currentCandPage]):
+                            if (candCursor + cbTS.candPerRow) < pagecandidates.getPageSize(currentCandPage):
                                 candCursor = candCursor + cbTS.candPerRow
                     elif keyCode == VK_LEFT:  # 游標左移
                         if candCursor > 0:
@@ -1893,7 +1912,7 @@ class CinBase:
                     elif keyCode == VK_HOME:  # Home 鍵
                         candCursor = 0
                     elif keyCode == VK_END:  # End 鍵
-                        candCursor = len(pagecandidates[currentCandPage]) - 1
+                        candCursor = pagecandidates.getPageSize(currentCandPage) - 1
                     elif keyCode == VK_PRIOR:  # Page UP 鍵
                         if currentCandPage > 0:
                             currentCandPage -= 1
@@ -1913,15 +1932,17 @@ class CinBase:
                                     cbTS.homophoneselpinyinmode = True
                                     cbTS.homophoneChar = cbTS.compositionChar
                                     cbTS.homophoneStr = commitStr
-                                    cbTS.homophonecandidates = HCinTable.cin.getKeyNameList(HCinTable.cin.getKeyList(commitStr))
-                                    pagecandidates = list(self.chunks(cbTS.homophonecandidates, cbTS.candPerPage))
+                                    cbTS.homophonecandidates = HCinTable.cin.getHomophoneCandidates(commitStr)
+                                    cbTS.homophonepagecandidates = HCinTable.cin.getHomophonePages(commitStr, None, cbTS.candPerPage)
+                                    pagecandidates = cbTS.homophonepagecandidates
                                     cbTS.setCandidateList(pagecandidates[currentCandPage])
                                 else:
                                     cbTS.homophonemode = True
                                     cbTS.homophoneChar = cbTS.compositionChar
                                     cbTS.isHomophoneChardefs = True
-                                    cbTS.homophonecandidates = HCinTable.cin.getCharDef(HCinTable.cin.getKey(commitStr))
-                                    pagecandidates = list(self.chunks(cbTS.homophonecandidates, cbTS.candPerPage))
+                                    cbTS.homophonecandidates = HCinTable.cin.getHomophoneCandidates(commitStr, 0)
+                                    cbTS.homophonepagecandidates = HCinTable.cin.getHomophonePages(commitStr, 0, cbTS.candPerPage)
+                                    pagecandidates = cbTS.homophonepagecandidates
                                     cbTS.setCandidateList(pagecandidates[currentCandPage])
                     elif (keyCode == VK_RETURN or (keyCode == VK_SPACE and not cbTS.switchPageWithSpace)) and cbTS.canSetCommitString:  # 按下 Enter 鍵或空白鍵
                         if not cbTS.homophoneselpinyinmode:
@@ -1944,10 +1965,11 @@ class CinBase:
                             cbTS.homophonemode = True
                             cbTS.homophoneChar = cbTS.compositionChar
                             cbTS.isHomophoneChardefs = True
-                            cbTS.homophonecandidates = HCinTable.cin.getCharDef(HCinTable.cin.getKeyList(cbTS.homophoneStr)[candCursor])
+                            cbTS.homophonecandidates = HCinTable.cin.getHomophoneCandidates(cbTS.homophoneStr, candCursor)
+                            cbTS.homophonepagecandidates = HCinTable.cin.getHomophonePages(cbTS.homophoneStr, candCursor, cbTS.candPerPage)
                             candCursor = 0
                             currentCandPage = 0
-                            pagecandidates = list(self.chunks(cbTS.homophonecandidates, cbTS.candPerPage))
+                            pagecandidates = cbTS.homophonepagecandidates
                             cbTS.setCandidateList(pagecandidates[currentCandPage])
                     elif keyCode == VK_SPACE and cbTS.switchPageWithSpace: # 按下空白鍵
                         if cbTS.canUseSpaceAsPageKey:
@@ -2039,26 +2061,14 @@ class CinBase:
             cbTS.phrasemode = False
 
         if cbTS.showPhrase and cbTS.phrasemode:
-            if self.isNumberChar(keyCode) and keyEvent.isKeyDown(VK_SHIFT) and not cbTS.imeDirName == "chedayi":
+            if self.isNumberChar(keyCode) and keyContext.isShiftDown and not cbTS.imeDirName == "chedayi":
                 charCode = keyCode
                 charStr = chr(charCode)
-            phrasecandidates = []
-            if cbTS.userphrase.isInCharDef(cbTS.lastCommitString):
-                phrasecandidates = cbTS.userphrase.getCharDef(cbTS.lastCommitString)
-            if PhraseData.phrase.isInCharDef(cbTS.lastCommitString):
-                if len(phrasecandidates) == 0:
-                    phrasecandidates = PhraseData.phrase.getCharDef(cbTS.lastCommitString)
-                else:
-                    if not cbTS.isShowPhraseCandidates:
-                        plist = PhraseData.phrase.getCharDef(cbTS.lastCommitString)
-                        for pstr in plist:
-                            if not pstr in phrasecandidates:
-                                phrasecandidates.append(pstr)
+            phrasecandidates = PhraseViews.getView(cbTS.userphrase, PhraseData.phrase).getCharDef(cbTS.lastCommitString)
 
             if phrasecandidates:
                 candCursor = cbTS.candidateCursor  # 目前的游標位置
                 candCount = len(cbTS.candidateList)  # 目前選字清單項目數
-                currentCandPageCount = math.ceil(len(phrasecandidates) / cbTS.candPerPage) # 目前的選字清單總頁數
                 currentCandPage = cbTS.currentCandPage # 目前的選字清單頁數
 
                 if cbTS.isShowPhraseCandidates:
@@ -2067,12 +2077,13 @@ class CinBase:
                     cbTS.canSetPhraseCommitString = False
 
                 # 候選清單分頁
-                pagecandidates = list(self.chunks(phrasecandidates, cbTS.candPerPage))
+                pagecandidates = CandidatePages(phrasecandidates, cbTS.candPerPage)
+                currentCandPageCount = len(pagecandidates) # 目前的選字清單總頁數
                 cbTS.setCandidateList(pagecandidates[currentCandPage])
                 cbTS.setShowCandidates(True)
 
                 # 使用選字鍵執行項目或輸出候選字
-                if (self.isInSelKeys(cbTS, charCode) and keyEvent.isKeyDown(VK_SHIFT) and not cbTS.imeDirName == "chedayi") or (self.isInSelKeys(cbTS, charCode) and not keyEvent.isKeyDown(VK_SHIFT) and cbTS.imeDirName == "chedayi"):
+                if (self.isInSelKeys(cbTS, charCode) and keyContext.isShiftDown and not cbTS.imeDirName == "chedayi") or (self.isInSelKeys(cbTS, charCode) and not keyContext.isShiftDown and cbTS.imeDirName == "chedayi"):
                     if cbTS.isShowPhraseCandidates:
                         if cbTS.imeDirName == "chedayi":
                             i = cbTS.selKeys.index(charStr) + 1
@@ -2109,7 +2120,7 @@ class CinBase:
                             currentCandPage += 1
                             candCursor = 0
                     else:
-                        if (candCursor + cbTS.candPerRow) < len(pagecandidates[currentCandPage]):
+                        if (candCursor + cbTS.candPerRow) < pagecandidates.getPageSize(currentCandPage):
                             candCursor = candCursor + cbTS.candPerRow
                 elif keyCode == VK_LEFT:  # 游標左移
                     if candCursor > 0:
@@ -2128,7 +2139,7 @@ class CinBase:
                 elif keyCode == VK_HOME:  # Home 鍵
                     candCursor = 0
                 elif keyCode == VK_END:  # End 鍵
-                    candCursor = len(pagecandidates[currentCandPage]) - 1
+                    candCursor = pagecandidates.getPageSize(currentCandPage) - 1
                 elif keyCode == VK_PRIOR:  # Page UP 鍵
                     if currentCandPage > 0:
                         currentCandPage -= 1
@@ -2169,7 +2180,7 @@ class CinBase:
                         candCursor = 0
                         currentCandPage = 0
 
-                        if cbTS.cin.isInKeyName(charStrLow) and not keyEvent.isKeyDown(VK_SHIFT):
+                        if isInKeyName and not keyContext.isShiftDown:
                             cbTS.compositionChar = charStrLow
                             keyname = cbTS.cin.getKeyName(charStrLow)
 
@@ -2190,10 +2201,10 @@ class CinBase:
                             if cbTS.directShowCand and not cbTS.dayisymbolsmode:
                                 if cbTS.cin.isInCharDef(cbTS.compositionChar):
                                     candidates = cbTS.cin.getCharDef(cbTS.compositionChar)
-                                    if cbTS.sortByPhrase and candidates:
-                                        candidates = self.sortByPhrase(cbTS, copy.deepcopy(candidates))
+                                    if candidates:
+                                        candidates = self.rankCandidates(cbTS, candidates)
                                 if candidates:
-                                    pagecandidates = list(self.chunks(candidates, cbTS.candPerPage))
+                                    pagecandidates = CandidatePages(candidates, cbTS.candPerPage)
                                     cbTS.setCandidateList(pagecandidates[currentCandPage])
                                     cbTS.setShowCandidates(True)
                         elif len(cbTS.compositionChar) == 0 and charStr == '`':
@@ -2201,16 +2212,18 @@ class CinBase:
                             cbTS.multifunctionmode = True
                             if not cbTS.compositionBufferMode:
                                 cbTS.setCompositionString(cbTS.compositionChar)
-                        elif keyEvent.isPrintableChar() and not keyEvent.isKeyDown(VK_SHIFT) and cbTS.shapeMode == HALFSHAPE_MODE:
+                        elif keyContext.isPrintable and not keyContext.isShiftDown and cbTS.shapeMode == HALFSHAPE_MODE:
                             if cbTS.compositionBufferMode:
                                 self.setCompositionBufferString(cbTS, charStr, 0)
                             else:
                                 cbTS.setCommitString(charStr)
 
                 # 更新選字視窗游標位置及頁數
+                phaseStart = cbTS.keyStats.begin()
                 cbTS.setCandidateCursor(candCursor)
                 cbTS.setCandidatePage(currentCandPage)
                 cbTS.setCandidateList(pagecandidates[currentCandPage])
+                cbTS.keyStats.end("reply", phaseStart)
 
                 if cbTS.showPhrase and cbTS.phrasemode:
                     cbTS.isShowPhraseCandidates = True
@@ -2252,10 +2265,21 @@ class CinBase:
         #print('DurationTime: ' + str(time.time() - cbTS.lastKeyDownTime))
         #print('Cursor = ' + str(cbTS.compositionBufferCursor))
         #print('Type = ' + cbTS.compositionBufferType)
-        #print(cbTS.compositionBufferChar)
+        #print(cbTS.compositionBuffer.infos)
 
         return True
 
+    # 傳回這個輸入法的按鍵處理統計 (只有 DEBUG_MODE 才會記錄)
+    def getStats(self, cbTS):
+        stats = cbTS.keyStats.getStats()
+        if stats:
+            stats["opencc"] = opencc.pool.get_stats()
+            hits = stats["counters"].get("keyContextHit", 0)
+            total = hits + stats["counters"].get("keyContextMiss", 0)
+            stats["keyContextHitRate"] = round(hits / total, 3) if total else None
+        return stats
+
+
     # 使用者放開按鍵，在 app 收到前先過濾那些鍵是輸入法需要的。
     # return True，系統會呼叫 onKeyUp() 進一步處理這個按鍵
     # return False，表示我們不需要這個鍵，系統會原封不動把按鍵傳給應用程式
@@ -2532,10 +2556,10 @@ class CinBase:
     # 設定輸出成簡體中文
     def setOutputSimplifiedChinese(self, cbTS, outputSimpChinese):
         cbTS.outputSimpChinese = outputSimpChinese
-        # 建立 OpenCC instance 用來做繁簡體中文轉換
+        # 取得所有 TextService 共用的 OpenCC instance 用來做繁簡體中文轉換
         if outputSimpChinese:
             if not cbTS.opencc:
-                cbTS.opencc = opencc.OpenCC(opencc.OPENCC_DEFAULT_CONFIG_TRAD_TO_SIMP)
+                cbTS.opencc = opencc.get_opencc(opencc.OPENCC_DEFAULT_CONFIG_TRAD_TO_SIMP)
         else:
             cbTS.opencc = None
 
@@ -2552,6 +2576,7 @@ class CinBase:
                 r = windll.shell32.ShellExecuteW(None, "open", python_exe, config_tool, self.cinbasecurdir, 0)  # SW_HIDE = 0 (hide the window)
             elif commandId == 1:
                 self.setOutputSimplifiedChinese(cbTS, not cbTS.outputSimpChinese)
+                cbTS.configOverrides["outputSimpChinese"] = cbTS.outputSimpChinese
         elif commandType == 1: # 功能開關
             commandItem = cbTS.smenuitems[commandId]
             if commandItem == "fullShapeSymbols":
@@ -2572,6 +2597,7 @@ class CinBase:
                 cbTS.imeReverseLookup = not cbTS.imeReverseLookup
             elif commandItem == "homophoneQuery":
                 cbTS.homophoneQuery = not cbTS.homophoneQuery
+            cbTS.configOverrides[commandItem] = getattr(cbTS, commandItem)
 
 
     def switchMenuType(self, cbTS, menutype, prevmenutypelist):
@@ -2604,23 +2630,30 @@ class CinBase:
         if menutype == 5:
             cbTS.menucandidates = cbTS.menucandidates = cbTS.flangs.getKeyNames()
         if menutype == 7:
-            cbTS.menucandidates = self.emojimenulist
+            return self.setMenuPages(cbTS, self.emoji.getPages("menu", self.emojimenulist, cbTS.candPerPage))
         if menutype == 8:
-            if cbTS.emojitype == 0:
-                cbTS.menucandidates = self.emoji.emoticons_keynames
-            elif cbTS.emojitype == 1:
-                cbTS.menucandidates = self.emoji.pictographs_keynames
-            elif cbTS.emojitype == 2:
-                cbTS.menucandidates = self.emoji.miscellaneous_keynames
-            elif cbTS.emojitype == 3:
-                cbTS.menucandidates = self.emoji.dingbats_keynames
-            elif cbTS.emojitype == 4:
-                cbTS.menucandidates = self.emoji.transport_keynames
+            if cbTS.emojitype < len(EMOJI_TYPES):
+                return self.setMenuPages(cbTS, self.emoji.getKeyNamePages(EMOJI_TYPES[cbTS.emojitype], cbTS.candPerPage))
             elif cbTS.emojitype == 5:
-                cbTS.menucandidates = self.emoji.modifiercolor
+                return self.setMenuPages(cbTS, self.emoji.getModifierColorPages(cbTS.candPerPage))
+
+        return self.getMenuPages(cbTS)
+
+
+    # 目前選單的候選清單分頁，清單沒有改變時沿用上次的分頁
+    def getMenuPages(self, cbTS):
+        pages = cbTS.menupages
+        if pages is None or not pages.candidates is cbTS.menucandidates or not pages.candPerPage == cbTS.candPerPage:
+            pages = CandidatePages(cbTS.menucandidates, cbTS.candPerPage)
+            cbTS.menupages = pages
+        return pages
+
 
-        pagecandidates = list(self.chunks(cbTS.menucandidates, cbTS.candPerPage))
-        return pagecandidates
+    # 使用預先切好的分頁 (表情符號選單) 作為目前選單
+    def setMenuPages(self, cbTS, pages):
+        cbTS.menucandidates = pages.candidates
+        cbTS.menupages = pages
+        return pages
 
 
     # 重置輸入的字根
@@ -2648,6 +2681,7 @@ class CinBase:
         cbTS.homophoneStr = ''
         cbTS.isHomophoneChardefs = False
         cbTS.homophonecandidates = []
+        cbTS.homophonepagecandidates = []
         cbTS.selcandmode = False
         cbTS.lastCompositionCharLength = 0
 
@@ -2656,6 +2690,7 @@ class CinBase:
         if cbTS.compositionBufferMode:
             cbTS.compositionBufferCursor = 0
             cbTS.compositionBufferString = ''
+            cbTS.compositionBuffer.clear()
             cbTS.setCompositionString('')
 
     # 重置同音字模式
@@ -2666,6 +2701,7 @@ class CinBase:
         cbTS.homophoneStr = ''
         cbTS.isHomophoneChardefs = False
         cbTS.homophonecandidates = []
+        cbTS.homophonepagecandidates = []
 
     # 判斷數字鍵?
     def isNumberChar(self, keyCode):
@@ -2734,77 +2770,60 @@ class CinBase:
             charStr = chr(charCode)
         return charStr
 
-    def sortByPhrase(self, cbTS, candidates):
-        sortbyphraselist = []
-        if cbTS.userphrase.isInCharDef(cbTS.lastCommitString):
-            sortbyphraselist = cbTS.userphrase.getCharDef(cbTS.lastCommitString)
-        if PhraseData.phrase.isInCharDef(cbTS.lastCommitString):
-            if len(sortbyphraselist) == 0:
-                sortbyphraselist = PhraseData.phrase.getCharDef(cbTS.lastCommitString)
-            else:
-                plist = PhraseData.phrase.getCharDef(cbTS.lastCommitString)
-                for pstr in plist:
-                    if not pstr in sortbyphraselist:
-                        sortbyphraselist.append(pstr)
-
-        i = 0
-        if len(sortbyphraselist) > 0:
-            for pStr in sortbyphraselist:
-                if pStr in candidates:
-                    candidates.remove(pStr)
-                    candidates.insert(i, pStr)
-                    i += 1
+    # 依選字頻率及聯想字詞排序候選清單
+    def rankCandidates(self, cbTS, candidates):
+        phaseStart = cbTS.keyStats.begin()
+        if cbTS.learnCandFrequency and cbTS.candFrequency is not None:
+            candidates = cbTS.candFrequency.rank(cbTS.compositionChar, candidates, cbTS.cin.version)
+        if cbTS.sortByPhrase:
+            candidates = self.sortByPhrase(cbTS, candidates)
+        cbTS.keyStats.end("rank", phaseStart)
         return candidates
 
-    # List 分段
-    def chunks(self, l, n):
-        for i in range(0, len(l), n):
-            yield l[i:i+n]
+    def sortByPhrase(self, cbTS, candidates):
+        if PhraseData.phrase is None:
+            return candidates
+        phraseview = PhraseViews.getView(cbTS.userphrase, PhraseData.phrase)
+        return cbTS.phraseRanker.rank(candidates, cbTS.lastCommitString, cbTS.compositionChar, cbTS.cin.version,
+                                      (phraseview,), lambda: phraseview.getCharDef(cbTS.lastCommitString))
 
     def getKeyState(self, keyCode):
         return ctypes.WinDLL("User32.dll").GetKeyState(keyCode)
 
+    # 把游標前 removeStringLength 個字元換成 compositionString
     def setCompositionBufferString(self, cbTS, compositionString, removeStringLength):
-        compPos1 = cbTS.compositionBufferCursor - removeStringLength
-        compPos2 = cbTS.compositionBufferCursor - len(cbTS.compositionBufferString)
-        if compPos2 < 0:
-            cbTS.compositionBufferString = cbTS.compositionBufferString[:compPos1] + compositionString + cbTS.compositionBufferString[compPos2:]
-        else:
-            cbTS.compositionBufferString = cbTS.compositionBufferString[:compPos1] + compositionString
-
-        cbTS.compositionBufferCursor += len(compositionString) - removeStringLength
+        phaseStart = cbTS.keyStats.begin()
+        cbTS.compositionBufferCursor = cbTS.compositionBuffer.replace(cbTS.compositionBufferCursor, removeStringLength, compositionString)
+        cbTS.compositionBufferString = cbTS.compositionBuffer.getText()
         cbTS.setCompositionString(cbTS.compositionBufferString)
         cbTS.setCompositionCursor(cbTS.compositionBufferCursor)
+        cbTS.keyStats.end("composition", phaseStart)
 
+    # 記錄 compositionCursor 前一個字元的字根類型及字根
     def setCompositionBufferChar(self, cbTS, compositionType, compositionChar, compositionCursor):
-        if compositionCursor - 1 in cbTS.compositionBufferChar:
-            for key in sorted(cbTS.compositionBufferChar.keys(), reverse=True):
-                if key >= compositionCursor - 1:
-                    cbTS.compositionBufferChar[key + 1] = cbTS.compositionBufferChar.pop(key)
-        cbTS.compositionBufferChar[compositionCursor - 1] = [compositionType, compositionChar]
+        phaseStart = cbTS.keyStats.begin()
+        cbTS.compositionBuffer.setInfo(compositionCursor - 1, [compositionType, compositionChar])
+        cbTS.keyStats.end("composition", phaseStart)
 
+    # 刪除游標前 (removeBefore) 或游標後的 removeStringLength 個字元
     def removeCompositionBufferString(self, cbTS, removeStringLength, removeBefore):
+        phaseStart = cbTS.keyStats.begin()
         if removeBefore:
-            compPos1 = cbTS.compositionBufferCursor - removeStringLength
-            compPos2 = cbTS.compositionBufferCursor - len(cbTS.compositionBufferString)
-            if compPos2 < 0:
-                cbTS.compositionBufferString = cbTS.compositionBufferString[:compPos1] + cbTS.compositionBufferString[compPos2:]
-            else:
-                cbTS.compositionBufferString = cbTS.compositionBufferString[:compPos1]
-            cbTS.compositionBufferCursor -= removeStringLength
+            cbTS.compositionBufferCursor = cbTS.compositionBuffer.delete(cbTS.compositionBufferCursor, removeStringLength)
         else:
-            compPos1 = cbTS.compositionBufferCursor
-            compPos2 = cbTS.compositionBufferCursor - len(cbTS.compositionBufferString) + removeStringLength
-            if compPos2 < 0:
-                cbTS.compositionBufferString = cbTS.compositionBufferString[:compPos1] + cbTS.compositionBufferString[compPos2:]
-            else:
-                cbTS.compositionBufferString = cbTS.compositionBufferString[:compPos1]
-            cbTS.compositionBufferCursor = cbTS.compositionBufferCursor
+            cbTS.compositionBufferCursor = cbTS.compositionBuffer.delete(cbTS.compositionBufferCursor, 0, removeStringLength)
+        cbTS.compositionBufferString = cbTS.compositionBuffer.getText()
 
         cbTS.setCompositionString(cbTS.compositionBufferString)
         cbTS.setCompositionCursor(cbTS.compositionBufferCursor)
+        cbTS.keyStats.end("composition", phaseStart)
 
     def setOutputString(self, cbTS, RCinTable, commitStr):
+        # 記錄選字頻率
+        if cbTS.learnCandFrequency and cbTS.candFrequency is not None and cbTS.compositionChar and not cbTS.isWildcardChardefs and not cbTS.homophonemode:
+            if cbTS.cin.isInCharDef(cbTS.compositionChar) and commitStr in cbTS.cin.getCharDef(cbTS.compositionChar):
+                cbTS.candFrequency.update(cbTS.compositionChar, commitStr)
+
         # 如果使用萬用字元解碼
         if cbTS.isWildcardChardefs:
             if not cbTS.client.isUiLess:
@@ -2817,10 +2836,10 @@ class CinBase:
 
         if cbTS.imeReverseLookup:
             if RCinTable.cin is not None:
-                if not RCinTable.cin.getCharEncode(commitStr) == "":
+                message = RCinTable.cin.getCharEncode(commitStr)
+                if not message == "":
                     if not cbTS.client.isUiLess:
                         cbTS.isShowMessage = True
-                        message = RCinTable.cin.getCharEncode(commitStr)
                         if not cbTS.client.isMetroApp:
                             cbTS.showMessageOnKeyUp = True
                             cbTS.onKeyUpMessage = message
@@ -2844,7 +2863,9 @@ class CinBase:
 
         # 如果使用打繁出簡，就轉成簡體中文
         if cbTS.outputSimpChinese:
+            phaseStart = cbTS.keyStats.begin()
             commitStr = cbTS.opencc.convert(commitStr)
+            cbTS.keyStats.end("opencc", phaseStart)
 
         if not cbTS.compositionBufferMode:
             cbTS.setCommitString(commitStr)
@@ -2859,9 +2880,14 @@ class CinBase:
                 else:
                     RemoveStringLength = self.calcRemoveStringLength(cbTS)
             else:
-                self.removeCompositionBufferString(cbTS, 1, False if cbTS.compositionBufferCursor < len(cbTS.compositionBufferString) else True)
+                # 重新選字時保留原本的字根資訊
+                removeBefore = False if cbTS.compositionBufferCursor < len(cbTS.compositionBufferString) else True
+                selCharInfo = cbTS.compositionBuffer.getInfo(cbTS.compositionBufferCursor - 1 if removeBefore else cbTS.compositionBufferCursor)
+                self.removeCompositionBufferString(cbTS, 1, removeBefore)
             self.setCompositionBufferString(cbTS, commitStr, RemoveStringLength)
-            if not cbTS.selcandmode:
+            if cbTS.selcandmode:
+                cbTS.compositionBuffer.setInfo(cbTS.compositionBufferCursor - len(commitStr), selCharInfo)
+            else:
                 strLength = len(commitStr)
                 if strLength > 1:
                     for cStr in commitStr:
@@ -2989,39 +3015,18 @@ class CinBase:
 
         self.applyConfig(cbTS) # 套用其餘的使用者設定
         
+        # 資料檔由整個程序共用的快取取得，檔案未變更時不需重新讀取
         datadirs = (cfg.getConfigDir(), cfg.getDataDir())
-        swkbPath = cfg.findFile(datadirs, "swkb.dat")
-        with io.open(swkbPath, 'r', encoding='utf-8') as fs:
-            cbTS.swkb = swkb(fs)
-
-        symbolsPath = cfg.findFile(datadirs, "symbols.dat")
-        with io.open(symbolsPath, 'r', encoding='utf-8') as fs:
-            cbTS.symbols = symbols(fs)
-
-        fsymbolsPath = cfg.findFile(datadirs, "fsymbols.dat")
-        with io.open(fsymbolsPath, 'r', encoding='utf-8') as fs:
-            cbTS.fsymbols = fsymbols(fs)
-
-        flangsPath = cfg.findFile(datadirs, "flangs.dat")
-        with io.open(flangsPath, 'r', encoding='utf-8') as fs:
-            cbTS.flangs = flangs(fs)
-
-        userphrasePath = cfg.findFile(datadirs, "userphrase.dat")
-        with io.open(userphrasePath, 'r', encoding='utf-8') as fs:
-            cbTS.userphrase = userphrase(fs)
-
-        msymbolsPath = cfg.findFile(datadirs, "msymbols.json")
-        with io.open(msymbolsPath, 'r', encoding='utf-8') as fs:
-            cbTS.msymbols = msymbols(fs)
-
-        extendtablePath = cfg.findFile(datadirs, "extendtable.dat")
-        with io.open(extendtablePath, 'r', encoding='utf8') as fs:
-            cbTS.extendtable = extendtable(fs)
+        cbTS.swkb = DataCache.getData(datadirs, "swkb.dat", swkb)
+        cbTS.symbols = DataCache.getData(datadirs, "symbols.dat", symbols)
+        cbTS.fsymbols = DataCache.getData(datadirs, "fsymbols.dat", fsymbols)
+        cbTS.flangs = DataCache.getData(datadirs, "flangs.dat", flangs)
+        cbTS.userphrase = DataCache.getData(datadirs, "userphrase.dat", userphrase)
+        cbTS.msymbols = DataCache.getData(datadirs, "msymbols.json", msymbols)
+        cbTS.extendtable = DataCache.getData(datadirs, "extendtable.dat", extendtable)
 
         if cbTS.useDayiSymbols:
-            dsymbolsPath = cfg.findFile(datadirs, "dsymbols.json")
-            with io.open(dsymbolsPath, 'r', encoding='utf8') as fs:
-                cbTS.dsymbols = dsymbols(fs)
+            cbTS.dsymbols = DataCache.getData(datadirs, "dsymbols.json", dsymbols)
 
         if not PhraseData.phrase and not PhraseData.loading:
             loadPhraseData = LoadPhraseData(cbTS, PhraseData)
@@ -3031,8 +3036,16 @@ class CinBase:
 
 
     def applyConfig(self, cbTS):
-        cfg = cbTS.cfg # 所有 TextService 共享一份設定物件
-        cbTS.configVersion = cfg.getVersion()
+        cfg = cbTS.cfg.getSnapshot() # 同一個輸入法共用的唯讀設定
+        # 設定檔中同一個選項之後又被變更 (例如設定工具)，就改用設定檔的值，不再保留選單的變更
+        lastCfg = cbTS.configSnapshot
+        if lastCfg is not None and cbTS.configOverrides:
+            for name in list(cbTS.configOverrides):
+                if not cfg.get(name) == lastCfg.get(name):
+                    del cbTS.configOverrides[name]
+        cbTS.configSnapshot = cfg
+        cbTS.configGeneration = cfg.generation
+        cbTS.configVersion = cbTS.cfg.getVersion()
 
         # 每列顯示幾個候選字
         cbTS.candPerRow = cfg.candPerRow
@@ -3084,6 +3097,10 @@ class CinBase:
         # 優先以聯想字詞排序候選清單?
         cbTS.sortByPhrase = cfg.sortByPhrase
 
+        # 依選字頻率排序候選清單?
+        cbTS.learnCandFrequency = cfg.learnCandFrequency
+        cbTS.candFrequency = CandFrequencies.getStore(cbTS.cfg.getConfigDir()) if cfg.learnCandFrequency else None
+
         # 拆錯字碼時自動清除輸入字串?
         cbTS.autoClearCompositionChar = cfg.autoClearCompositionChar
 
@@ -3139,6 +3156,13 @@ class CinBase:
         if cbTS.imeDirName == "chedayi":
             cbTS.selDayiSymbolCharType = cfg.selDayiSymbolCharType
 
+        # 套用在這個 TextService 中從選單變更的設定
+        for name, value in cbTS.configOverrides.items():
+            if name == "outputSimpChinese":
+                self.setOutputSimplifiedChinese(cbTS, value)
+            else:
+                setattr(cbTS, name, value)
+
 
     # 檢查設定檔是否有被更改，是否需要套用新設定
     def checkConfigChange(self, cbTS, CinTable, RCinTable, HCinTable):
@@ -3147,11 +3171,6 @@ class CinBase:
         reLoadCinTable = False
         updateExtendTable = False
 
-        if hasattr(cbTS, 'cin'):
-            if hasattr(cbTS.cin, 'cincount'):
-                if not os.path.exists(cbTS.cin.getCountFile()):
-                    cbTS.cin.saveCountFile()
-
         # 如果有更換輸入法碼表，就重新載入碼表資料
         if not CinTable.loading:
             if not CinTable.curCinType == cfg.selCinType:
@@ -3164,7 +3183,7 @@ class CinBase:
                 updateExtendTable = True
                 reLoadCinTable = True
                 cfg.reLoadTable = False
-                cfg.save()
+                cfg.save() # 設定檔在背景寫入，不會再觸發重新載入
 
             if not CinTable.userExtendTable == cfg.userExtendTable:
                 updateExtendTable = True
@@ -3191,9 +3210,10 @@ class CinBase:
         # 比較我們先前存的版本號碼，和目前設定檔的版本號
         if cfg.isFullReloadNeeded(cbTS.configVersion):
             # 資料改變需整個 reload，重建一個新的 checj context
+            DataCache.expire()
             self.initCinBaseContext(cbTS)
-        elif cfg.isConfigChanged(cbTS.configVersion):
-            # 只有偵測到設定檔變更，需要套用新設定
+        elif not cbTS.configGeneration == cfg.getGeneration():
+            # 設定檔已重新載入，需要套用新設定
             self.applyConfig(cbTS)
 
         if reLoadCinTable or updateExtendTable:
@@ -3201,9 +3221,8 @@ class CinBase:
             if updateExtendTable:
                 if hasattr(cbTS, 'extendtable'):
                     del cbTS.extendtable
-                extendtablePath = cfg.findFile(datadirs, "extendtable.dat")
-                with io.open(extendtablePath, encoding='utf-8') as fs:
-                    cbTS.extendtable = extendtable(fs)
+                DataCache.expire()
+                cbTS.extendtable = DataCache.getData(datadirs, "extendtable.dat", extendtable)
             if reLoadCinTable:
                 cbTS.reLoadCinTable = True
             loadCinFile = LoadCinTable(cbTS, CinTable)
@@ -3212,11 +3231,6 @@ class CinBase:
             if not cbTS.cin == CinTable.cin:
                 cbTS.cin = CinTable.cin
 
-        if DEBUG_MODE:
-            if not cbTS.debugLog == cbTS.debug.debugLog:
-                if not CinTable.loading and (not cbTS.imeReverseLookup or not RCinTable.loading) and (not cbTS.homophoneQuery or not HCinTable.loading):
-                    cbTS.debug.saveDebugLog(cbTS.debugLog)
-
 
 CinBase = CinBase()
 
@@ -3244,8 +3258,7 @@ class LoadPhraseData(threading.Thread):
         self.PhraseData.phrase = None
 
         phrasePath = cfg.findFile(datadirs, "phrase.json")
-        with io.open(phrasePath, 'r', encoding='utf8') as fs:
-            self.PhraseData.phrase = phrase(fs)
+        self.PhraseData.phrase = phrasestore(phrasePath, cfg.getCacheDir())
         self.PhraseData.loading = False
 
 
@@ -3284,9 +3297,7 @@ class LoadCinTable(threading.Thread):
         if not hasattr(self.cbTS, 'extendtable'):
             if self.cbTS.cfg.userExtendTable:
                 datadirs = (self.cbTS.cfg.getConfigDir(), self.cbTS.cfg.getDataDir())
-                extendtablePath = self.cbTS.cfg.findFile(datadirs, "extendtable.dat")
-                with io.open(extendtablePath, encoding='utf-8') as fs:
-                    self.cbTS.extendtable = extendtable(fs)
+                self.cbTS.extendtable = DataCache.getData(datadirs, "extendtable.dat", extendtable)
             else:
                 self.cbTS.extendtable = {}
         self.cbTS.cin.updateCinTable(self.cbTS.cfg.userExtendTable, self.cbTS.cfg.priorityExtendTable, self.cbTS.extendtable, self.cbTS.cfg.ignorePrivateUseArea)
@@ -3297,7 +3308,7 @@ class LoadCinTable(threading.Thread):
 
         if DEBUG_MODE:
             self.cbTS.debug.setEndTimer("LoadCinTable")
-            self.cbTS.debugLog[time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()) + " [C]"] = self.cbTS.debug.info['brand'] + ":「" + self.cbTS.debug.jsonNameDict[selCinFile] + "」碼表載入時間約為 " + self.cbTS.debug.getDurationTime("LoadCinTable") + " 秒"
+            self.cbTS.debug.log("C", "「" + self.cbTS.debug.jsonNameDict[selCinFile] + "」碼表載入時間約為 " + self.cbTS.debug.getDurationTime("LoadCinTable") + " 秒")
 
 
 class LoadRCinTable(threading.Thread):
@@ -3332,7 +3343,7 @@ class LoadRCinTable(threading.Thread):
         if os.path.exists(jsonPath):
             self.cbTS.RCinFileNotExist = False
             with io.open(jsonPath, 'r', encoding='utf8') as fs:
-                self.RCinTable.cin = RCin(fs, self.cbTS.imeDirName)
+                self.RCinTable.cin = RCin(fs, self.cbTS.imeDirName, jsonPath, self.cbTS.cfg.getCacheDir())
         else:
             self.cbTS.RCinFileNotExist = True
             
@@ -3341,7 +3352,7 @@ class LoadRCinTable(threading.Thread):
 
         if DEBUG_MODE:
             self.cbTS.debug.setEndTimer("LoadRCinTable")
-            self.cbTS.debugLog[time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()) + " [R]"] = self.cbTS.debug.info['brand'] + ":「" + self.cbTS.debug.jsonNameDict[selCinFile] + "」反查碼表載入時間約為 " + self.cbTS.debug.getDurationTime("LoadRCinTable") + " 秒"
+            self.cbTS.debug.log("R", "「" + self.cbTS.debug.jsonNameDict[selCinFile] + "」反查碼表載入時間約為 " + self.cbTS.debug.getDurationTime("LoadRCinTable") + " 秒")
 
 
 class LoadHCinTable(threading.Thread):
@@ -3370,4 +3381,4 @@ class LoadHCinTable(threading.Thread):
 
         if DEBUG_MODE:
             self.cbTS.debug.setEndTimer("LoadHCinTable")
-            self.cbTS.debugLog[time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()) + " [H]"] = self.cbTS.debug.info['brand'] + ":「" + self.cbTS.debug.jsonNameDict[selCinFile] + "」同音字碼表載入時間約為 " + self.cbTS.debug.getDurationTime("LoadHCinTable") + " 秒"
+            self.cbTS.debug.log("H", "「" + self.cbTS.debug.jsonNameDict[selCinFile] + "」同音字碼表載入時間約為 " + self.cbTS.debug.getDurationTime("LoadHCinTable") + " 秒")
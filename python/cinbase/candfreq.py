@@ -0,0 +1,122 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+import os
+import threading
+from backgroundWriter import backgroundWriter
+
+# 選字記錄在背景寫入，連續選字時合併成一次寫檔
+FLUSH_DELAY = 2.0
+# 記錄檔行數超過不重複項目數的兩倍 (且至少這麼多行) 時重新整理記錄檔
+COMPACT_MIN_LINES = 1000
+
+
+# 選字頻率記錄
+# 記錄檔每行為 "字根\t候選字\t次數"，平常只附加新的選字，定期在背景合併重寫
+class CandFrequency(object):
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.counts = {} # 字根 => {候選字: 次數}
+        self.versions = {} # 字根 => 選字更新次數
+        self.ranked = {} # 字根 => (原候選清單, 碼表版本, 選字更新次數, 排序後候選清單)
+        self.pending = [] # 尚未寫入記錄檔的選字
+        self.entryCount = 0
+        self.logLines = 0
+        self.lock = threading.Lock()
+        self.load()
+
+
+    def load(self):
+        try:
+            if not os.path.exists(self.filename):
+                return
+            with open(self.filename, "r", encoding="utf8") as f:
+                for line in f:
+                    fields = line.rstrip("\n").split("\t")
+                    if len(fields) == 3:
+                        self.addCount(fields[0], fields[1], int(fields[2]))
+                        self.logLines += 1
+        except Exception:
+            pass # FIXME: handle I/O errors?
+
+
+    def addCount(self, key, cand, count):
+        keyCounts = self.counts.setdefault(key, {})
+        if not cand in keyCounts:
+            keyCounts[cand] = 0
+            self.entryCount += 1
+        keyCounts[cand] += count
+
+
+    def update(self, key, cand):
+        with self.lock:
+            self.addCount(key, cand, 1)
+            self.versions[key] = self.versions.get(key, 0) + 1
+            self.pending.append(key + "\t" + cand + "\t1\n")
+        backgroundWriter.schedule(self.filename, self.flush, FLUSH_DELAY)
+
+
+    def rank(self, key, candidates, tableVersion):
+        keyCounts = self.counts.get(key)
+        if not keyCounts:
+            return candidates
+
+        keyVersion = self.versions.get(key, 0)
+        entry = self.ranked.get(key)
+        if entry is not None and entry[0] is candidates and entry[1] == tableVersion and entry[2] == keyVersion:
+            return entry[3]
+
+        # 穩定排序: 選字次數相同的候選字維持碼表順序
+        ranked = sorted(candidates, key=lambda cand: -keyCounts.get(cand, 0))
+        self.ranked[key] = (candidates, tableVersion, keyVersion, ranked)
+        return ranked
+
+
+    # 在背景執行緒中執行
+    def flush(self):
+        with self.lock:
+            lines = self.pending
+            self.pending = []
+            compact = (self.logLines + len(lines)) > max(COMPACT_MIN_LINES, 2 * self.entryCount)
+            if compact:
+                lines = [key + "\t" + cand + "\t" + str(count) + "\n" for key, keyCounts in self.counts.items() for cand, count in keyCounts.items()]
+                self.logLines = len(lines)
+            else:
+                self.logLines += len(lines)
+
+        if not lines:
+            return
+        try:
+            if compact:
+                tempFile = self.filename + ".tmp"
+                with open(tempFile, "w", encoding="utf8") as f:
+                    f.writelines(lines)
+                os.replace(tempFile, self.filename)
+            else:
+                with open(self.filename, "a", encoding="utf8") as f:
+                    f.writelines(lines)
+        except Exception:
+            pass # FIXME: handle I/O errors?
+
+
+# 每個輸入法共用一份選字頻率記錄
+class CandFrequencies(object):
+
+    def __init__(self):
+        self.stores = {}
+        self.lock = threading.Lock()
+
+
+    def getStore(self, configDir):
+        filename = os.path.join(configDir, "candfreq.log")
+        with self.lock:
+            store = self.stores.get(filename)
+            if store is None:
+                store = CandFrequency(filename)
+                self.stores[filename] = store
+            return store
+
+
+CandFrequencies = CandFrequencies()
+
+__all__ = ["CandFrequency", "CandFrequencies"]
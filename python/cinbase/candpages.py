@@ -0,0 +1,54 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+
+
+# 候選清單分頁檢視
+# 不預先切出所有分頁，只在取用某一頁時才切出該頁，可以像分頁 list 一樣使用:
+# pagecandidates[currentCandPage]、len(pagecandidates)
+# 內容固定的清單 (例如表情符號選單) 可以呼叫 precompute() 預先切好所有分頁，之後取頁不再配置記憶體
+class CandidatePages(object):
+    __slots__ = ("candidates", "candPerPage", "candCount", "pageCount", "pages")
+
+    def __init__(self, candidates, candPerPage):
+        self.candidates = candidates
+        self.candPerPage = candPerPage
+        self.candCount = len(candidates)
+        self.pageCount = (self.candCount + candPerPage - 1) // candPerPage
+        self.pages = None
+
+
+    def precompute(self):
+        self.pages = tuple([tuple(self.candidates[start:start + self.candPerPage]) for start in range(0, self.candCount, self.candPerPage)])
+
+
+    def __len__(self):
+        return self.pageCount
+
+
+    def __getitem__(self, page):
+        if page < 0:
+            page += self.pageCount
+        if page < 0 or page >= self.pageCount:
+            raise IndexError("candidate page out of range")
+        if self.pages is not None:
+            return self.pages[page]
+        start = page * self.candPerPage
+        return self.candidates[start:start + self.candPerPage]
+
+
+    def __iter__(self):
+        for page in range(self.pageCount):
+            yield self[page]
+
+
+    # 某一頁的候選字數量 (不需切出該頁)
+    def getPageSize(self, page):
+        return max(0, min(self.candPerPage, self.candCount - page * self.candPerPage))
+
+
+    # 候選清單中第 index 個候選字所在的 (頁數, 游標位置)
+    def locate(self, index):
+        return divmod(index, self.candPerPage)
+
+
+__all__ = ["CandidatePages"]
@@ -4,6 +4,12 @@ import os
 import re
 import json
 import copy
+import itertools
+import functools
+from backgroundWriter import backgroundWriter
+
+# 每次載入或更新碼表都會取得新的版本號
+cinVersion = itertools.count(1)
 
 
 class Cin(object):
@@ -11,6 +17,9 @@ class Cin(object):
     # TODO check the possiblility if the encoding is not utf-8
     encoding = 'utf-8'
 
+    # 已寫入 (或已排入背景寫入) 的 cincount.json 內容，同一份碼表不重複寫檔
+    savedCinCount = {}
+
     def __init__(self, fs, imeDirName, ignorePrivateUseArea):
         self.imeDirName = imeDirName
         self.ignorePrivateUseArea = ignorePrivateUseArea
@@ -24,6 +33,9 @@ class Cin(object):
         self.chardefs = {}
         self.privateuse = {}
         self.dupchardefs = {}
+        self.keyBits = {} # 字根 => 位元
+        self.keyChars = [] # 位元順序 (依字根排序) 的字根
+        self.nextKeys = {} # 字根前綴 => 可接在後面的字根位元圖
 
         self.charsetRange = {}
         self.charsetRange['bopomofo'] = [int('0x3100', 16), int('0x3130', 16)]
@@ -52,6 +64,8 @@ class Cin(object):
                         newvalue.remove(value)
                 self.chardefs[key] = newvalue
 
+        self.buildNextKeys()
+        self.version = next(cinVersion)
         self.saveCountFile()
 
 
@@ -61,12 +75,14 @@ class Cin(object):
         del self.chardefs
         del self.privateuse
         del self.dupchardefs
+        del self.nextKeys
 
         self.keynames = {}
         self.cincount = {}
         self.chardefs = {}
         self.privateuse = {}
         self.dupchardefs = {}
+        self.nextKeys = {}
 
 
     def getEname(self):
@@ -108,6 +124,58 @@ class Cin(object):
         return self.chardefs[key]
 
 
+    # 為每個字根前綴建立「可接在後面的字根」位元圖
+    # 依字根排序配置位元，由低位元往高位元走訪即為字根排序
+    def buildNextKeys(self):
+        self.keyChars = sorted(set("".join(self.chardefs)))
+        self.keyBits = dict([(char, 1 << i) for i, char in enumerate(self.keyChars)])
+        self.nextKeys = {}
+        for key in self.chardefs:
+            self.addNextKeys(key)
+
+
+    # 由最長的前綴往回加，遇到已經有這個位元的前綴，表示更短的前綴也都已經加過
+    def addNextKeys(self, key):
+        nextKeys = self.nextKeys
+        keyBits = self.keyBits
+        for i in range(len(key) - 1, -1, -1):
+            prefix = key[:i]
+            bits = nextKeys.get(prefix, 0)
+            bit = keyBits[key[i]]
+            if bits & bit:
+                break
+            nextKeys[prefix] = bits | bit
+
+
+    # 沒有這個字根，也沒有以它開頭的字根，再輸入任何字根都不會有候選字
+    def isDeadEnd(self, key):
+        return not key in self.chardefs and not key in self.nextKeys
+
+
+    # 依字根排序列出符合 pattern (長度相同，萬用字元可代表任一字根) 的字根
+    def matchKeys(self, pattern, wildcardChar, prefix=""):
+        pos = len(prefix)
+        if pos == len(pattern):
+            if prefix in self.chardefs:
+                yield prefix
+            return
+        nextKeys = self.nextKeys.get(prefix, 0)
+        if not nextKeys:
+            return
+        char = pattern[pos]
+        if char == wildcardChar:
+            i = 0
+            while nextKeys:
+                if nextKeys & 1:
+                    for key in self.matchKeys(pattern, wildcardChar, prefix + self.keyChars[i]):
+                        yield key
+                nextKeys >>= 1
+                i += 1
+        elif nextKeys & self.keyBits.get(char, 0):
+            for key in self.matchKeys(pattern, wildcardChar, prefix + char):
+                yield key
+
+
     def haveNextCharDef(self, key):
         chardefslist = []
         for chardef in self.chardefs:
@@ -120,7 +188,6 @@ class Cin(object):
 
     def getWildcardCharDefs(self, CompositionChar, WildcardChar, candMaxItems):
         wildcardchardefs = []
-        matchchardefs = {}
         lowFrequencyChardefs = {}
         highFrequencyCharSetList = ["bopomofo", "bopomofoTone", "cjk", "big5F", "big5LF", "big5S"]
         lowFrequencyCharSetList = ["cjkExtA", "cjkExtB", "cjkExtC", "cjkExtD", "cjkExtE", "pua", "cjkOther"]
@@ -131,43 +198,33 @@ class Cin(object):
         for i in range(7):
             lowFrequencyChardefs[i] = []
 
-        keyLength = len(CompositionChar)
+        # 依字根前綴位元圖只走訪可能符合的字根，不需排序及比對整個碼表
+        matchchardefs = (self.chardefs[key] for key in self.matchKeys(CompositionChar, WildcardChar))
 
-        matchstring = CompositionChar
-        for char in ['\\', '.', '*', '?', '+', '[', '{', '|', '(', ')', '^', '$']:
-            if char in matchstring:
-                if not char == WildcardChar:
-                    matchstring = matchstring.replace(char, '\\' + char)
-
-        matchstring = matchstring.replace(WildcardChar, '(.)')
-        sortedchardefs = sorted(self.chardefs.keys())
-        matchchardefs = [self.chardefs[key] for key in sortedchardefs if re.match('^' + matchstring + '$', key) and len(key) == keyLength]
-
-        if matchchardefs:
-            for chardef in matchchardefs:
-                for matchstr in chardef:
-                    if len(matchstr) > 1:
-                        charSet = self.getCharSet(matchstr[0])
-                    else:
-                        charSet = self.getCharSet(matchstr)
+        for chardef in matchchardefs:
+            for matchstr in chardef:
+                if len(matchstr) > 1:
+                    charSet = self.getCharSet(matchstr[0])
+                else:
+                    charSet = self.getCharSet(matchstr)
 
-                    if charSet in highFrequencyCharSetList:
-                        wildcardchardefs.append(matchstr)
-                        highFrequencyWordCount += 1
-                        if len(wildcardchardefs) >= candMaxItems:
-                            return wildcardchardefs
-                    else:
-                        i = lowFrequencyCharSetList.index(charSet)
-                        if not matchstr in lowFrequencyChardefs[i]:
-                            lowFrequencyChardefs[i].append(matchstr)
-                            lowFrequencyWordCount += 1
-
-            for key in lowFrequencyChardefs:
-                for char in lowFrequencyChardefs[key]:
-                    if not char in wildcardchardefs:
-                        wildcardchardefs.append(char)
+                if charSet in highFrequencyCharSetList:
+                    wildcardchardefs.append(matchstr)
+                    highFrequencyWordCount += 1
                     if len(wildcardchardefs) >= candMaxItems:
                         return wildcardchardefs
+                else:
+                    i = lowFrequencyCharSetList.index(charSet)
+                    if not matchstr in lowFrequencyChardefs[i]:
+                        lowFrequencyChardefs[i].append(matchstr)
+                        lowFrequencyWordCount += 1
+
+        for key in lowFrequencyChardefs:
+            for char in lowFrequencyChardefs[key]:
+                if not char in wildcardchardefs:
+                    wildcardchardefs.append(char)
+                if len(wildcardchardefs) >= candMaxItems:
+                    return wildcardchardefs
         return wildcardchardefs
 
 
@@ -191,6 +248,7 @@ class Cin(object):
 
     def updateCinTable(self, userExtendTable, priorityExtendTable, extendtable, ignorePrivateUseArea):
         if userExtendTable:
+            rebuildNextKeys = False
             for key in extendtable.chardefs:
                 for root in extendtable.chardefs[key]:
                     if priorityExtendTable:
@@ -204,20 +262,41 @@ class Cin(object):
                             self.chardefs[key.lower()].append(root)
                         except KeyError:
                             self.chardefs[key.lower()] = [root]
+                # 新字根只需加入前綴位元圖，出現新的字根字元才需要重建
+                if key.lower() in self.chardefs:
+                    if all(char in self.keyBits for char in key.lower()):
+                        self.addNextKeys(key.lower())
+                    else:
+                        rebuildNextKeys = True
+            if rebuildNextKeys:
+                self.buildNextKeys()
+            self.version = next(cinVersion)
 
 
     def saveCountFile(self):
         filename = self.getCountFile()
+        if Cin.savedCinCount.get(filename) == self.cincount:
+            return
+        Cin.savedCinCount[filename] = self.cincount
+        # 寫檔交給背景執行緒處理，不佔用目前的執行緒
+        backgroundWriter.schedule(filename, functools.partial(self.writeCountFile, filename, self.cincount))
+
+
+    @staticmethod
+    def writeCountFile(filename, cincount):
         tempcincount = {}
 
         if os.path.exists(filename) and not os.stat(filename).st_size == 0:
-            with open(filename, "r") as f:
-                tempcincount.update(json.load(f))
+            try:
+                with open(filename, "r") as f:
+                    tempcincount.update(json.load(f))
+            except Exception:
+                pass
 
-        if not tempcincount == self.cincount:
+        if not tempcincount == cincount:
             try:
                 with open(filename, "w") as f:
-                    js = json.dump(self.cincount, f, sort_keys=True, indent=4)
+                    js = json.dump(cincount, f, sort_keys=True, indent=4)
             except Exception:
                 pass # FIXME: handle I/O errors?
 
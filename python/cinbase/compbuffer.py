@@ -0,0 +1,124 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+
+
+# 組字編輯模式 (compositionBufferMode) 使用的編輯緩衝區
+# 以 gap buffer 儲存文字，並為每個字元保存一份資訊 (字根類型, 字根)
+# 插入及刪除只需移動空隙到游標位置，連續在同一處編輯時為 O(1)
+# 字元資訊跟著字元一起移動，不需要在插入或刪除時重新編排位置
+class CompositionBuffer(object):
+
+    def __init__(self, capacity=32):
+        self.chars = [None] * capacity
+        self.infos = [None] * capacity
+        self.gapStart = 0
+        self.gapEnd = capacity
+        self.text = ""
+
+
+    def __len__(self):
+        return len(self.chars) - (self.gapEnd - self.gapStart)
+
+
+    def clear(self):
+        for i in range(len(self.chars)):
+            self.chars[i] = None
+            self.infos[i] = None
+        self.gapStart = 0
+        self.gapEnd = len(self.chars)
+        self.text = ""
+
+
+    def getText(self):
+        if self.text is None:
+            self.text = "".join(self.chars[:self.gapStart]) + "".join(self.chars[self.gapEnd:])
+        return self.text
+
+
+    # 把空隙移動到 pos (文字中的位置)
+    def moveGap(self, pos):
+        pos = max(0, min(pos, len(self)))
+        if pos < self.gapStart:
+            count = self.gapStart - pos
+            self.chars[self.gapEnd - count:self.gapEnd] = self.chars[pos:self.gapStart]
+            self.infos[self.gapEnd - count:self.gapEnd] = self.infos[pos:self.gapStart]
+            self.gapStart = pos
+            self.gapEnd -= count
+        elif pos > self.gapStart:
+            count = pos - self.gapStart
+            self.chars[self.gapStart:self.gapStart + count] = self.chars[self.gapEnd:self.gapEnd + count]
+            self.infos[self.gapStart:self.gapStart + count] = self.infos[self.gapEnd:self.gapEnd + count]
+            self.gapStart += count
+            self.gapEnd += count
+        return pos
+
+
+    # 空隙不足時，容量加倍
+    def ensureGap(self, size):
+        if self.gapEnd - self.gapStart >= size:
+            return
+        grow = max(size, len(self.chars))
+        self.chars[self.gapEnd:self.gapEnd] = [None] * grow
+        self.infos[self.gapEnd:self.gapEnd] = [None] * grow
+        self.gapEnd += grow
+
+
+    # 在 cursor 位置插入文字，新字元沒有字元資訊，傳回插入後的游標位置
+    def insert(self, cursor, text):
+        cursor = self.moveGap(cursor)
+        self.ensureGap(len(text))
+        for char in text:
+            self.chars[self.gapStart] = char
+            self.infos[self.gapStart] = None
+            self.gapStart += 1
+        if text:
+            self.text = None
+        return self.gapStart
+
+
+    # 刪除 cursor 前 before 個字元及後 after 個字元 (連同字元資訊)，傳回刪除後的游標位置
+    def delete(self, cursor, before, after=0):
+        cursor = self.moveGap(cursor)
+        before = max(0, min(before, self.gapStart))
+        after = max(0, min(after, len(self.chars) - self.gapEnd))
+        for i in range(self.gapStart - before, self.gapStart):
+            self.chars[i] = None
+            self.infos[i] = None
+        for i in range(self.gapEnd, self.gapEnd + after):
+            self.chars[i] = None
+            self.infos[i] = None
+        self.gapStart -= before
+        self.gapEnd += after
+        if before or after:
+            self.text = None
+        return self.gapStart
+
+
+    # 把 cursor 前 before 個字元換成 text，傳回取代後的游標位置
+    def replace(self, cursor, before, text):
+        cursor = self.delete(cursor, before)
+        return self.insert(cursor, text)
+
+
+    def indexToSlot(self, pos):
+        return pos if pos < self.gapStart else pos + (self.gapEnd - self.gapStart)
+
+
+    def getInfo(self, pos):
+        if pos < 0 or pos >= len(self):
+            return None
+        return self.infos[self.indexToSlot(pos)]
+
+
+    def setInfo(self, pos, info):
+        if 0 <= pos < len(self):
+            self.infos[self.indexToSlot(pos)] = info
+
+
+    # 清除所有字元資訊，文字不變
+    def clearInfo(self):
+        for i in range(len(self.infos)):
+            self.infos[i] = None
+
+
+__all__ = ["CompositionBuffer"]
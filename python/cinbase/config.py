@@ -19,7 +19,10 @@ import json
 import os
 import io
 import time
+import types
 import shutil
+import threading
+from backgroundWriter import ConfigFileWriter
 
 DEF_FONT_SIZE = 12
 
@@ -56,6 +59,7 @@ class CinBaseConfig:
         self.easySymbolsWithShift = False
         self.showPhrase = False
         self.sortByPhrase = True
+        self.learnCandFrequency = False
         self.supportWildcard = True
         self.compositionBufferMode = False
         self.autoMoveCursorInBrackets = False
@@ -72,7 +76,7 @@ class CinBaseConfig:
         self.keyboardType = 0
         self.selDayiSymbolCharType = 0
 
-        self.ignoreSaveList = ["ignoreSaveList", "curdir", "cinFileList", "selCinFile", "imeDirName", "_version", "_lastUpdateTime"]
+        self.ignoreSaveList = ["ignoreSaveList", "curdir", "cinFileList", "selCinFile", "imeDirName", "_version", "_lastUpdateTime", "_generation", "_snapshot", "_configWriter"]
         self.curdir = os.path.abspath(os.path.dirname(__file__))
         self.cinFileList = []
         self.selCinFile = ""
@@ -81,6 +85,11 @@ class CinBaseConfig:
         # version: last modified time of (config.json, symbols.dat, swkb.dat, fsymbols.dat, flangs.dat, userphrase.dat)
         self._version = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
         self._lastUpdateTime = 0.0
+        # generation: increased every time the config file is (re)loaded
+        self._generation = 0
+        self._snapshot = None
+        # config.json is saved in the background, and needs no reload when written by ourselves
+        self._configWriter = ConfigFileWriter()
 
     def getConfigDir(self):
         config_dir = os.path.join(os.path.expandvars("%APPDATA%"), "PIME", self.imeDirName)
@@ -90,6 +99,12 @@ class CinBaseConfig:
     def getConfigFile(self, name="config.json"):
         return os.path.join(self.getConfigDir(), name)
 
+    # cache files generated from the tables, shared by all input methods
+    def getCacheDir(self):
+        cache_dir = os.path.join(os.path.expandvars("%APPDATA%"), "PIME", "cache")
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        return cache_dir
+
     def getSelKeys(self):
         return selKeys[self.selKeyType]
 
@@ -114,20 +129,15 @@ class CinBaseConfig:
                 self.__dict__.update(json.load(f))
         except Exception:
             self.save()
+        self._generation += 1
         self.update()
 
     def toJson(self):
         return {key: value for key, value in self.__dict__.items() if not key.startswith("_") and not key in self.ignoreSaveList}
 
+    # the file is written later in the background writer thread
     def save(self):
-        filename = self.getConfigFile()
-        try:
-            with open(filename, "w") as f:
-                jsondata = {key: value for key, value in self.__dict__.items() if not key in self.ignoreSaveList}
-                js = json.dump(jsondata, f, sort_keys=True, indent=4)
-            self.update()
-        except Exception:
-            pass # FIXME: handle I/O errors?
+        self._configWriter.save(self.getConfigFile(), json.dumps(self.toJson(), sort_keys=True, indent=4))
 
     def getDataDir(self):
         return os.path.join(os.path.dirname(__file__), "data")
@@ -218,6 +228,9 @@ class CinBaseConfig:
                 pass
 
         lastConfigTime = self._version[0]
+        if lastConfigTime != configTime and self._configWriter.isSavedByUs(configTime):
+            # our own settings are already loaded, don't reload them
+            configTime = lastConfigTime
         self._version = (configTime, symbolsTime, ezSymbolsTime, fsymbolsTime, flangsTime, userphraseTime)
 
         # the main config file is changed, reload it
@@ -232,6 +245,16 @@ class CinBaseConfig:
     def getVersion(self):
         return self._version
 
+    def getGeneration(self):
+        return self._generation
+
+    # return a read-only snapshot of the current settings
+    # the snapshot is shared until the config file is reloaded
+    def getSnapshot(self):
+        if self._snapshot is None or self._snapshot.generation != self._generation:
+            self._snapshot = ConfigSnapshot(self.toJson(), self._generation)
+        return self._snapshot
+
     def isConfigChanged(self, currentVersion):
         return currentVersion[0] != self._version[0]
 
@@ -243,6 +266,48 @@ class CinBaseConfig:
         return currentVersion[1:] != self._version[1:]
 
 
+# immutable view of the settings of one input method
+class ConfigSnapshot:
+    __slots__ = ("_values", "generation")
+
+    def __init__(self, values, generation):
+        object.__setattr__(self, "_values", types.MappingProxyType(dict(values)))
+        object.__setattr__(self, "generation", generation)
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("config snapshot is read-only")
+
+    def get(self, name, default=None):
+        return self._values.get(name, default)
+
+
+# config objects shared by all text service instances of the same input method
+class CinBaseConfigs:
+    def __init__(self, configClass):
+        self.configClass = configClass
+        self.configs = {}
+        self.lock = threading.Lock()
+
+    def getConfig(self, imeDirName, cinFileList):
+        with self.lock:
+            cfg = self.configs.get(imeDirName)
+            if cfg is None:
+                cfg = self.configClass()
+                cfg.imeDirName = imeDirName
+                cfg.cinFileList = cinFileList
+                cfg.load()
+                self.configs[imeDirName] = cfg
+            return cfg
+
+
+CinBaseConfigs = CinBaseConfigs(CinBaseConfig)
+
 # globally shared config object
 # load configurations from a user-specific config file
 CinBaseConfig = CinBaseConfig()
@@ -25,8 +25,14 @@ import random
 import json
 import threading
 
+# The backgroundWriter module is in the parent python dir, which is not in
+# sys.path when this script is launched directly from the cinbase dir.
+# FIXME: set PYTHONPATH properly so we don't need to add this hack.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from config import CinBaseConfig
 from cin import Cin
+from backgroundWriter import writeFileAtomic
 from ctypes import c_uint, byref, create_string_buffer
 
 cfg = CinBaseConfig
@@ -170,8 +176,8 @@ class ConfigHandler(BaseHandler):
 
     def save_file(self, filename, data):
         try:
-            with open(os.path.join(config_dir, filename), "w", encoding="UTF-8") as f:
-                f.write(data)
+            # the running input method may reload config.json at any time
+            writeFileAtomic(os.path.join(config_dir, filename), data, "UTF-8")
         except Exception:
             pass
 
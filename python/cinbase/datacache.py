@@ -0,0 +1,61 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+import io
+import os
+import time
+import threading
+
+# 同一個資料檔在這段時間 (秒) 內不重複檢查檔案狀態
+CHECK_INTERVAL = 3.0
+
+
+# 整個程序共用的資料檔快取
+# 解析後的物件依 (實際路徑, mtime, size) 快取並在各 TextService 間共用，使用時不可修改
+class DataCache(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {} # (實際路徑, 解析類別) => ((mtime, size), 解析後的物件)
+        self.lookups = {} # (搜尋目錄, 檔名, 解析類別) => (上次檢查時間, 解析後的物件)
+
+
+    # 在 dirs 中依序尋找 name，以 parser(fs) 解析後傳回
+    def getData(self, dirs, name, parser, encoding='utf-8'):
+        lookupKey = (tuple(dirs), name, parser)
+        with self.lock:
+            lookup = self.lookups.get(lookupKey)
+            if lookup is not None and (time.time() - lookup[0]) < CHECK_INTERVAL:
+                return lookup[1]
+
+        path = None
+        for dirname in dirs:
+            if os.path.exists(os.path.join(dirname, name)):
+                path = os.path.realpath(os.path.join(dirname, name))
+                break
+        if path is None:
+            raise IOError("data file not found: " + name)
+
+        stat = os.stat(path)
+        fileKey = (stat.st_mtime_ns, stat.st_size)
+        entryKey = (path, parser)
+        with self.lock:
+            entry = self.entries.get(entryKey)
+        if entry is None or not entry[0] == fileKey:
+            with io.open(path, 'r', encoding=encoding) as fs:
+                entry = (fileKey, parser(fs))
+
+        with self.lock:
+            self.entries[entryKey] = entry
+            self.lookups[lookupKey] = (time.time(), entry[1])
+        return entry[1]
+
+
+    # 資料檔可能已變更，下次取用時重新檢查檔案狀態
+    def expire(self):
+        with self.lock:
+            self.lookups.clear()
+
+
+DataCache = DataCache()
+
+__all__ = ["DataCache"]
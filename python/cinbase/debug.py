@@ -1,44 +1,104 @@
 import os
-import copy
 import time
-import json
+import threading
+from backgroundWriter import backgroundWriter
 from cinbase.tools import cpuinfo
 
+# 除錯記錄檔超過這個大小就換新檔 (舊檔改名為 debug.log.1)
+MAX_LOG_SIZE = 1024 * 1024
+# 記錄先暫存在記憶體，最後一筆記錄之後這麼多秒才一次寫入
+FLUSH_DELAY = 2.0
+
+JSON_NAMES = ({"checj.json": "酷倉", "mscj3.json": "倉頡", "mscj3-ext.json": "倉頡(大字集)", "cj-ext.json": "雅虎倉頡", "cnscj.json": "中標倉頡",
+                "thcj.json": "泰瑞倉頡", "newcj3.json": "亂倉打鳥", "cj5.json": "倉頡五代", "newcj.json": "自由大新倉頡", "scj6.json": "快倉六代",
+                "thphonetic.json": "泰瑞注音", "CnsPhonetic.json": "中標注音", "bpmf.json": "傳統注音", "tharray.json": "泰瑞行列30", "array30.json": "行列30",
+                "ar30-big.json": "行列30大字集", "array40.json": "行列40", "thdayi.json": "泰瑞大易四碼", "dayi4.json": "大易四碼", "dayi3.json": "大易三碼",
+                "ez.json": "輕鬆", "ezsmall.json": "輕鬆小詞庫", "ezmid.json": "輕鬆中詞庫", "ezbig.json": "輕鬆大詞庫", "thpinyin.json": "泰瑞拼音",
+                "pinyin.json": "正體拼音", "roman.json": "羅馬拼音", "simplecj.json": "正體簡易", "simplex.json": "速成", "simplex5.json": "簡易五代",
+                "liu.json": "嘸蝦米"})
+
+_cpuInfo = None
+_cpuInfoLock = threading.Lock()
+
+
+# 偵測 CPU 需要執行外部程式，整個程序只做一次，而且等到第一次在背景寫入記錄時才做
+def getCpuInfo():
+    global _cpuInfo
+    with _cpuInfoLock:
+        if _cpuInfo is None:
+            try:
+                _cpuInfo = cpuinfo.get_cpu_info() or {}
+            except Exception:
+                _cpuInfo = {}
+        return _cpuInfo
+
+
+# 除錯記錄檔: 每筆記錄附加一行到 debug.log，由 backgroundWriter 在背景批次寫入
+# 記錄先以 (時間, 分類, 訊息) 暫存，寫入時才加上 CPU 名稱，按鍵時不會等待偵測 CPU
+# 同一個輸入法的所有 TextService 共用一個記錄檔
+class DebugLogSink(object):
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.records = []
+
+
+    def append(self, timestamp, tag, message):
+        with self.lock:
+            self.records.append((timestamp, tag, message))
+        backgroundWriter.schedule(self.filename, self.flush, FLUSH_DELAY)
+
+
+    def flush(self):
+        with self.lock:
+            records = self.records
+            self.records = []
+        if not records:
+            return
+        brand = getCpuInfo().get('brand', '')
+        try:
+            if os.path.getsize(self.filename) > MAX_LOG_SIZE:
+                os.replace(self.filename, self.filename + ".1")
+        except OSError:
+            pass
+        with open(self.filename, 'a', encoding='utf8') as f:
+            f.write("".join("%s [%s] %s:%s\n" % (timestamp, tag, brand, message) for timestamp, tag, message in records))
+
+
+_sinks = {}
+_sinksLock = threading.Lock()
+
+
+def getDebugLogSink(filename):
+    with _sinksLock:
+        sink = _sinks.get(filename)
+        if sink is None:
+            sink = DebugLogSink(filename)
+            _sinks[filename] = sink
+        return sink
+
+
 class Debug:
     def __init__(self, imeDirName):
-        self.info = cpuinfo.get_cpu_info()
-        self.debugLog = {}
         self.startTime = {}
         self.endTime = {}
         self.imeDirName = imeDirName
-        self.jsonNameDict = ({"checj.json": "酷倉", "mscj3.json": "倉頡", "mscj3-ext.json": "倉頡(大字集)", "cj-ext.json": "雅虎倉頡", "cnscj.json": "中標倉頡",
-                        "thcj.json": "泰瑞倉頡", "newcj3.json": "亂倉打鳥", "cj5.json": "倉頡五代", "newcj.json": "自由大新倉頡", "scj6.json": "快倉六代",
-                        "thphonetic.json": "泰瑞注音", "CnsPhonetic.json": "中標注音", "bpmf.json": "傳統注音", "tharray.json": "泰瑞行列30", "array30.json": "行列30",
-                        "ar30-big.json": "行列30大字集", "array40.json": "行列40", "thdayi.json": "泰瑞大易四碼", "dayi4.json": "大易四碼", "dayi3.json": "大易三碼",
-                        "ez.json": "輕鬆", "ezsmall.json": "輕鬆小詞庫", "ezmid.json": "輕鬆中詞庫", "ezbig.json": "輕鬆大詞庫", "thpinyin.json": "泰瑞拼音",
-                        "pinyin.json": "正體拼音", "roman.json": "羅馬拼音", "simplecj.json": "正體簡易", "simplex.json": "速成", "simplex5.json": "簡易五代",
-                        "liu.json": "嘸蝦米"})
+        self.jsonNameDict = JSON_NAMES
+        self.sink = getDebugLogSink(self.getConfigFile())
+
+    @property
+    def info(self):
+        return getCpuInfo()
 
     def getConfigDir(self):
         config_dir = os.path.join(os.path.expandvars("%APPDATA%"), "PIME", self.imeDirName)
         os.makedirs(config_dir, mode=0o700, exist_ok=True)
         return config_dir
 
-    def getConfigFile(self, name="debug.json"):
+    def getConfigFile(self, name="debug.log"):
         return os.path.join(self.getConfigDir(), name)
 
-    def loadDebugLog(self):
-        jsondata = {}
-        filename = self.getConfigFile()
-        if os.path.isfile(filename):
-            try:
-                with open(filename, 'r', encoding='utf8') as f:
-                    jsondata = json.load(f)
-            except Exception:
-                pass # FIXME: handle I/O errors?
-        self.debugLog = copy.deepcopy(jsondata)
-        return jsondata
-
     def setStartTimer(self, timerName):
         self.startTime[timerName] = time.time()
 
@@ -49,13 +109,8 @@ class Debug:
         durationTime = round(self.endTime[timerName] - self.startTime[timerName], 2)
         return str(durationTime)
 
-    def saveDebugLog(self, debugLog):
-        filename = self.getConfigFile()
-        try:
-            with open(filename, 'w', encoding='utf8') as f:
-                js = json.dump(debugLog, f, ensure_ascii=False, sort_keys=True, indent=4)
-            self.debugLog = copy.deepcopy(debugLog)
-        except Exception:
-            pass # FIXME: handle I/O errors?
+    # 加入一筆除錯記錄，格式為 "時間 [分類] CPU:訊息"
+    def log(self, tag, message):
+        self.sink.append(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()), tag, message)
 
-__all__ = ["Debug"]
+__all__ = ["Debug", "DebugLogSink", "getCpuInfo"]
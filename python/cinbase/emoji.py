@@ -4,6 +4,23 @@ import os
 import re
 import json
 
+from .candpages import CandidatePages
+
+
+# 選單中的表情符號分類 (依 emojitype 順序)，及各分類子頁面對應 emoji.json 的鍵值 (依 *_keynames 順序)
+EMOJI_TYPES = ["emoticons", "pictographs", "miscellaneous", "dingbats", "transport"]
+EMOJI_CATEGORIES = {
+    "dingbats": ["miscellaneous", "crosses", "starsandsnows", "fleurons", "punctuationmarks", "brackets", "digits", "arrows", "arithmetics"], # "rockets" (Ornamental Dingbats)
+    "emoticons": ["faces", "catfaces", "animal", "gesture"],
+    "miscellaneous": (["weathers", "miscellaneous", "chess", "pointinghand", "warningsigns", "medical", "religiousandpolitical", "yijingtrigram", "emoticons",
+                      "zodiacal", "musical", "syriaccross", "recycling", "map", "gender", "circlesandpentagram", "genealogical", "sport", "trafficsigns"]),
+    "pictographs": (["portraitandrole", "animal", "plant", "romance", "heart", "comicstyle", "bubble", "weatherandlandscape", "globe", "moonsunandstar",
+                    "food", "fruitandvegetable", "beverage", "celebration", "musical", "entertainment", "game", "sport", "buildingandmap", "flag",
+                    "miscellaneous", "facialparts", "hand", "clothing", "personalcare", "medical", "schoolgrade", "money", "office", "communication",
+                    "audioandvideo", "religious", "userinterface", "wordswitharrows", "tool", "geometricshapes", "clockface", "computer"]),
+    "transport": ["vehicles", "trafficsigns", "accommodation", "miscellaneous"]
+}
+
 class emoji(object):
 
     # TODO check the possiblility if the encoding is not utf-8
@@ -12,35 +29,53 @@ class emoji(object):
     def __init__(self, fs):
         self.__dict__.update(json.load(fs))
 
+        # 載入時就建好 分類名稱 => 候選字 的對照表，選單瀏覽時不需再查找或複製清單
+        self.keyNames = {}
+        self.charDefs = {}
+        for emojitype, categories in EMOJI_CATEGORIES.items():
+            keynames = tuple(getattr(self, emojitype + "_keynames"))
+            emojidict = getattr(self, emojitype)
+            self.keyNames[emojitype] = keynames
+            self.charDefs[emojitype] = dict(zip(keynames, [tuple(emojidict[key]) for key in categories]))
+            setattr(self, emojitype + "_keynames", keynames)
+        self.modifiercolor = tuple(self.modifiercolor)
+
+        # (選單名稱, 每頁候選字數量) => 預先切好的分頁
+        self.pages = {}
+
 
     def getCharDef(self, emojitype, keyname):
-        if emojitype == "dingbats":
-            keyindex = self.dingbats_keynames.index(keyname)
-            keys = ["miscellaneous", "crosses", "starsandsnows", "fleurons", "punctuationmarks", "brackets", "digits", "arrows", "arithmetics"] # "rockets" (Ornamental Dingbats)
-            return self.dingbats[keys[keyindex]]
-        elif emojitype == "emoticons":
-            keyindex = self.emoticons_keynames.index(keyname)
-            keys = ["faces", "catfaces", "animal", "gesture"]
-            return self.emoticons[keys[keyindex]]
-        elif emojitype == "miscellaneous":
-            keyindex = self.miscellaneous_keynames.index(keyname)
-            keys = (["weathers", "miscellaneous", "chess", "pointinghand", "warningsigns", "medical", "religiousandpolitical", "yijingtrigram", "emoticons",
-                    "zodiacal", "musical", "syriaccross", "recycling", "map", "gender", "circlesandpentagram", "genealogical", "sport", "trafficsigns"])
-            return self.miscellaneous[keys[keyindex]]
-        elif emojitype == "pictographs":
-            keyindex = self.pictographs_keynames.index(keyname)
-            keys = (["portraitandrole", "animal", "plant", "romance", "heart", "comicstyle", "bubble", "weatherandlandscape", "globe", "moonsunandstar",
-                    "food", "fruitandvegetable", "beverage", "celebration", "musical", "entertainment", "game", "sport", "buildingandmap", "flag",
-                    "miscellaneous", "facialparts", "hand", "clothing", "personalcare", "medical", "schoolgrade", "money", "office", "communication",
-                    "audioandvideo", "religious", "userinterface", "wordswitharrows", "tool", "geometricshapes", "clockface", "computer"])
-            return self.pictographs[keys[keyindex]]
-        elif emojitype == "transport":
-            keyindex = self.transport_keynames.index(keyname)
-            keys = ["vehicles", "trafficsigns", "accommodation", "miscellaneous"]
-            return self.transport[keys[keyindex]]
-        return []
-
-    def getKeyNames(self, emojidict):
-        return emojidict
-
-__all__ = ["emoji"]
+        charDefs = self.charDefs.get(emojitype)
+        if charDefs is None:
+            return ()
+        return charDefs[keyname]
+
+
+    def getKeyNames(self, emojitype):
+        return self.keyNames.get(emojitype, ())
+
+
+    # 取得某個選單預先切好的分頁，同一個選單及每頁數量只會切一次
+    def getPages(self, name, candidates, candPerPage):
+        key = (name, candPerPage)
+        pages = self.pages.get(key)
+        if pages is None:
+            pages = CandidatePages(tuple(candidates), candPerPage)
+            pages.precompute()
+            self.pages[key] = pages
+        return pages
+
+
+    def getCharDefPages(self, emojitype, keyname, candPerPage):
+        return self.getPages(emojitype + "," + keyname, self.getCharDef(emojitype, keyname), candPerPage)
+
+
+    def getKeyNamePages(self, emojitype, candPerPage):
+        return self.getPages(emojitype, self.getKeyNames(emojitype), candPerPage)
+
+
+    def getModifierColorPages(self, candPerPage):
+        return self.getPages("modifiercolor", self.modifiercolor, candPerPage)
+
+
+__all__ = ["emoji", "EMOJI_TYPES"]
@@ -3,6 +3,7 @@ from __future__ import unicode_literals
 import os
 import re
 import json
+from .candpages import CandidatePages
 
 
 class HCin(object):
@@ -22,12 +23,29 @@ class HCin(object):
 
         self.__dict__.update(json.load(fs))
 
+        # 字 => 已排序的字根清單
+        self.charindex = {}
+        for key in sorted(self.chardefs):
+            for char in self.chardefs[key]:
+                keyList = self.charindex.setdefault(char, [])
+                if not keyList or not keyList[-1] == key:
+                    keyList.append(key)
+
+        self.keynamecache = {}
+        self.homophonecache = {}
+        self.homophonepages = {}
+
 
     def __del__(self):
         del self.keynames
         del self.chardefs
+        del self.charindex
         self.keynames = {}
         self.chardefs = {}
+        self.charindex = {}
+        self.keynamecache = {}
+        self.homophonecache = {}
+        self.homophonepages = {}
 
     def getEname(self):
         return self.ename
@@ -45,22 +63,42 @@ class HCin(object):
         return self.keynames[key]
 
     def isHaveKey(self, val):
-        return True if [key for key, value in self.chardefs.items() if val in value] else False
+        return val in self.charindex
 
     def getKey(self, val):
-        return [key for key, value in self.chardefs.items() if val in value][0]
+        return self.charindex[val][0]
 
     def getKeyList(self, val):
-        return [key for key, value in sorted(self.chardefs.items()) if val in value]
+        return self.charindex.get(val, [])
 
-    def getKeyNameList(self, keyList):
-        result = []
-        for key in keyList:
+    def getKeyNames(self, key):
+        if not key in self.keynamecache:
             keyname = ''
             for char in key:
                 keyname += self.getKeyName(char)
-            result.append(keyname)
-        return result
+            self.keynamecache[key] = keyname
+        return self.keynamecache[key]
+
+    def getKeyNameList(self, keyList):
+        return [self.getKeyNames(key) for key in keyList]
+
+    # 同音字候選清單: index 為 None 時傳回讀音清單，否則傳回第 index 個讀音的同音字
+    def getHomophoneCandidates(self, val, index=None):
+        cachekey = (val, index)
+        if not cachekey in self.homophonecache:
+            if index is None:
+                self.homophonecache[cachekey] = self.getKeyNameList(self.getKeyList(val))
+            else:
+                self.homophonecache[cachekey] = self.getCharDef(self.getKeyList(val)[index])
+        return self.homophonecache[cachekey]
+
+    # 同音字候選清單分頁
+    def getHomophonePages(self, val, index, candPerPage):
+        cachekey = (val, index, candPerPage)
+        if not cachekey in self.homophonepages:
+            candidates = self.getHomophoneCandidates(val, index)
+            self.homophonepages[cachekey] = CandidatePages(candidates, candPerPage)
+        return self.homophonepages[cachekey]
 
     def isInCharDef(self, key):
         return key in self.chardefs
@@ -0,0 +1,51 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+from keycodes import *  # for VK_XXX constants
+
+# filterKeyDown 與 onKeyDown 的 seqNum 最多相差多少仍視為同一次按鍵
+MAX_SEQ_DISTANCE = 2
+
+
+# 每次按鍵的共用資訊
+# 同一個按鍵 TSF 會先送 filterKeyDown 再送 onKeyDown，
+# 在 filterKeyDown 算好的結果由 onKeyDown 沿用，不必重新計算
+class KeyContext(object):
+    __slots__ = ("keyCode", "charCode", "scanCode", "seqNum", "cin", "keyboardLayout",
+                 "charStr", "charStrLow", "isInKeyName", "layoutCharStr", "layoutIsInKeyName",
+                 "isAltDown", "isCtrlDown", "isShiftDown", "isNumLockOn", "isPrintable")
+
+    def __init__(self, cbTS, keyEvent):
+        self.keyCode = keyEvent.keyCode
+        self.charCode = keyEvent.charCode
+        self.scanCode = keyEvent.scanCode
+        self.seqNum = keyEvent.seqNum
+        self.cin = getattr(cbTS, "cin", None) # 碼表還沒載入完成時尚未設定
+        self.keyboardLayout = cbTS.keyboardLayout
+
+        self.charStr = chr(self.charCode)
+        self.charStrLow = self.charStr.lower()
+        self.isAltDown = keyEvent.isKeyDown(VK_MENU)
+        self.isCtrlDown = keyEvent.isKeyDown(VK_CONTROL)
+        self.isShiftDown = keyEvent.isKeyDown(VK_SHIFT)
+        self.isNumLockOn = keyEvent.isKeyToggled(VK_NUMLOCK)
+        self.isPrintable = keyEvent.isPrintableChar()
+        self.isInKeyName = self.cin is not None and self.cin.isInKeyName(self.charStrLow)
+
+        # 非預設鍵盤時，對映到預設鍵盤的按鍵
+        self.layoutCharStr = None
+        self.layoutIsInKeyName = False
+        if not self.keyboardLayout == 0:
+            kbtype = cbTS.kbtypelist[self.keyboardLayout]
+            if self.charStrLow in kbtype:
+                self.layoutCharStr = cbTS.kbtypelist[0][kbtype.index(self.charStrLow)]
+                self.layoutIsInKeyName = self.cin is not None and self.cin.isInKeyName(self.layoutCharStr.lower())
+
+
+    # 是否為同一次按鍵，且輸入法碼表及鍵盤設定沒有改變
+    def matches(self, cbTS, keyEvent):
+        return (self.keyCode == keyEvent.keyCode and self.charCode == keyEvent.charCode and self.scanCode == keyEvent.scanCode
+                and 0 < keyEvent.seqNum - self.seqNum <= MAX_SEQ_DISTANCE
+                and self.cin is getattr(cbTS, "cin", None) and self.keyboardLayout == cbTS.keyboardLayout)
+
+
+__all__ = ["KeyContext", "MAX_SEQ_DISTANCE"]
@@ -0,0 +1,128 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+import time
+import threading
+
+# 每處理這麼多次 onKeyDown 就把統計摘要寫入除錯記錄
+LOG_INTERVAL = 1000
+
+
+# onKeyDown 各階段的耗時及計數統計
+# 用法: start = stats.begin() ... stats.end("lookup", start)
+# 各階段可以互相包含 (例如 lookup 包含 rank)，耗時分別計算
+class KeyStats(object):
+    enabled = True
+
+    def __init__(self, imeDirName):
+        self.imeDirName = imeDirName
+        self.lock = threading.Lock()
+        self.reset()
+
+
+    def reset(self):
+        with self.lock:
+            self.phases = {} # 階段名稱 => [次數, 總耗時, 最大耗時]
+            self.counters = {}
+
+
+    def begin(self):
+        return time.perf_counter()
+
+
+    def end(self, name, start):
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            phase = self.phases.get(name)
+            if phase is None:
+                self.phases[name] = [1, elapsed, elapsed]
+            else:
+                phase[0] += 1
+                phase[1] += elapsed
+                if elapsed > phase[2]:
+                    phase[2] = elapsed
+
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+
+    def getCount(self, name):
+        with self.lock:
+            phase = self.phases.get(name)
+            return phase[0] if phase is not None else self.counters.get(name, 0)
+
+
+    def getStats(self):
+        with self.lock:
+            phases = {}
+            for name, (count, total, maximum) in self.phases.items():
+                phases[name] = {
+                    "count": count,
+                    "totalMs": round(total * 1000, 3),
+                    "avgMs": round(total * 1000 / count, 3),
+                    "maxMs": round(maximum * 1000, 3)
+                }
+            return {"imeDirName": self.imeDirName, "phases": phases, "counters": dict(self.counters)}
+
+
+    # 除錯記錄用的一行摘要
+    def getSummary(self):
+        stats = self.getStats()
+        items = []
+        for name, phase in sorted(stats["phases"].items()):
+            items.append("%s %d次 平均 %.3fms 最長 %.3fms" % (name, phase["count"], phase["avgMs"], phase["maxMs"]))
+        for name, count in sorted(stats["counters"].items()):
+            items.append("%s %d" % (name, count))
+        return "; ".join(items)
+
+
+# 未啟用統計時使用，所有方法都不做任何事
+class NullKeyStats(object):
+    enabled = False
+
+    def reset(self):
+        pass
+
+    def begin(self):
+        return 0
+
+    def end(self, name, start):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def getCount(self, name):
+        return 0
+
+    def getStats(self):
+        return {}
+
+    def getSummary(self):
+        return ""
+
+
+NullKeyStats = NullKeyStats()
+
+
+# 同一個輸入法的所有 TextService 共用一份統計
+class KeyStatsRegistry(object):
+
+    def __init__(self):
+        self.stats = {}
+        self.lock = threading.Lock()
+
+
+    def getStats(self, imeDirName):
+        with self.lock:
+            stats = self.stats.get(imeDirName)
+            if stats is None:
+                stats = KeyStats(imeDirName)
+                self.stats[imeDirName] = stats
+            return stats
+
+
+KeyStatsRegistry = KeyStatsRegistry()
+
+__all__ = ["KeyStats", "NullKeyStats", "KeyStatsRegistry", "LOG_INTERVAL"]
@@ -0,0 +1,56 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+from collections import OrderedDict
+
+
+# 依聯想字詞排序候選清單
+# 每個 lastCommitString 只建立一次排序權重，排序結果以
+# (lastCommitString, compositionChar, 碼表版本) 快取
+class PhraseRanker(object):
+
+    def __init__(self, maxCacheSize=64):
+        self.maxCacheSize = maxCacheSize
+        self.clear()
+
+
+    def clear(self):
+        self.priorityKey = None
+        self.priority = {}
+        self.ranked = OrderedDict()
+
+
+    # phraseSources: 產生聯想字詞的資料來源，任一來源改變就重建排序權重
+    # getPhraseList: 傳回依優先順序排列的聯想字詞
+    def getPriority(self, lastCommitString, phraseSources, getPhraseList):
+        priorityKey = (lastCommitString,) + tuple(phraseSources)
+        if not self.priorityKey == priorityKey:
+            priority = {}
+            for i, phrase in enumerate(getPhraseList()):
+                if not phrase in priority:
+                    priority[phrase] = i
+            self.priorityKey = priorityKey
+            self.priority = priority
+        return self.priority
+
+
+    def rank(self, candidates, lastCommitString, compositionChar, version, phraseSources, getPhraseList):
+        priority = self.getPriority(lastCommitString, phraseSources, getPhraseList)
+        if not priority:
+            return candidates
+
+        key = (lastCommitString, compositionChar, version)
+        entry = self.ranked.get(key)
+        if entry is not None and entry[0] is candidates and entry[1] is priority:
+            self.ranked.move_to_end(key)
+            return entry[2]
+
+        # sorted() 是穩定排序: 聯想字詞依聯想順序排在前面，其餘維持原本順序
+        last = len(priority)
+        ranked = sorted(candidates, key=lambda cand: priority.get(cand, last))
+        self.ranked[key] = (candidates, priority, ranked)
+        if len(self.ranked) > self.maxCacheSize:
+            self.ranked.popitem(last=False)
+        return ranked
+
+
+__all__ = ["PhraseRanker"]
@@ -0,0 +1,183 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+import os
+import io
+import json
+import mmap
+import struct
+import hashlib
+
+# 編譯後的聯想字檔格式 (little-endian):
+#   header: magic, 來源檔 mtime_ns, 來源檔 size, 字數, 聯想詞數
+#   keyoffsets[keycount + 1]    : 字在 keypool 的位置 (依 UTF-8 排序)
+#   valueindex[keycount + 1]    : 每個字的第一個聯想詞在 valueoffsets 的索引
+#   keyorder[keycount]          : 原始 keynames 順序對應的排序後索引
+#   valueoffsets[valuecount + 1]: 聯想詞在 valuepool 的位置
+#   keypool, valuepool          : UTF-8 字串
+MAGIC = b"PIMEPHR1"
+HEADER = struct.Struct("<8sqqII")
+
+
+class phrasestore(object):
+
+    def __init__(self, jsonPath, cacheDir=None):
+        self.jsonPath = jsonPath
+        self.file = None
+        self.buf = b""
+        self.keycount = 0
+
+        stat = os.stat(jsonPath)
+        cachePath = None
+        if cacheDir:
+            pathHash = hashlib.md5(os.path.abspath(jsonPath).encode("utf-8")).hexdigest()[:8]
+            cachePath = os.path.join(cacheDir, "phrase-" + pathHash + ".bin")
+            self.openCache(cachePath, stat)
+
+        if self.keycount == 0:
+            with io.open(jsonPath, 'r', encoding='utf8') as fs:
+                data = self.compile(json.load(fs), stat)
+            if cachePath and self.saveCache(cachePath, data):
+                self.openCache(cachePath, stat)
+            if self.keycount == 0:
+                self.setBuffer(data)
+
+
+    def __del__(self):
+        self.keycount = 0
+        # 先關閉 mmap 再關閉檔案，否則 Windows 上快取檔會一直被鎖住而無法更新
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.buf = b""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+    @staticmethod
+    def compile(jsondata, stat):
+        chardefs = jsondata.get("chardefs", {})
+        keynames = jsondata.get("keynames", list(chardefs))
+        keys = sorted(chardefs, key=lambda key: key.encode("utf-8"))
+        sortedIndex = {key: i for i, key in enumerate(keys)}
+
+        keyoffsets = [0]
+        valueindex = [0]
+        valueoffsets = [0]
+        keypool = bytearray()
+        valuepool = bytearray()
+        for key in keys:
+            keypool += key.encode("utf-8")
+            keyoffsets.append(len(keypool))
+            for value in chardefs[key]:
+                valuepool += value.encode("utf-8")
+                valueoffsets.append(len(valuepool))
+            valueindex.append(len(valueoffsets) - 1)
+        keyorder = [sortedIndex[key] for key in keynames if key in sortedIndex]
+
+        keycount = len(keys)
+        valuecount = len(valueoffsets) - 1
+        data = bytearray(HEADER.pack(MAGIC, stat.st_mtime_ns, stat.st_size, keycount, valuecount))
+        data += struct.pack("<%dI" % (keycount + 1), *keyoffsets)
+        data += struct.pack("<%dI" % (keycount + 1), *valueindex)
+        data += struct.pack("<I", len(keyorder))
+        data += struct.pack("<%dI" % len(keyorder), *keyorder)
+        data += struct.pack("<%dI" % (valuecount + 1), *valueoffsets)
+        data += keypool
+        data += valuepool
+        return bytes(data)
+
+
+    def setBuffer(self, buf):
+        magic, mtime, size, keycount, valuecount = HEADER.unpack_from(buf, 0)
+        pos = HEADER.size
+        self.keyoffsets = pos
+        pos += 4 * (keycount + 1)
+        self.valueindex = pos
+        pos += 4 * (keycount + 1)
+        keyordercount = struct.unpack_from("<I", buf, pos)[0]
+        pos += 4
+        self.keyorder = pos
+        self.keyordercount = keyordercount
+        pos += 4 * keyordercount
+        self.valueoffsets = pos
+        pos += 4 * (valuecount + 1)
+        self.keypool = pos
+        pos += struct.unpack_from("<I", buf, self.keyoffsets + 4 * keycount)[0]
+        self.valuepool = pos
+        self.buf = buf
+        self.keycount = keycount
+
+
+    def openCache(self, cachePath, stat):
+        try:
+            if not os.path.exists(cachePath):
+                return
+            f = open(cachePath, "rb")
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, mtime, size, keycount, valuecount = HEADER.unpack_from(buf, 0)
+            if magic == MAGIC and mtime == stat.st_mtime_ns and size == stat.st_size:
+                self.file = f
+                self.setBuffer(buf)
+            else:
+                buf.close()
+                f.close()
+        except Exception:
+            pass
+
+
+    @staticmethod
+    def saveCache(cachePath, data):
+        tempPath = cachePath + ".tmp"
+        try:
+            with open(tempPath, "wb") as f:
+                f.write(data)
+            os.replace(tempPath, cachePath)
+            return True
+        except Exception:
+            return False
+
+
+    def getKeyBytes(self, i):
+        start, end = struct.unpack_from("<II", self.buf, self.keyoffsets + 4 * i)
+        return self.buf[self.keypool + start:self.keypool + end]
+
+
+    def findKey(self, key):
+        keybytes = key.encode("utf-8")
+        lo = 0
+        hi = self.keycount
+        while lo < hi:
+            mid = (lo + hi) // 2
+            midbytes = self.getKeyBytes(mid)
+            if midbytes < keybytes:
+                lo = mid + 1
+            elif midbytes > keybytes:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+
+    def isInCharDef(self, key):
+        return self.findKey(key) >= 0
+
+
+    def getCharDef(self, key):
+        """
+        will return a list conaining all possible result
+        """
+        i = self.findKey(key)
+        if i < 0:
+            raise KeyError(key)
+        first, last = struct.unpack_from("<II", self.buf, self.valueindex + 4 * i)
+        offsets = struct.unpack_from("<%dI" % (last - first + 1), self.buf, self.valueoffsets + 4 * first)
+        pool = self.valuepool
+        return [self.buf[pool + offsets[j]:pool + offsets[j + 1]].decode("utf-8") for j in range(last - first)]
+
+
+    def getKeyNames(self):
+        order = struct.unpack_from("<%dI" % self.keyordercount, self.buf, self.keyorder)
+        return [self.getKeyBytes(i).decode("utf-8") for i in order]
+
+
+__all__ = ["phrasestore"]
@@ -0,0 +1,80 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+import threading
+from collections import OrderedDict
+
+
+# 使用者聯想字詞 (userphrase) 與內建聯想字詞 (phrase) 合併後的唯讀檢視
+# 使用者聯想字詞排在前面，合併結果以 tuple 傳回，可安全地在各 TextService 間共用
+class PhraseView(object):
+
+    def __init__(self, userphrase, phrase):
+        self.userphrase = userphrase
+        self.phrase = phrase
+        self.chardefs = {}
+
+        # 使用者聯想字詞通常不多，建立時就先合併好
+        if userphrase is not None:
+            for key in userphrase.chardefs:
+                self.chardefs[key] = self.merge(key)
+
+
+    def merge(self, key):
+        merged = []
+        if self.userphrase is not None and self.userphrase.isInCharDef(key):
+            merged = list(self.userphrase.getCharDef(key))
+        if self.phrase is not None and self.phrase.isInCharDef(key):
+            plist = self.phrase.getCharDef(key)
+            if len(merged) == 0:
+                merged = plist
+            else:
+                existing = set(merged)
+                for pstr in plist:
+                    if not pstr in existing:
+                        existing.add(pstr)
+                        merged.append(pstr)
+        return tuple(merged)
+
+
+    def isInCharDef(self, key):
+        return len(self.getCharDef(key)) > 0
+
+
+    def getCharDef(self, key):
+        """
+        will return a tuple conaining all possible result
+        """
+        try:
+            return self.chardefs[key]
+        except KeyError:
+            result = self.merge(key)
+            self.chardefs[key] = result
+            return result
+
+
+# 依資料來源共用 PhraseView，任一來源改變 (重新載入) 時才重建
+class PhraseViews(object):
+
+    def __init__(self, maxViews=8):
+        self.maxViews = maxViews
+        self.views = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def getView(self, userphrase, phrase):
+        key = (id(userphrase), id(phrase))
+        with self.lock:
+            view = self.views.get(key)
+            if view is None or not view.userphrase is userphrase or not view.phrase is phrase:
+                view = PhraseView(userphrase, phrase)
+                self.views[key] = view
+                if len(self.views) > self.maxViews:
+                    self.views.popitem(last=False)
+            else:
+                self.views.move_to_end(key)
+            return view
+
+
+PhraseViews = PhraseViews()
+
+__all__ = ["PhraseView", "PhraseViews"]
@@ -3,14 +3,18 @@ from __future__ import unicode_literals
 import os
 import re
 import json
+import hashlib
+import threading
+from backgroundWriter import backgroundWriter, writeFileAtomic
 
 
 class RCin(object):
 
     # TODO check the possiblility if the encoding is not utf-8
     encoding = 'utf-8'
+    nunbers = ['①', '②', '③', '④', '⑤', '⑥', '⑦', '⑧', '⑨', '⑩']
 
-    def __init__(self, fs, imeDirName):
+    def __init__(self, fs, imeDirName, jsonPath=None, cacheDir=None):
         self.imeDirName = imeDirName
         self.curdir = os.path.abspath(os.path.dirname(__file__))
 
@@ -21,7 +25,23 @@ class RCin(object):
         self.cincount = {}
         self.chardefs = {}
 
-        self.__dict__.update(json.load(fs))
+        data = fs.read()
+        self.__dict__.update(json.loads(data))
+
+        # 字 => 反查字根訊息，建立完成前 getCharEncode() 仍逐一搜尋碼表
+        self.encodemap = None
+        self.filehash = hashlib.md5(data.encode('utf-8')).hexdigest()
+        self.cacheFiles = []
+        if jsonPath:
+            # 快取檔優先存放在碼表旁，無法寫入時改存到使用者的 cache 目錄
+            cacheName = os.path.basename(jsonPath) + ".rcache"
+            self.cacheFiles.append(os.path.join(os.path.dirname(jsonPath), cacheName))
+            if cacheDir:
+                self.cacheFiles.append(os.path.join(cacheDir, cacheName))
+
+            self.loadEncodeMap()
+            if self.encodemap is None:
+                BuildRCinEncodeMap(self).start()
 
 
     def __del__(self):
@@ -29,6 +49,7 @@ class RCin(object):
         del self.chardefs
         self.keynames = {}
         self.chardefs = {}
+        self.encodemap = None
 
     def getEname(self):
         return self.ename
@@ -70,13 +91,16 @@ class RCin(object):
         return chardefslist
 
     def getCharEncode(self, root):
-        nunbers = ['①', '②', '③', '④', '⑤', '⑥', '⑦', '⑧', '⑨', '⑩']
+        encodemap = self.encodemap
+        if encodemap is not None:
+            return encodemap.get(root, '')
+
         i = 0
         result = root + ':'
         for chardef in self.chardefs:
             for char in self.chardefs[chardef]:
                 if char == root:
-                    result += '　' + nunbers[i]
+                    result += '　' + self.nunbers[i]
                     if i < 9:
                         i = i + 1
                     for str in chardef:
@@ -86,5 +110,60 @@ class RCin(object):
             result = ''
         return result
 
-
-__all__ = ["RCin"]
+    def buildEncodeMap(self):
+        chardefs = self.chardefs
+        keynames = self.keynames
+        encodes = {}
+        for chardef in chardefs:
+            keyname = ''
+            for str in chardef:
+                keyname += keynames.get(str, str)
+            for char in chardefs[chardef]:
+                encodes.setdefault(char, []).append(keyname)
+
+        encodemap = {}
+        for char, keynameList in encodes.items():
+            result = char + ':'
+            for i, keyname in enumerate(keynameList):
+                result += '　' + self.nunbers[min(i, 9)] + keyname
+            encodemap[char] = result
+        return encodemap
+
+    def loadEncodeMap(self):
+        for filename in self.cacheFiles:
+            try:
+                if os.path.exists(filename):
+                    with open(filename, "r", encoding="utf8") as f:
+                        cache = json.load(f)
+                    if cache.get("hash") == self.filehash:
+                        self.encodemap = cache["encodes"]
+                        return
+            except Exception:
+                pass
+
+    def saveEncodeMap(self, encodemap):
+        cache = {"hash": self.filehash, "encodes": encodemap}
+        for filename in self.cacheFiles:
+            try:
+                writeFileAtomic(filename, json.dumps(cache, ensure_ascii=False), "utf8")
+                return
+            except Exception:
+                pass # 無法寫入時，改試下一個目錄
+
+
+class BuildRCinEncodeMap(threading.Thread):
+    def __init__(self, rcin):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.rcin = rcin
+
+    def run(self):
+        try:
+            encodemap = self.rcin.buildEncodeMap()
+        except Exception:
+            return # 碼表已被釋放
+        self.rcin.encodemap = encodemap
+        backgroundWriter.schedule(self.rcin.cacheFiles[0], lambda: self.rcin.saveEncodeMap(encodemap))
+
+
+__all__ = ["RCin", "BuildRCinEncodeMap"]
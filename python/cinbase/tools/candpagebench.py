@@ -0,0 +1,59 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+import io
+import os
+import sys
+import json
+import timeit
+
+# 比較 list(chunks(...)) 與 CandidatePages 取得目前頁候選字的時間
+# 用法: python candpagebench.py [emoji.json]
+# 每次按鍵都需要重新分頁並取出目前這一頁，這裡模擬在第一頁及最後一頁的情況
+
+CURDIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.join(CURDIR, os.pardir))
+
+from candpages import CandidatePages
+
+
+def chunks(l, n):
+    for i in range(0, len(l), n):
+        yield l[i:i+n]
+
+
+def loadEmojiLists(jsonPath):
+    with io.open(jsonPath, 'r', encoding='utf8') as fs:
+        data = json.load(fs)
+    lists = {}
+    for emojitype in ("dingbats", "emoticons", "miscellaneous", "pictographs", "transport"):
+        for name, candidates in data[emojitype].items():
+            lists[emojitype + "/" + name] = candidates
+    return lists
+
+
+def bench(name, candidates, candPerPage=9, number=2000):
+    lastPage = max(0, (len(candidates) - 1) // candPerPage)
+    results = []
+    for page in (0, lastPage):
+        chunkTime = timeit.timeit(lambda: list(chunks(candidates, candPerPage))[page], number=number) / number
+        viewTime = timeit.timeit(lambda: CandidatePages(candidates, candPerPage)[page], number=number) / number
+        results.append("page %4d: chunks %8.2f us  view %6.2f us" % (page, chunkTime * 1000000, viewTime * 1000000))
+    print("%-28s %6d  %s" % (name, len(candidates), "   ".join(results)))
+
+
+def main():
+    jsonPath = sys.argv[1] if len(sys.argv) >= 2 else os.path.join(CURDIR, os.pardir, "data", "emoji.json")
+
+    # 萬用字元查詢結果，候選字數量最多為 candMaxItems
+    for candMaxItems in (100, 1000, 10000):
+        bench("wildcard (candMaxItems=%d)" % candMaxItems, [chr(0x4e00 + i) for i in range(candMaxItems)])
+
+    if os.path.exists(jsonPath):
+        lists = loadEmojiLists(jsonPath)
+        largest = max(lists, key=lambda name: len(lists[name]))
+        bench("emoji " + largest, lists[largest])
+        bench("emoji (all)", [cand for name in sorted(lists) for cand in lists[name]])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+import io
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+# 比較 phrase (json) 與 phrasestore (編譯後 mmap) 的載入時間及記憶體用量
+# 用法: python phrasebench.py [phrase.json]
+# 每種方式都在獨立的 process 中執行，以免互相影響記憶體量測
+
+CURDIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.join(CURDIR, os.pardir))
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def getRSS():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+
+def loadPhrase(mode, jsonPath, cacheDir):
+    if mode == "phrase":
+        from phrase import phrase
+        with io.open(jsonPath, 'r', encoding='utf8') as fs:
+            return phrase(fs)
+    else:
+        from phrasestore import phrasestore
+        return phrasestore(jsonPath, cacheDir)
+
+
+def child(mode, jsonPath, cacheDir):
+    import phrase, phrasestore
+    cachedFiles = os.listdir(cacheDir)
+    rss = getRSS()
+    startTime = time.perf_counter()
+    data = loadPhrase(mode, jsonPath, cacheDir)
+    loadTime = time.perf_counter() - startTime
+    rss = getRSS() - rss
+
+    keys = ["一", "中", "電", "不存在"] * 2500
+    startTime = time.perf_counter()
+    for key in keys:
+        if data.isInCharDef(key):
+            data.getCharDef(key)
+    lookupTime = (time.perf_counter() - startTime) / len(keys)
+    if mode == "phrasestore":
+        mode += " (mapped)" if os.listdir(cacheDir) == cachedFiles else " (compile)"
+    print("%-22s load %8.2f ms   rss +%6.2f MB   lookup %6.2f us" % (mode, loadTime * 1000, rss / 1048576.0, lookupTime * 1000000))
+
+
+def main():
+    if len(sys.argv) >= 5 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3], sys.argv[4])
+        return
+
+    jsonPath = sys.argv[1] if len(sys.argv) >= 2 else os.path.join(CURDIR, os.pardir, "data", "phrase.json")
+    if not os.path.exists(jsonPath):
+        print('檔案不存在!')
+        return
+
+    cacheDir = tempfile.mkdtemp()
+    # 第一次執行 phrasestore 會編譯並寫入快取，第二次才是一般的載入情況
+    for mode in ("phrase", "phrasestore", "phrasestore"):
+        subprocess.call([sys.executable, os.path.abspath(__file__), "--child", mode, jsonPath, cacheDir])
+
+
+if __name__ == "__main__":
+    main()
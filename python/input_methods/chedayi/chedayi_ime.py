@@ -17,13 +17,12 @@ from keycodes import *  # for VK_XXX constants
 from textService import *
 import io
 import os.path
-import copy
 
 from cinbase import CinBase
 from cinbase import LoadCinTable
 from cinbase import LoadRCinTable
 from cinbase import LoadHCinTable
-from cinbase.config import CinBaseConfig
+from cinbase.config import CinBaseConfigs
 
 
 class CheDayiTextService(TextService):
@@ -47,12 +46,9 @@ class CheDayiTextService(TextService):
         self.selDayiSymbolCharType = 0
 
         # 載入用戶設定值
-        CinBaseConfig.__init__()
-        self.configVersion = CinBaseConfig.getVersion()
-        self.cfg = copy.deepcopy(CinBaseConfig)
-        self.cfg.imeDirName = self.imeDirName
-        self.cfg.cinFileList = self.cinFileList
-        self.cfg.load()
+        # 同一個輸入法的所有 TextService 共用一份設定
+        self.cfg = CinBaseConfigs.getConfig(self.imeDirName, self.cinFileList)
+        self.configVersion = self.cfg.getVersion()
         self.jsondir = self.cfg.getJsonDir()
         self.cindir = self.cfg.getCinDir()
         self.ignorePrivateUseArea = self.cfg.ignorePrivateUseArea
@@ -170,6 +166,11 @@ class CheDayiTextService(TextService):
         self.cinbase.onCompositionTerminated(self, forced)
 
 
+    # 傳回按鍵處理統計
+    def getStats(self):
+        return self.cinbase.getStats(self)
+
+
     # 設定候選字頁數
     def setCandidatePage(self, page):
         self.currentCandPage = page
@@ -19,6 +19,7 @@ import json
 import os
 import time
 import shutil
+from backgroundWriter import ConfigFileWriter
 
 DEF_FONT_SIZE = 16
 
@@ -64,6 +65,8 @@ class ChewingConfig:
         # version: last modified time of (config.json, symbols.dat, swkb.dat)
         self._version = (0.0, 0.0, 0.0)
         self._lastUpdateTime = 0.0
+        # config.json is saved in the background, and needs no reload when written by ourselves
+        self._configWriter = ConfigFileWriter()
         self.load() # try to load from the config file
 
     def getConfigDir(self):
@@ -106,15 +109,9 @@ class ChewingConfig:
     def toJson(self):
         return {key: value for key, value in self.__dict__.items() if not key.startswith("_")}
 
+    # the file is written later in the background writer thread
     def save(self):
-        filename = self.getConfigFile()
-        try:
-            with open(filename, "w") as f:
-                json = self.toJson()
-                js = json.dump(json, f, indent=4)
-            self.update()
-        except Exception:
-            pass # FIXME: handle I/O errors?
+        self._configWriter.save(self.getConfigFile(), json.dumps(self.toJson(), indent=4))
 
     def getDataDir(self):
         return os.path.join(os.path.dirname(__file__), "data")
@@ -164,6 +161,9 @@ class ChewingConfig:
                 pass
 
         lastConfigTime = self._version[0]
+        if lastConfigTime != configTime and self._configWriter.isSavedByUs(configTime):
+            # our own settings are already loaded, don't reload them
+            configTime = lastConfigTime
         self._version = (configTime, symbolsTime, ezSymbolsTime)
 
         # the main config file is changed, reload it
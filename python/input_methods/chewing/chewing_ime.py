@@ -19,7 +19,7 @@ from keycodes import * # for VK_XXX constants
 from textService import *
 import os.path
 import time
-from libchewing import ChewingContext, CHEWING_DATA_DIR, CHINESE_MODE, \
+from libchewing import ChewingState, contextPool, CHEWING_DATA_DIR, CHINESE_MODE, \
     ENGLISH_MODE, FULLSHAPE_MODE, HALFSHAPE_MODE
 
 import opencc  # OpenCC 繁體簡體中文轉換
@@ -76,6 +76,7 @@ class ChewingTextService(TextService):
         self.curdir = os.path.abspath(os.path.dirname(__file__))
         self.icon_dir = self.curdir
         self.chewingContext = None # libchewing context
+        self.chewingState = None # 新酷音引擎上一次按鍵後的狀態
 
         self.langMode = -1
         self.shapeMode = -1
@@ -104,7 +105,7 @@ class ChewingTextService(TextService):
         # 比較我們先前存的版本號碼，和目前設定檔的版本號
         if cfg.isFullReloadNeeded(self.configVersion):
             # 資料改變需整個 reload，重建一個新的 chewing context
-            self.chewingContext = None
+            self.releaseChewingContext()
             self.initChewingContext()
         elif cfg.isConfigChanged(self.configVersion):
             # 只有偵測到設定檔變更，需要套用新設定
@@ -157,9 +158,11 @@ class ChewingTextService(TextService):
             search_paths = ";".join((cfg.getConfigDir(), CHEWING_DATA_DIR)).encode("UTF-8")
             user_phrase = cfg.getUserPhrase().encode("UTF-8")
 
-            # 建立 ChewingContext，此處路徑需要 UTF-8 編碼
-            chewingContext = ChewingContext(syspath = search_paths, userpath = user_phrase)
+            # 從共用的 context pool 取得 ChewingContext (狀態已重設)，沒有閒置的才建立新的
+            # 此處路徑需要 UTF-8 編碼，資料檔 (symbols.dat, swkb.dat) 改變後不會沿用舊的 context
+            chewingContext = contextPool.checkout(search_paths, user_phrase, cfg.getVersion()[1:])
             self.chewingContext = chewingContext
+            self.chewingState = ChewingState()
             chewingContext.set_maxChiSymbolLen(50) # 編輯區長度: 50 bytes
 
             # 預設英數 or 中文模式
@@ -182,6 +185,13 @@ class ChewingTextService(TextService):
             self.setOutputSimplifiedChinese(self.lastOutputSimpChinese)
 
 
+    # 把 chewing context 還給共用的 context pool，下次啟用時不必重新載入詞庫
+    def releaseChewingContext(self):
+        if self.chewingContext:
+            contextPool.checkin(self.chewingContext)
+        self.chewingContext = None
+        self.chewingState = None
+
     # 輸入法被使用者啟用
     def onActivate(self):
         cfg = chewingConfig # globally shared config object
@@ -246,8 +256,8 @@ class ChewingTextService(TextService):
     # 使用者離開輸入法
     def onDeactivate(self):
         TextService.onDeactivate(self)
-        # 釋放 libchewing context 的資源
-        self.chewingContext = None
+        # 釋放 libchewing context (還給 context pool)
+        self.releaseChewingContext()
         self.lastKeyDownCode = 0
 
         # 丟棄輸入法狀態
@@ -261,6 +271,10 @@ class ChewingTextService(TextService):
         if self.client.isWindows8Above:
             self.removeButton("windows-mode-icon")
 
+    # 效能統計: chewing context 建立時間及 context pool 命中率
+    def getStats(self):
+        return {"contextPool": contextPool.getStats()}
+
     # 設定選字按鍵 (123456..., asdf....等等)
     def setSelKeys(self, selKeys):
         TextService.setSelKeys(self, selKeys)
@@ -271,10 +285,10 @@ class ChewingTextService(TextService):
     # 設定輸出成簡體中文
     def setOutputSimplifiedChinese(self, outputSimpChinese):
         self.outputSimpChinese = outputSimpChinese
-        # 建立 OpenCC instance 用來做繁簡體中文轉換
+        # 取得所有 TextService 共用的 OpenCC instance 用來做繁簡體中文轉換
         if outputSimpChinese:
             if not self.opencc:
-                self.opencc = opencc.OpenCC(opencc.OPENCC_DEFAULT_CONFIG_TRAD_TO_SIMP)
+                self.opencc = opencc.get_opencc(opencc.OPENCC_DEFAULT_CONFIG_TRAD_TO_SIMP)
         else:
             self.opencc = None
 
@@ -499,20 +513,16 @@ class ChewingTextService(TextService):
             ignoreKey = True
 
         if not ignoreKey:  # 如果這個按鍵是有意義的，新酷音有做處理 (不可忽略)
+            # 取得新酷音引擎目前的狀態，只讀取有內容的欄位，內容沒變的字串不重新解碼
+            state = self.chewingState
+            state.update(chewingContext)
+            showCandidates = self.showCandidates
+
             # 處理選字清單
-            if chewingContext.cand_TotalChoice() > 0: # 若有候選字/詞
-                candidates = []
-                # 要求新酷音引擎列出每個候選字
-                chewingContext.cand_Enumerate()
-                for i in range(chewingContext.cand_ChoicePerPage()):
-                    if not chewingContext.cand_hasNext():
-                        break
-                    # 新酷音返回的是 UTF-8 byte string，須轉成 python 字串
-                    cand = chewingContext.cand_String().decode("UTF-8")
-                    candidates.append(cand)
-
-                # 檢查選字清單是否改變 (沒效率但是簡單)
-                if candidates != self.candidateList:
+            if state.totalChoice > 0: # 若有候選字/詞
+                candidates = state.candidates
+                # 檢查選字清單是否改變
+                if (state.candidatesChanged or candidates is not self.candidateList) and candidates != self.candidateList:
                     self.setCandidateList(candidates)  # 更新候選字清單
                     self.setShowCandidates(True)
                     if cfg.leftRightAction == 0 or cfg.upDownAction == 0:  # 如果啟用選字清單內使用游標選字
@@ -526,8 +536,8 @@ class ChewingTextService(TextService):
                     self.setCandidateList([])  # 更新候選字清單
 
             # 有輸入完成的中文字串要送出(commit)到應用程式
-            if chewingContext.commit_Check():
-                commitStr = chewingContext.commit_String().decode("UTF-8")
+            if state.commitString:
+                commitStr = state.commitString
 
                 # 如果使用打繁出簡，就轉成簡體中文
                 if self.outputSimpChinese:
@@ -536,30 +546,29 @@ class ChewingTextService(TextService):
                 self.setCommitString(commitStr)  # 設定要輸出的 commit string
 
             # 編輯區正在輸入中，尚未送出的中文字串 (composition string)
-            compStr = ""
-            if chewingContext.buffer_Check():
-                compStr = chewingContext.buffer_String().decode("UTF-8")
+            compStr = state.bufferString
+            cursor = state.cursor
 
             # 輸入到一半，還沒組成字的注音符號 (bopomofo)
-            if chewingContext.bopomofo_Check():
-                bopomofoStr = ""
-                bopomofoStr = chewingContext.bopomofo_String(None).decode("UTF-8")
+            if state.bopomofoString:
                 # 把輸入到一半，還沒組成字的注音字串，也插入到編輯區內，並且更新游標位置
-                pos = chewingContext.cursor_Current()
-                compStr = compStr[:pos] + bopomofoStr + compStr[pos:]
-                self.setCompositionCursor(chewingContext.cursor_Current() + len(bopomofoStr))
-            else:
-                self.setCompositionCursor(chewingContext.cursor_Current())
-
-            # 更新編輯區內容 (composition string)
-            self.setCompositionString(compStr)
+                compStr = compStr[:cursor] + state.bopomofoString + compStr[cursor:]
+                cursor += len(state.bopomofoString)
+
+            # 更新編輯區內容 (composition string) 及游標，和目前的編輯區相同就不必送出
+            # 送出文字會結束組字，選字視窗開關也會影響組字狀態，這兩種情況一律更新編輯區
+            forceUpdate = bool(state.commitString) or not showCandidates == self.showCandidates
+            if forceUpdate or not compStr == self.compositionString:
+                self.setCompositionString(compStr)
+                forceUpdate = True
+            if forceUpdate or not cursor == self.compositionCursor:
+                self.setCompositionCursor(cursor)
 
             # 顯示額外提示訊息 (例如：Ctrl+數字加入自訂詞之後，會顯示提示)
-            if chewingContext.aux_Check():
-                message = chewingContext.aux_String().decode("UTF-8")
+            if state.auxString:
                 # FIXME: sometimes libchewing shows the same aux info
                 # for subsequent key events... I think this is a bug.
-                self.showMessage(message, 2)
+                self.showMessage(state.auxString, 2)
 
         # 若先前有暫時強制切成英文模式，需要復原
         if temporaryEnglishMode:
@@ -734,7 +743,7 @@ class ChewingTextService(TextService):
             self.lastOutputSimpChinese = self.outputSimpChinese
 
             # self.hideMessage() # hide message window, if there's any
-            self.chewingContext = None  # 釋放新酷音引擎資源
+            self.releaseChewingContext()  # 釋放新酷音引擎資源
             # disable 其他語言列按鈕
             self.removeLangButtons()
 
@@ -760,3 +769,5 @@ class ChewingTextService(TextService):
                     chewingContext.clean_bopomofo_buf()
                 if chewingContext.buffer_Check():
                     chewingContext.commit_preedit_buf()
+                # 新酷音引擎的狀態已經改變，之前保留的狀態不能再用來比對
+                self.chewingState = ChewingState()
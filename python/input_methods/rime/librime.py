@@ -22,7 +22,7 @@ import sys, os
 
 if __name__ == "__main__":
     sys.path.append('../../')
-from opencc import OpenCC
+from opencc import get_opencc
 
 ENC = sys.getfilesystemencoding()
 RIME = "Rime"
@@ -341,7 +341,7 @@ class RimeStyle:
         self.candidate_format = rimeGetString(config, 'style/candidate_format')
         self.inline_preedit = rimeGetString(config, 'style/inline_preedit')
         menu_opencc_config = rimeGetString(config, 'style/menu_opencc')
-        self.menu_opencc = OpenCC(menu_opencc_config) if menu_opencc_config else None
+        self.menu_opencc = get_opencc(menu_opencc_config) if menu_opencc_config else None
         value = c_int()
         if rime.config_get_int(config, b'style/font_point', value):
             self.font_point = value.value
@@ -1,6 +1,6 @@
 import os
 
-from .libchewing import ChewingContext
+from .libchewing import ChewingContext, ChewingState, ChewingContextPool, contextPool
 
 _current_dir = os.path.dirname(__file__)
 
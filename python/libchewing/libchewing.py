@@ -18,6 +18,8 @@
 from ctypes import *
 from functools import partial
 import sys
+import threading
+import time
 
 _libchewing = None
 if sys.platform == "win32": # Windows
@@ -30,12 +32,135 @@ if sys.platform == "win32": # Windows
 else: # UNIX-like systems
     _libchewing = CDLL('libchewing.so.3')
 
-_libchewing.chewing_commit_String_static.restype = c_char_p
-_libchewing.chewing_buffer_String_static.restype = c_char_p
-_libchewing.chewing_cand_String_static.restype = c_char_p
-_libchewing.chewing_bopomofo_String_static.restype = c_char_p
-_libchewing.chewing_aux_String_static.restype = c_char_p
-_libchewing.chewing_kbtype_String_static.restype = c_char_p
+# the context is an opaque pointer, do not let ctypes truncate it to an int
+_libchewing.chewing_new.restype = c_void_p
+_libchewing.chewing_new2.restype = c_void_p
+_libchewing.chewing_new2.argtypes = [c_char_p, c_char_p, c_void_p, c_void_p]
+_libchewing.chewing_delete.argtypes = [c_void_p]
+_libchewing.chewing_delete.restype = None
+
+# Bindings of the libchewing APIs used by PIME:
+# (method name, return type, argument types after the context)
+# Every context binds these functions once when it is created, so calls do
+# not go through __getattr__. The *_String methods use the
+# chewing_*_String_static APIs returning const char* to avoid memory leaks.
+_API = [
+    # keyboard handling
+    ("handle_Default", c_int, [c_int]),
+    ("handle_Space", c_int, []),
+    ("handle_Esc", c_int, []),
+    ("handle_Enter", c_int, []),
+    ("handle_Del", c_int, []),
+    ("handle_Backspace", c_int, []),
+    ("handle_Tab", c_int, []),
+    ("handle_ShiftLeft", c_int, []),
+    ("handle_Left", c_int, []),
+    ("handle_ShiftRight", c_int, []),
+    ("handle_Right", c_int, []),
+    ("handle_Up", c_int, []),
+    ("handle_Home", c_int, []),
+    ("handle_End", c_int, []),
+    ("handle_PageUp", c_int, []),
+    ("handle_PageDown", c_int, []),
+    ("handle_Down", c_int, []),
+    ("handle_Capslock", c_int, []),
+    ("handle_CtrlNum", c_int, [c_int]),
+    ("handle_ShiftSpace", c_int, []),
+    ("handle_DblTab", c_int, []),
+    ("handle_Numlock", c_int, [c_int]),
+    ("keystroke_CheckIgnore", c_int, []),
+    ("keystroke_CheckAbsorb", c_int, []),
+    # settings
+    ("set_KBType", c_int, [c_int]),
+    ("get_KBType", c_int, []),
+    ("kbtype_String", c_char_p, []),
+    ("set_ChiEngMode", None, [c_int]),
+    ("get_ChiEngMode", c_int, []),
+    ("set_ShapeMode", None, [c_int]),
+    ("get_ShapeMode", c_int, []),
+    ("set_candPerPage", None, [c_int]),
+    ("get_candPerPage", c_int, []),
+    ("set_maxChiSymbolLen", None, [c_int]),
+    ("get_maxChiSymbolLen", c_int, []),
+    ("set_selKey", None, [POINTER(c_int), c_int]),
+    ("set_addPhraseDirection", None, [c_int]),
+    ("get_addPhraseDirection", c_int, []),
+    ("set_spaceAsSelection", None, [c_int]),
+    ("get_spaceAsSelection", c_int, []),
+    ("set_escCleanAllBuf", None, [c_int]),
+    ("get_escCleanAllBuf", c_int, []),
+    ("set_autoShiftCur", None, [c_int]),
+    ("get_autoShiftCur", c_int, []),
+    ("set_easySymbolInput", None, [c_int]),
+    ("get_easySymbolInput", c_int, []),
+    ("set_phraseChoiceRearward", None, [c_int]),
+    ("get_phraseChoiceRearward", c_int, []),
+    ("Reset", c_int, []),
+    # candidate list
+    ("cand_open", c_int, []),
+    ("cand_close", c_int, []),
+    ("cand_TotalPage", c_int, []),
+    ("cand_ChoicePerPage", c_int, []),
+    ("cand_TotalChoice", c_int, []),
+    ("cand_CurrentPage", c_int, []),
+    ("cand_Enumerate", None, []),
+    ("cand_hasNext", c_int, []),
+    ("cand_String", c_char_p, []),
+    # output
+    ("commit_Check", c_int, []),
+    ("commit_String", c_char_p, []),
+    ("commit_preedit_buf", c_int, []),
+    ("clean_preedit_buf", c_int, []),
+    ("clean_bopomofo_buf", c_int, []),
+    ("buffer_Check", c_int, []),
+    ("buffer_Len", c_int, []),
+    ("buffer_String", c_char_p, []),
+    ("bopomofo_Check", c_int, []),
+    ("bopomofo_String", c_char_p, []),
+    ("cursor_Current", c_int, []),
+    ("aux_Check", c_int, []),
+    ("aux_Length", c_int, []),
+    ("aux_String", c_char_p, []),
+    # user phrases (used by the config tool)
+    ("userphrase_enumerate", c_int, []),
+    ("userphrase_has_next", c_int, [POINTER(c_uint), POINTER(c_uint)]),
+    ("userphrase_get", c_int, [c_char_p, c_uint, c_char_p, c_uint]),
+    ("userphrase_add", c_int, [c_char_p, c_char_p]),
+    ("userphrase_remove", c_int, [c_char_p, c_char_p]),
+]
+
+
+def _getFunctionName(name):
+    func = 'chewing_' + name
+    if name.endswith("_String"):
+        func += "_static"
+    return func
+
+
+# argtypes are only declared for the APIs taking pointers or buffers.
+# ctypes passes Python ints and the c_void_p context unchanged without them,
+# while a declared argtypes list converts every argument through from_param(),
+# which makes the int-only calls slower, not faster.
+_PASS_AS_IS = (c_int, c_uint)
+
+# method name => ctypes function with the types declared
+_functions = {}
+for _name, _restype, _argtypes in _API:
+    _funcName = _getFunctionName(_name)
+    if not hasattr(_libchewing, _funcName): # not available in this version of libchewing
+        continue
+    _func = getattr(_libchewing, _funcName)
+    _func.restype = _restype
+    if any(_argtype not in _PASS_AS_IS for _argtype in _argtypes):
+        _func.argtypes = [c_void_p] + _argtypes
+    _functions[_name] = _func
+
+# used by ChewingContext.cand_Page()
+_cand_TotalChoice = _functions["cand_TotalChoice"]
+_cand_ChoicePerPage = _functions["cand_ChoicePerPage"]
+_cand_CurrentPage = _functions["cand_CurrentPage"]
+_cand_Enumerate = _functions["cand_Enumerate"]
+_cand_String = _functions["cand_String"]
 
 
 def Init(datadir, userdir):
@@ -45,24 +170,29 @@ def Init(datadir, userdir):
 class ChewingContext:
     def __init__(self, **kwargs):
         if not kwargs:
-            self.ctx = _libchewing.chewing_new()
+            self.ctx = c_void_p(_libchewing.chewing_new())
         else:
             syspath = kwargs.get("syspath", None)
             userpath = kwargs.get("userpath", None)
-            self.ctx = _libchewing.chewing_new2(
+            self.ctx = c_void_p(_libchewing.chewing_new2(
                 syspath,
                 userpath,
                 None,
-                None)
+                None))
+        self.lastCandPage = ([], []) # (raw bytes, decoded strings) of the last cand_Page()
+        self.poolKey = None # set by ChewingContextPool.checkout()
+        self.poolVersion = None
+        # bind all APIs in _API to this context
+        ctx = self.ctx
+        for name, func in _functions.items():
+            setattr(self, name, partial(func, ctx))
 
     def __del__(self):
         _libchewing.chewing_delete(self.ctx)
 
+    # fallback for the APIs not listed in _API (without declared types)
     def __getattr__(self, name):
-        func = 'chewing_' + name
-        # force the use of the APIs returning const char* to avoid memory leaks
-        if name.endswith("_String"):
-            func += "_static"
+        func = _getFunctionName(name)
         if func in _libchewing.__dict__:
             wrap = partial(_libchewing.__dict__[func], self.ctx)
             setattr(self, name, wrap)
@@ -74,6 +204,27 @@ class ChewingContext:
         else:
             raise AttributeError(name)
 
+    # Fetch the current page of the candidate list in one call.
+    # Returns (candidates, total choices, current page, choices per page).
+    # The number of candidates on the page is computed from the totals, so
+    # cand_hasNext() does not need to be called for every candidate.
+    def cand_Page(self):
+        ctx = self.ctx
+        totalChoice = _cand_TotalChoice(ctx)
+        if totalChoice <= 0:
+            return [], 0, 0, 0
+        choicePerPage = _cand_ChoicePerPage(ctx)
+        currentPage = _cand_CurrentPage(ctx)
+        count = min(choicePerPage, totalChoice - currentPage * choicePerPage)
+        _cand_Enumerate(ctx)
+        rawCandidates = [_cand_String(ctx) for i in range(count)]
+        # reuse the decoded list if the page has not changed since the last call
+        lastRawCandidates, candidates = self.lastCandPage
+        if not rawCandidates == lastRawCandidates:
+            candidates = [cand.decode("UTF-8") for cand in rawCandidates]
+            self.lastCandPage = (rawCandidates, candidates)
+        return candidates, totalChoice, currentPage, choicePerPage
+
     # The original libchewing API is set_selKey (without 's')
     # It only accepts an integer array. Let's create a new API that accepts
     # a python string
@@ -81,7 +232,7 @@ class ChewingContext:
         selKeyCodes = (c_int * len(selKeys))()
         for i, key in enumerate(selKeys):
             selKeyCodes[i] = ord(key)
-        _libchewing.chewing_set_selKey(self.ctx, selKeyCodes, len(selKeys))
+        self.set_selKey(selKeyCodes, len(selKeys))
 
     def Configure(self, cpp, maxlen, direction, space, kbtype):
         self.set_candPerPage(cpp)
@@ -89,3 +240,121 @@ class ChewingContext:
         self.set_addPhraseDirection(direction)
         self.set_spaceAsSelection(space)
         self.set_KBType(kbtype)
+
+
+# Output state of a ChewingContext after a key stroke.
+# update() only fetches the strings libchewing reports as present
+# (commit_Check(), buffer_Check()...), and skips decoding when the bytes are
+# the same as the last time. candidatesChanged tells whether the candidate
+# page is different from the previous update. The composition is not tracked
+# here: libchewing can change it between key strokes (a forced termination,
+# a reused context), so callers compare it with what they last displayed.
+# The commit string and aux message are events rather than state, so they
+# are reported on every update.
+class ChewingState:
+    def __init__(self):
+        self.commitString = ""
+        self.bufferString = ""
+        self.bopomofoString = ""
+        self.auxString = ""
+        self.cursor = 0
+        self.candidates = []
+        self.totalChoice = 0
+        self.candidatesChanged = False
+        self.rawStrings = {} # field => (bytes, decoded string)
+
+    def decode(self, field, data):
+        raw = self.rawStrings.get(field)
+        if raw is not None and raw[0] == data:
+            return raw[1]
+        text = data.decode("UTF-8")
+        self.rawStrings[field] = (data, text)
+        return text
+
+    def update(self, chewingContext):
+        decode = self.decode
+        self.commitString = decode("commit", chewingContext.commit_String()) if chewingContext.commit_Check() else ""
+        self.auxString = decode("aux", chewingContext.aux_String()) if chewingContext.aux_Check() else ""
+
+        self.bufferString = decode("buffer", chewingContext.buffer_String()) if chewingContext.buffer_Check() else ""
+        self.bopomofoString = decode("bopomofo", chewingContext.bopomofo_String()) if chewingContext.bopomofo_Check() else ""
+        self.cursor = chewingContext.cursor_Current()
+
+        # cand_Page() returns the same list object when the page has not changed
+        candidates, totalChoice = chewingContext.cand_Page()[:2]
+        self.candidatesChanged = not (candidates is self.candidates and totalChoice == self.totalChoice)
+        self.candidates = candidates
+        self.totalChoice = totalChoice
+
+
+# Process-wide pool of idle chewing contexts.
+# Opening a context loads the system dictionaries and the user phrase
+# database, so a context released by a text service (deactivated or
+# keyboard closed) is kept and handed to the next text service using the same
+# (search paths, user phrase path). version identifies the data files the
+# contexts were loaded with; idle contexts of an older version are dropped.
+class ChewingContextPool:
+    MAX_IDLE = 2 # idle contexts kept for each (search paths, user phrase path)
+
+    def __init__(self):
+        self.idle = {} # (syspath, userpath) => (version, [contexts])
+        self.lock = threading.Lock()
+        self.stats = {"created": 0, "checkouts": 0, "hits": 0, "createMs": 0.0, "maxCreateMs": 0.0}
+
+    # get a context with its state reset, creating a new one if none is idle
+    def checkout(self, syspath, userpath, version=None):
+        key = (syspath, userpath)
+        context = None
+        with self.lock:
+            self.stats["checkouts"] += 1
+            idleVersion, contexts = self.idle.get(key, (None, []))
+            if not idleVersion == version: # the data files are changed, drop the old contexts
+                contexts = []
+                self.idle[key] = (version, contexts)
+            if contexts:
+                context = contexts.pop()
+                self.stats["hits"] += 1
+        if context is not None:
+            context.Reset()
+            context.lastCandPage = ([], [])
+        else:
+            start = time.perf_counter()
+            context = ChewingContext(syspath=syspath, userpath=userpath)
+            createMs = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.stats["created"] += 1
+                self.stats["createMs"] += createMs
+                self.stats["maxCreateMs"] = max(self.stats["maxCreateMs"], createMs)
+        context.poolKey = key
+        context.poolVersion = version
+        return context
+
+    # return a context which is no longer used to the pool
+    def checkin(self, context):
+        key = context.poolKey
+        if key is None:
+            return
+        with self.lock:
+            version, contexts = self.idle.get(key, (None, []))
+            # keep it only if it was loaded from the current data files
+            if version == context.poolVersion and len(contexts) < self.MAX_IDLE:
+                contexts.append(context)
+                self.idle[key] = (version, contexts)
+
+    def getStats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["idle"] = sum(len(contexts) for version, contexts in self.idle.values())
+        checkouts = stats["checkouts"]
+        stats["hitRate"] = round(stats["hits"] / checkouts, 3) if checkouts else 0.0
+        stats["avgCreateMs"] = round(stats["createMs"] / stats["created"], 3) if stats["created"] else 0.0
+        stats["createMs"] = round(stats["createMs"], 3)
+        stats["maxCreateMs"] = round(stats["maxCreateMs"], 3)
+        return stats
+
+    def clear(self):
+        with self.lock:
+            self.idle = {}
+
+
+contextPool = ChewingContextPool()
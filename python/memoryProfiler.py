@@ -0,0 +1,267 @@
+#! python3
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# set PIME_MEMORY_PROFILE=<interval in seconds> to profile from startup
+ENV_VAR = "PIME_MEMORY_PROFILE"
+DEFAULT_INTERVAL = 300.0
+TRACEBACK_FRAMES = 8
+TOP_COUNT = 20
+MAX_REPORT_SIZE = 4 * 1024 * 1024  # rotate the report file when it gets larger than this
+
+# besides text services, instances of classes from these modules are
+# counted as table objects (cin tables, phrases, symbols, opencc...)
+TABLE_MODULES = ("cinbase", "opencc", "libchewing")
+
+CONTAINER_TYPES = (dict, list, tuple, set, frozenset, str, bytes)
+
+
+def getReportDir():
+    return os.path.join(os.path.expandvars("%APPDATA%"), "PIME", "memprofile")
+
+
+# Long running memory profiling for the server process.
+# Once started, a tracemalloc snapshot is taken every interval seconds in a
+# worker thread and compared with the previous one. Besides the top
+# allocation growth sites, live text services and table objects are counted
+# per class, with the sizes of their container attributes (candidateList,
+# wildcardcandidates, chardefs...), so growth can be traced to an object.
+# Reports are appended to %APPDATA%/PIME/memprofile/memprofile-<pid>.log.
+class MemoryProfiler:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.stopEvent = threading.Event()
+        self.thread = None
+        self.interval = DEFAULT_INTERVAL
+        self.lastSnapshot = None
+        self.lastObjectStats = None
+        self.snapshotCount = 0
+        self.reportFile = None
+
+    def isRunning(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval=None):
+        with self.lock:
+            if interval:
+                self.interval = max(1.0, float(interval))
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEBACK_FRAMES)
+            if not self.isRunning():
+                self.stopEvent.clear()
+                self.thread = threading.Thread(target=self.run, name="MemoryProfiler")
+                self.thread.daemon = True
+                self.thread.start()
+
+    # enable profiling if PIME_MEMORY_PROFILE is set
+    def startFromEnvironment(self):
+        value = os.environ.get(ENV_VAR, "").strip()
+        if not value or value == "0":
+            return False
+        try:
+            interval = float(value)
+        except ValueError:
+            interval = None
+        if interval == 1.0:  # PIME_MEMORY_PROFILE=1 means "on" with the default interval
+            interval = None
+        self.start(interval)
+        return True
+
+    def stop(self):
+        with self.lock:
+            self.stopEvent.set()
+            thread = self.thread
+            self.thread = None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self.lock:
+            self.lastSnapshot = None
+            self.lastObjectStats = None
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    def run(self):
+        stopEvent = self.stopEvent
+        while not stopEvent.wait(self.interval):
+            try:
+                self.takeSnapshot()
+            except Exception:
+                pass # FIXME: the profiler should never take the server down
+
+    # take a snapshot now, write the report and return a short summary
+    def takeSnapshot(self):
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                return None
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ))
+            objectStats = collectObjectStats()
+            current, peak = tracemalloc.get_traced_memory()
+
+            growthSites = []
+            if self.lastSnapshot is not None:
+                growthSites = [stat for stat in snapshot.compare_to(self.lastSnapshot, "traceback") if stat.size_diff > 0][:TOP_COUNT]
+            objectGrowth = diffObjectStats(self.lastObjectStats, objectStats)
+
+            self.lastSnapshot = snapshot
+            self.lastObjectStats = objectStats
+            self.snapshotCount += 1
+
+            self.writeReport(formatReport(self.snapshotCount, current, peak, growthSites, objectStats, objectGrowth))
+            return {
+                "snapshot": self.snapshotCount,
+                "tracedKb": current // 1024,
+                "peakKb": peak // 1024,
+                "growthKb": sum(stat.size_diff for stat in growthSites) // 1024,
+                "reportFile": self.reportFile,
+            }
+
+    def writeReport(self, text):
+        reportDir = getReportDir()
+        os.makedirs(reportDir, exist_ok=True)
+        self.reportFile = os.path.join(reportDir, "memprofile-%d.log" % os.getpid())
+        try:
+            if os.path.getsize(self.reportFile) > MAX_REPORT_SIZE:
+                os.replace(self.reportFile, self.reportFile + ".1")
+        except OSError:
+            pass
+        with open(self.reportFile, "a", encoding="utf-8") as f:
+            f.write(text)
+
+    def getStatus(self):
+        with self.lock:
+            status = {
+                "running": self.isRunning(),
+                "interval": self.interval,
+                "snapshots": self.snapshotCount,
+                "reportFile": self.reportFile,
+            }
+            if tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                status["tracedKb"] = current // 1024
+                status["peakKb"] = peak // 1024
+            return status
+
+    # handle the "memoryProfile" request: {"action": "start" | "stop" | "snapshot" | "status", "interval": seconds}
+    def handleRequest(self, msg):
+        action = msg.get("action", "status")
+        if action == "start":
+            self.start(msg.get("interval"))
+        elif action == "stop":
+            self.stop()
+        elif action == "snapshot":
+            if not tracemalloc.is_tracing():
+                self.start(msg.get("interval"))
+            status = self.getStatus()
+            status["lastSnapshot"] = self.takeSnapshot()
+            return status
+        return self.getStatus()
+
+
+def isTrackedObject(obj):
+    module = getattr(type(obj), "__module__", None) or ""
+    return module.split(".", 1)[0] in TABLE_MODULES or isTextService(obj)
+
+
+def isTextService(obj):
+    textService = sys.modules.get("textService")
+    return textService is not None and isinstance(obj, textService.TextService)
+
+
+# class name => {"instances": n, "bytes": shallow size, attr: [items, bytes], ...}
+# the sizes are shallow: they grow when a container attribute keeps growing
+def collectObjectStats():
+    stats = {}
+    for obj in gc.get_objects():
+        try:
+            if isinstance(obj, type) or not isTrackedObject(obj):
+                continue
+            attrs = getattr(obj, "__dict__", None)
+        except Exception:
+            continue
+        cls = type(obj)
+        name = "%s.%s" % (cls.__module__, cls.__name__)
+        if isTextService(obj):
+            name = "TextService:" + name
+        classStats = stats.get(name)
+        if classStats is None:
+            classStats = stats[name] = {"instances": 0, "bytes": 0, "attrs": {}}
+        classStats["instances"] += 1
+        classStats["bytes"] += sys.getsizeof(obj)
+        if not attrs:
+            continue
+        attrStats = classStats["attrs"]
+        for attr, value in list(attrs.items()):
+            if not isinstance(value, CONTAINER_TYPES):
+                continue
+            items, size = attrStats.get(attr, (0, 0))
+            attrStats[attr] = (items + len(value), size + sys.getsizeof(value))
+    return stats
+
+
+# (class name, attribute) => (items diff, bytes diff), largest growth first
+def diffObjectStats(oldStats, newStats):
+    if oldStats is None:
+        return []
+    growth = []
+    for name, classStats in newStats.items():
+        old = oldStats.get(name, {"instances": 0, "bytes": 0, "attrs": {}})
+        instances = classStats["instances"] - old["instances"]
+        if instances:
+            growth.append((name, "<instances>", instances, classStats["bytes"] - old["bytes"]))
+        for attr, (items, size) in classStats["attrs"].items():
+            oldItems, oldSize = old["attrs"].get(attr, (0, 0))
+            if items > oldItems or size > oldSize:
+                growth.append((name, attr, items - oldItems, size - oldSize))
+    growth.sort(key=lambda item: (item[3], item[2]), reverse=True)
+    return growth[:TOP_COUNT]
+
+
+def formatReport(index, current, peak, growthSites, objectStats, objectGrowth):
+    lines = [
+        "=== snapshot %d  %s  traced %d KB  peak %d KB" % (index, time.strftime("%Y-%m-%d %H:%M:%S"), current // 1024, peak // 1024),
+    ]
+    lines.append("--- live text services and tables")
+    for name, classStats in sorted(objectStats.items(), key=lambda item: item[1]["bytes"], reverse=True)[:TOP_COUNT]:
+        largest = sorted(classStats["attrs"].items(), key=lambda item: item[1][1], reverse=True)[:3]
+        attrs = ", ".join("%s %d items/%d KB" % (attr, items, size // 1024) for attr, (items, size) in largest)
+        lines.append("%6d x %s  %s" % (classStats["instances"], name, attrs))
+    if objectGrowth:
+        lines.append("--- object growth since last snapshot")
+        for name, attr, items, size in objectGrowth:
+            lines.append("%+8d items %+8d KB  %s.%s" % (items, size // 1024, name, attr))
+    if growthSites:
+        lines.append("--- top allocation growth sites")
+        for stat in growthSites:
+            frames = list(reversed(stat.traceback))  # most recent frame first
+            lines.append("%+9.1f KB %+7d blocks  %s:%d" % (stat.size_diff / 1024.0, stat.count_diff, frames[0].filename, frames[0].lineno))
+            for frame in frames[1:4]:
+                lines.append("                            from %s:%d" % (frame.filename, frame.lineno))
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+memoryProfiler = MemoryProfiler()
+
+__all__ = ["MemoryProfiler", "memoryProfiler"]
@@ -15,38 +15,143 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os, sys
-from ctypes import CDLL, c_char_p
+import os, sys, time, threading
+from collections import OrderedDict
+from ctypes import CDLL, c_char_p, c_void_p
 
 OPENCC_DEFAULT_CONFIG_SIMP_TO_TRAD = "s2t.json"
 OPENCC_DEFAULT_CONFIG_TRAD_TO_SIMP = "t2s.json"
 
+# number of recent conversion results kept by each OpenCC object
+CACHE_SIZE = 256
+
 _opencc_dir = os.path.dirname(__file__)
-if sys.platform == "win32": # Windows
-    _libopencc = CDLL(os.path.join(_opencc_dir, "opencc.dll"))
-else: # UNIX-like systems
-    _libopencc = CDLL("libopencc.so")
-_libopencc.opencc_error.restype = c_char_p
+try:
+    if sys.platform == "win32": # Windows
+        _libopencc = CDLL(os.path.join(_opencc_dir, "opencc.dll"))
+    else: # UNIX-like systems
+        _libopencc = CDLL("libopencc.so")
+    _libopencc.opencc_error.restype = c_char_p
+    # keep the full pointer width on 64-bit builds
+    _libopencc.opencc_open.restype = c_void_p
+    _libopencc.opencc_convert_utf8.restype = c_void_p
+except OSError:
+    # the library is not available, use the pure Python table converter
+    _libopencc = None
+
+
+def is_library_available():
+    return _libopencc is not None
+
 
 class OpenCC:
-    def __init__(self, configName):
+    # useTable: use the pure Python converter even if the library is available
+    def __init__(self, configName, useTable=False, cacheSize=CACHE_SIZE):
         if not os.path.isabs(configName):
             configName = os.path.join(_opencc_dir, configName)
-        self.opencc = _libopencc.opencc_open(bytes(configName, "ascii"))
-        print(self.opencc)
+        self.opencc = None
+        self.table = None
+        self.cache = OrderedDict()
+        self.cacheSize = cacheSize
+        # an OpenCC object may be shared by several sessions (see OpenCCPool)
+        self.lock = threading.RLock()
+        if _libopencc is not None and not useTable:
+            handle = _libopencc.opencc_open(bytes(configName, "ascii"))
+            # opencc_open() returns (opencc_t) -1 on failure
+            if handle and not handle == c_void_p(-1).value:
+                self.opencc = handle
+        if self.opencc is None:
+            from .table import TableConverter
+            self.table = TableConverter(configName)
 
     def convert(self, from_str):
+        with self.lock:
+            try:
+                result = self.cache[from_str]
+                self.cache.move_to_end(from_str)
+                return result
+            except KeyError:
+                pass
+            result = self._convert(from_str)
+            self.cache[from_str] = result
+            if len(self.cache) > self.cacheSize:
+                self.cache.popitem(last=False)
+            return result
+
+    # convert a list of strings, uncached ones are converted in one library call
+    def convert_list(self, from_strs):
+        with self.lock:
+            missing = [s for s in OrderedDict.fromkeys(from_strs) if not s in self.cache]
+            if len(missing) > 1 and self.opencc is not None and not any("\n" in s for s in missing):
+                results = self._convert("\n".join(missing)).split("\n")
+                if len(results) == len(missing):
+                    for s, result in zip(missing, results):
+                        self.cache[s] = result
+            results = [self.convert(s) for s in from_strs]
+            while len(self.cache) > self.cacheSize:
+                self.cache.popitem(last=False)
+            return results
+
+    def _convert(self, from_str):
+        if self.table is not None:
+            return self.table.convert(from_str)
         result = ""
         input_data = bytes(from_str, "UTF-8")
-        result_p = _libopencc.opencc_convert_utf8(self.opencc, input_data, len(input_data))
-        print(result_p)
+        result_p = _libopencc.opencc_convert_utf8(c_void_p(self.opencc), input_data, len(input_data))
         if result_p:
             result = c_char_p(result_p).value.decode("UTF-8")
-            _libopencc.opencc_convert_utf8_free(result_p)
+            _libopencc.opencc_convert_utf8_free(c_void_p(result_p))
         return result
 
     def get_error(self):
+        if _libopencc is None:
+            return None
         return _libopencc.opencc_error()
 
     def __del__(self):
-        _libopencc.opencc_close(self.opencc)
+        if self.opencc is not None:
+            _libopencc.opencc_close(c_void_p(self.opencc))
+            self.opencc = None
+
+
+# process-wide converters shared by all text services, created on first use
+class OpenCCPool:
+    def __init__(self):
+        self.converters = {}
+        self.stats = {} # configName => {"createMs", "requests"}
+        self.lock = threading.Lock()
+
+    def get(self, configName):
+        converter = self.converters.get(configName)
+        if converter is None:
+            with self.lock:
+                converter = self.converters.get(configName)
+                if converter is None:
+                    start = time.perf_counter()
+                    converter = OpenCC(configName)
+                    self.stats[configName] = {
+                        "createMs": round((time.perf_counter() - start) * 1000, 3),
+                        "table": converter.table is not None,
+                        "requests": 0
+                    }
+                    self.converters[configName] = converter
+        with self.lock:
+            self.stats[configName]["requests"] += 1
+        return converter
+
+    def get_stats(self):
+        with self.lock:
+            return {name: dict(stats) for name, stats in self.stats.items()}
+
+    def clear(self):
+        with self.lock:
+            self.converters = {}
+            self.stats = {}
+
+
+pool = OpenCCPool()
+
+
+# get the shared converter of a config from the process-wide pool
+def get_opencc(configName):
+    return pool.get(configName)
@@ -0,0 +1,261 @@
+# python3
+# Pure Python character table converter for hosts without the OpenCC library
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+import mmap
+import struct
+import hashlib
+import tempfile
+
+# The .ocd dictionaries used by an OpenCC config are read once and compiled
+# into a table file which is memory-mapped afterwards. Conversion does a
+# longest prefix match against the table of each step of the conversion chain.
+# This only approximates OpenCC's segmentation, but is exact for single
+# characters and the phrases listed in the dictionaries.
+#
+# compiled table format (little-endian):
+#   header: magic, md5 of the source dictionaries, number of steps
+#   for each step:
+#     keycount, maxKeyLength (characters), keypool size, valuepool size
+#     keyoffsets[keycount + 1], valueoffsets[keycount + 1] (sorted by UTF-8)
+#     keypool, valuepool
+MAGIC = b"PIMECCT1"
+HEADER = struct.Struct("<8s16sI")
+STEP_HEADER = struct.Struct("<IIII")
+OCD_HEADER = b"OPENCCDARTS1"
+
+
+# read all entries of an OpenCC 1.0 .ocd (DartsDict) file as {key: first value}
+def readOcd(filename):
+    with open(filename, "rb") as f:
+        data = f.read()
+    if not data.startswith(OCD_HEADER):
+        raise ValueError("not an OpenCC dictionary: " + filename)
+    # the dictionaries are written with the size_t of the build (4 or 8 bytes)
+    for sizeFormat in ("<I", "<Q"):
+        try:
+            return parseOcd(data, sizeFormat)
+        except (struct.error, ValueError):
+            pass
+    raise ValueError("unsupported OpenCC dictionary: " + filename)
+
+
+def parseOcd(data, sizeFormat):
+    size = struct.calcsize(sizeFormat)
+    def readSize(pos):
+        return struct.unpack_from(sizeFormat, data, pos)[0]
+
+    pos = len(OCD_HEADER)
+    pos += size + readSize(pos) # skip the double array
+    itemCount = readSize(pos)
+    pos += size
+    keyLength = readSize(pos)
+    keyBuffer = data[pos + size:pos + size + keyLength]
+    pos += size + keyLength
+    valueLength = readSize(pos)
+    valueBuffer = data[pos + size:pos + size + valueLength]
+    pos += size + valueLength
+
+    entries = {}
+    for i in range(itemCount):
+        valueCount = readSize(pos)
+        keyOffset = readSize(pos + size)
+        pos += size * 2
+        key = keyBuffer[keyOffset:keyBuffer.index(b"\0", keyOffset)].decode("utf-8")
+        if valueCount > 0:
+            valueOffset = readSize(pos)
+            entries[key] = valueBuffer[valueOffset:valueBuffer.index(b"\0", valueOffset)].decode("utf-8")
+        pos += size * valueCount
+    if not pos == len(data):
+        raise ValueError("size mismatch")
+    return entries
+
+
+# list the .ocd files used by each step of the conversion chain of a config
+def getConversionSteps(configPath):
+    with open(configPath, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    configDir = os.path.dirname(configPath)
+
+    def getFiles(d):
+        if d.get("type") == "group":
+            files = []
+            for item in d.get("dicts", []):
+                files.extend(getFiles(item))
+            return files
+        if d.get("type") == "ocd":
+            return [os.path.join(configDir, d["file"])]
+        raise ValueError("unsupported dictionary type: " + str(d.get("type")))
+
+    return [getFiles(step["dict"]) for step in config.get("conversion_chain", [])]
+
+
+class TableConverter:
+    def __init__(self, configPath, cacheDir=None):
+        self.file = None
+        self.buf = None
+        self.steps = []
+
+        stepFiles = getConversionSteps(configPath)
+        signature = hashlib.md5()
+        for files in stepFiles:
+            for filename in files:
+                stat = os.stat(filename)
+                signature.update(("%s:%d:%d;" % (os.path.basename(filename), stat.st_mtime_ns, stat.st_size)).encode("utf-8"))
+            signature.update(b"|")
+        signature = signature.digest()
+
+        if cacheDir is None:
+            cacheDir = getDefaultCacheDir()
+        pathHash = hashlib.md5(os.path.abspath(configPath).encode("utf-8")).hexdigest()[:8]
+        cachePath = os.path.join(cacheDir, "opencc-" + os.path.splitext(os.path.basename(configPath))[0] + "-" + pathHash + ".bin")
+        if not self.openCache(cachePath, signature):
+            data = self.compile(stepFiles, signature)
+            if not (self.saveCache(cachePath, data) and self.openCache(cachePath, signature)):
+                self.setBuffer(data)
+
+    def __del__(self):
+        self.steps = []
+        self.buf = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    @staticmethod
+    def compile(stepFiles, signature):
+        data = bytearray(HEADER.pack(MAGIC, signature, len(stepFiles)))
+        for files in stepFiles:
+            table = {}
+            # earlier dictionaries of a group have higher priority
+            for filename in files:
+                for key, value in readOcd(filename).items():
+                    table.setdefault(key, value)
+            keys = sorted(table, key=lambda key: key.encode("utf-8"))
+            keyoffsets = [0]
+            valueoffsets = [0]
+            keypool = bytearray()
+            valuepool = bytearray()
+            for key in keys:
+                keypool += key.encode("utf-8")
+                keyoffsets.append(len(keypool))
+                valuepool += table[key].encode("utf-8")
+                valueoffsets.append(len(valuepool))
+            maxKeyLength = max([len(key) for key in keys] or [0])
+            data += STEP_HEADER.pack(len(keys), maxKeyLength, len(keypool), len(valuepool))
+            data += struct.pack("<%dI" % (len(keys) + 1), *keyoffsets)
+            data += struct.pack("<%dI" % (len(keys) + 1), *valueoffsets)
+            data += keypool
+            data += valuepool
+        return bytes(data)
+
+    def setBuffer(self, buf):
+        magic, signature, stepCount = HEADER.unpack_from(buf, 0)
+        pos = HEADER.size
+        steps = []
+        for i in range(stepCount):
+            keycount, maxKeyLength, keypoolSize, valuepoolSize = STEP_HEADER.unpack_from(buf, pos)
+            pos += STEP_HEADER.size
+            keyoffsets = pos
+            pos += 4 * (keycount + 1)
+            valueoffsets = pos
+            pos += 4 * (keycount + 1)
+            keypool = pos
+            pos += keypoolSize
+            valuepool = pos
+            pos += valuepoolSize
+            steps.append((keycount, maxKeyLength, keyoffsets, valueoffsets, keypool, valuepool))
+        self.buf = buf
+        self.steps = steps
+
+    def openCache(self, cachePath, signature):
+        try:
+            if not os.path.exists(cachePath):
+                return False
+            f = open(cachePath, "rb")
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, cachedSignature, stepCount = HEADER.unpack_from(buf, 0)
+            if magic == MAGIC and cachedSignature == signature:
+                self.file = f
+                self.setBuffer(buf)
+                return True
+            buf.close()
+            f.close()
+        except Exception:
+            pass
+        return False
+
+    @staticmethod
+    def saveCache(cachePath, data):
+        tempPath = cachePath + ".tmp"
+        try:
+            with open(tempPath, "wb") as f:
+                f.write(data)
+            os.replace(tempPath, cachePath)
+            return True
+        except Exception:
+            return False
+
+    def lookup(self, step, key):
+        keycount, maxKeyLength, keyoffsets, valueoffsets, keypool, valuepool = step
+        keybytes = key.encode("utf-8")
+        buf = self.buf
+        lo = 0
+        hi = keycount
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, end = struct.unpack_from("<II", buf, keyoffsets + 4 * mid)
+            midbytes = buf[keypool + start:keypool + end]
+            if midbytes < keybytes:
+                lo = mid + 1
+            elif midbytes > keybytes:
+                hi = mid
+            else:
+                start, end = struct.unpack_from("<II", buf, valueoffsets + 4 * mid)
+                return buf[valuepool + start:valuepool + end].decode("utf-8")
+        return None
+
+    def convertStep(self, step, text):
+        maxKeyLength = step[1]
+        result = []
+        i = 0
+        while i < len(text):
+            for length in range(min(maxKeyLength, len(text) - i), 0, -1):
+                value = self.lookup(step, text[i:i + length])
+                if value is not None:
+                    result.append(value)
+                    i += length
+                    break
+            else:
+                result.append(text[i])
+                i += 1
+        return "".join(result)
+
+    def convert(self, text):
+        for step in self.steps:
+            text = self.convertStep(step, text)
+        return text
+
+
+def getDefaultCacheDir():
+    cacheDir = os.path.join(os.path.expandvars("%APPDATA%"), "PIME", "cache")
+    try:
+        os.makedirs(cacheDir, mode=0o700, exist_ok=True)
+    except OSError:
+        cacheDir = tempfile.gettempdir()
+    return cacheDir
+
+
+__all__ = ["TableConverter", "readOcd"]
@@ -27,6 +27,7 @@ if __name__ == "__main__":
 sys.stderr = sys.stdout
 
 from serviceManager import textServiceMgr
+from memoryProfiler import memoryProfiler
 
 
 class Client(object):
@@ -113,6 +114,7 @@ class Server(object):
 
 
 def main():
+    memoryProfiler.startFromEnvironment()
     server = Server()
     server.run()
 
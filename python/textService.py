@@ -15,6 +15,8 @@
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 
+from memoryProfiler import memoryProfiler
+
 # keyboard modifiers used by TSF (from msctf.h of Windows SDK)
 TF_MOD_ALT                       = 0x0001
 TF_MOD_CONTROL                   = 0x0002
@@ -41,6 +43,7 @@ class KeyEvent:
         self.scanCode = msg["scanCode"]
         self.isExtended = msg["isExtended"]
         self.keyStates = msg["keyStates"]
+        self.seqNum = msg.get("seqNum", 0)
 
     def isKeyDown(self, code):
         return (self.keyStates[code] & (1 << 7)) != 0
@@ -128,6 +131,10 @@ class TextService:
         elif method == "onDeactivate":
             self.onDeactivate()
             self.isActivated = False
+        elif method == "getStats":
+            ret = self.getStats()
+        elif method == "memoryProfile":
+            ret = memoryProfiler.handleRequest(msg)
         else:
             success = False
 
@@ -179,6 +186,10 @@ class TextService:
     def onKeyboardStatusChanged(self, opened):
         pass
 
+    # performance statistics of this input method, if it collects any
+    def getStats(self):
+        return None
+
     # public methods that should not be touched
 
     # language bar buttons
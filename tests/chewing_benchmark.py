@@ -0,0 +1,152 @@
+# python3
+# coding=utf8
+# libchewing ctypes 呼叫效能測試
+#
+# 比較每個按鍵 handle_Default + buffer_String + 列出候選字 (cand_*) 的耗時:
+#   legacy: 舊的做法，第一次使用時才由 __getattr__ 建立 functools.partial，未宣告 restype
+#   bound:  ChewingContext 建立時依 libchewing._API 綁定好的函式 (已宣告 restype / argtypes)
+#   page:   ChewingContext.cand_Page() 一次取得整頁候選字
+#
+# 用法:
+#   python tests/chewing_benchmark.py [--repeat N]
+#   python -m pytest tests/chewing_benchmark.py
+# 需要 libchewing (Windows 為 python/libchewing/chewing.dll，其他系統為 libchewing.so.3)
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from ctypes import CDLL, c_char_p
+from functools import partial
+
+TESTS_DIR = os.path.abspath(os.path.dirname(__file__))
+PYTHON_DIR = os.path.join(TESTS_DIR, os.pardir, "python")
+
+# 模擬輸入注音 (預設鍵盤): ㄋㄧˇ ㄏㄠˇ ㄨㄛˇ ㄕˋ
+KEYS = "su3cl3ji3g4"
+CANDIDATE_KEY = " "
+
+
+def loadLibchewing():
+    if not PYTHON_DIR in sys.path:
+        sys.path.insert(0, PYTHON_DIR)
+    try:
+        import libchewing
+        return libchewing
+    except OSError: # 找不到 libchewing
+        return None
+
+
+def createContext(libchewing, userdir):
+    os.makedirs(userdir, exist_ok=True)
+    ctx = libchewing.ChewingContext(syspath=libchewing.CHEWING_DATA_DIR.encode("UTF-8"),
+                                    userpath=os.path.join(userdir, "chewing.sqlite3").encode("UTF-8"))
+    ctx.set_maxChiSymbolLen(50)
+    ctx.set_candPerPage(9)
+    return ctx
+
+
+# 舊的 ChewingContext: 以另一個 CDLL 物件載入，不會共用 libchewing 模組宣告的型別
+class LegacyContext(object):
+
+    def __init__(self, ctx):
+        from libchewing import libchewing as module
+        self.ctx = ctx.ctx
+        self.lib = CDLL(module._libchewing._name)
+        self.lib.chewing_buffer_String_static.restype = c_char_p
+        self.lib.chewing_cand_String_static.restype = c_char_p
+
+    def __getattr__(self, name):
+        func = "chewing_" + name
+        if name.endswith("_String"):
+            func += "_static"
+        wrap = partial(getattr(self.lib, func), self.ctx)
+        setattr(self, name, wrap)
+        return wrap
+
+
+def pressKey(ctx, key):
+    ctx.handle_Default(ord(key))
+    ctx.buffer_String()
+    candidates = []
+    if ctx.cand_TotalChoice() > 0:
+        ctx.cand_Enumerate()
+        for i in range(ctx.cand_ChoicePerPage()):
+            if not ctx.cand_hasNext():
+                break
+            candidates.append(ctx.cand_String().decode("UTF-8"))
+    return candidates
+
+
+def pressKeyPage(ctx, key):
+    ctx.handle_Default(ord(key))
+    ctx.buffer_String()
+    return ctx.cand_Page()[0]
+
+
+def runKeys(ctx, press, repeat):
+    keys = 0
+    start = time.perf_counter()
+    for i in range(repeat):
+        for key in KEYS:
+            press(ctx, key)
+            keys += 1
+        press(ctx, CANDIDATE_KEY) # 開啟選字清單
+        keys += 1
+        ctx.handle_Esc()
+        ctx.clean_preedit_buf()
+    return (time.perf_counter() - start) / keys
+
+
+def benchmark(libchewing, userdir, repeat=2000):
+    ctx = createContext(libchewing, userdir)
+    legacy = LegacyContext(ctx)
+    results = {}
+    for name, context, press in (("legacy", legacy, pressKey), ("bound", ctx, pressKey), ("page", ctx, pressKeyPage)):
+        runKeys(context, press, 10) # 暖機
+        results[name] = min(runKeys(context, press, repeat) for i in range(3)) * 1000000
+    return results
+
+
+def formatResults(results):
+    base = results["legacy"]
+    return "\n".join("%-8s %8.2f us/key  (%+.0f%%)" % (name, results[name], (results[name] - base) * 100.0 / base)
+                     for name in ("legacy", "bound", "page"))
+
+
+# pytest: cand_Page() 取得的候選字要和逐一呼叫 cand_* 相同，並印出三種呼叫方式的統計
+def test_chewing_benchmark(tmp_path):
+    import pytest
+    libchewing = loadLibchewing()
+    if libchewing is None:
+        pytest.skip("libchewing not found")
+    ctx = createContext(libchewing, str(tmp_path / "bound"))
+    pageCtx = createContext(libchewing, str(tmp_path / "page"))
+    for key in KEYS + CANDIDATE_KEY:
+        assert pressKeyPage(pageCtx, key) == pressKey(ctx, key)
+        assert pageCtx.buffer_String() == ctx.buffer_String()
+
+    results = benchmark(libchewing, str(tmp_path / "benchmark"), 200)
+    print(formatResults(results))
+    assert all(value > 0 for value in results.values())
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = 2000
+    if "--repeat" in args:
+        repeat = int(args[args.index("--repeat") + 1])
+    libchewing = loadLibchewing()
+    if libchewing is None:
+        print("libchewing not found")
+        return
+    userdir = tempfile.mkdtemp(prefix="pime-chewing-bench-")
+    try:
+        print(formatResults(benchmark(libchewing, userdir, repeat)))
+    finally:
+        shutil.rmtree(userdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+# python3
+# coding=utf8
+# cinbase 輸入法效能測試 (不需要 Windows)
+#
+# 以 stub 取代 windll / winsound / GetKeyState，直接建立各輸入法的 TextService，
+# 把一段中文文章依載入的碼表反查成字根後模擬打字，統計每個碼表的:
+#   每秒按鍵數、每個按鍵的 p50 / p99 延遲、碼表載入時間及載入後的 RSS
+#
+# 用法:
+#   python tests/cinbase_benchmark.py [--all-tables] [--repeat N] [文章檔案]
+#   python -m pytest tests/cinbase_benchmark.py
+
+import io
+import os
+import sys
+import time
+import types
+import ctypes
+import shutil
+import tempfile
+import threading
+
+TESTS_DIR = os.path.abspath(os.path.dirname(__file__))
+PYTHON_DIR = os.path.join(TESTS_DIR, os.pardir, "python")
+
+# 輸入法, TextService 類別
+INPUT_METHODS = [
+    ("checj", "CheCJTextService"),
+    ("chephonetic", "ChePhoneticTextService"),
+    ("chearray", "CheArrayTextService"),
+    ("chedayi", "CheDayiTextService"),
+    ("cheez", "CheEZTextService"),
+    ("cheliu", "CheLiuTextService"),
+    ("chepinyin", "ChePinyinTextService"),
+    ("chesimplex", "CheSimplexTextService"),
+]
+
+CORPUS = (
+    "輸入法是一種將各種符號輸入電腦或其他設備的編碼方法。"
+    "中文輸入法依照編碼的方式可以分為字形、字音及音形混合三大類。"
+    "倉頡輸入法由朱邦復先生創立，是台灣及香港最常見的字形輸入法之一。"
+    "注音輸入法使用注音符號拼出讀音，再從同音字中選出想要的字。"
+    "大易、行列、嘸蝦米與輕鬆輸入法各有不同的拆字規則，熟練以後都能快速打字。"
+    "我們希望在每一次按鍵時都能立即看到候選字，不會因為查表或排序而感到延遲。"
+    "今天天氣很好，我和朋友一起到公園散步，看到許多小孩在草地上快樂地玩耍。"
+)
+
+VK_BACK = 0x08
+VK_RETURN = 0x0D
+VK_ESCAPE = 0x1B
+VK_SPACE = 0x20
+
+# 字元 => 美式鍵盤的 virtual key code
+SYMBOL_KEYS = {
+    ";": 0xBA, "=": 0xBB, ",": 0xBC, "-": 0xBD, ".": 0xBE, "/": 0xBF, "`": 0xC0,
+    "[": 0xDB, "\\": 0xDC, "]": 0xDD, "'": 0xDE, " ": VK_SPACE,
+}
+
+
+def charToKeyCode(char):
+    if "a" <= char <= "z" or "0" <= char <= "9":
+        return ord(char.upper())
+    return SYMBOL_KEYS.get(char)
+
+
+class _WinApiStub(object):
+    def __getattr__(self, name):
+        return _WinApiStub()
+
+    def __call__(self, *args, **kwargs):
+        return 0
+
+
+# 在匯入 cinbase 前換掉只有 Windows 才有的模組
+# 已匯入的模組在執行時仍會用到，所以測試結束後不還原
+def installStubs():
+    if sys.platform == "win32":
+        return
+    ctypes.windll = _WinApiStub()
+    ctypes.WinDLL = lambda *args, **kwargs: _WinApiStub()
+    if not "winsound" in sys.modules:
+        winsound = types.ModuleType("winsound")
+        winsound.PlaySound = lambda *args: None
+        winsound.SND_ASYNC = 1
+        sys.modules["winsound"] = winsound
+
+
+# 設定檔及快取都寫到 workdir，不影響使用者的設定
+# 傳回的函式會寫完背景排程的檔案，並還原工作目錄、APPDATA 及 threading.excepthook
+def prepareEnvironment(workdir):
+    oldCwd = os.getcwd()
+    oldAppData = os.environ.get("APPDATA")
+    os.environ["APPDATA"] = workdir
+    os.chdir(workdir) # %APPDATA% 在非 Windows 系統不會展開
+    if not PYTHON_DIR in sys.path:
+        sys.path.insert(0, PYTHON_DIR)
+    installStubs()
+
+    # 未附碼表 (例如嘸蝦米) 的輸入法無法測試，載入執行緒找不到檔案時不顯示錯誤
+    defaultExcepthook = threading.excepthook
+    def excepthook(args):
+        if not issubclass(args.exc_type, (IOError, OSError)):
+            defaultExcepthook(args)
+    threading.excepthook = excepthook
+
+    def restore():
+        # 設定檔等是以相對於 workdir 的路徑排入背景寫入，切換目錄前先寫完
+        backgroundWriter = sys.modules.get("backgroundWriter")
+        if backgroundWriter is not None:
+            backgroundWriter.backgroundWriter.flush()
+        threading.excepthook = defaultExcepthook
+        os.chdir(oldCwd)
+        if oldAppData is None:
+            os.environ.pop("APPDATA", None)
+        else:
+            os.environ["APPDATA"] = oldAppData
+    return restore
+
+
+def getRss():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return None
+
+
+class Client(object):
+    isWindows8Above = True
+    isMetroApp = False
+    isUiLess = False
+
+
+class Typist(object):
+
+    def __init__(self, textService):
+        self.ts = textService
+        self.seqNum = 0
+        self.latencies = []
+
+    def request(self, msg):
+        self.seqNum += 1
+        msg["seqNum"] = self.seqNum
+        return self.ts.handleRequest(msg)
+
+    # 送出一個按鍵 (filterKeyDown, onKeyDown, filterKeyUp, onKeyUp)，傳回 onKeyDown 的結果
+    def press(self, char=None, keyCode=None):
+        charCode = ord(char) if char else 0
+        if keyCode is None:
+            keyCode = charToKeyCode(char)
+        msg = {"charCode": charCode, "keyCode": keyCode, "repeatCount": 1, "scanCode": 0, "isExtended": False, "keyStates": [0] * 256}
+        start = time.perf_counter()
+        reply = self.request(dict(msg, method="filterKeyDown"))
+        if reply.get("return"):
+            reply = self.request(dict(msg, method="onKeyDown"))
+        if self.request(dict(msg, method="filterKeyUp")).get("return"):
+            self.request(dict(msg, method="onKeyUp"))
+        self.latencies.append(time.perf_counter() - start)
+        return reply
+
+    # 輸入一個字: 打字根後按空白鍵出第一個候選字，或用選字鍵選字，傳回是否成功送出
+    def typeChar(self, char, code):
+        reply = {}
+        for key in code:
+            reply = self.press(key)
+        if reply.get("commitString") == char:
+            return True
+        if not (self.ts.showCandidates and self.getCandidateIndex(char) > 0):
+            reply = self.press(" ")
+            if reply.get("commitString") == char:
+                return True
+        index = self.getCandidateIndex(char)
+        if self.ts.showCandidates and 0 <= index < len(self.ts.cinbase.candselKeys):
+            reply = self.press(self.ts.cinbase.candselKeys[index])
+            if reply.get("commitString") == char:
+                return True
+        if self.ts.isComposing() or self.ts.showCandidates:
+            self.press(keyCode=VK_ESCAPE)
+        return False
+
+    def getCandidateIndex(self, char):
+        candidates = list(self.ts.candidateList)
+        return candidates.index(char) if char in candidates else -1
+
+
+# 由碼表反查每個字的字根，優先選擇候選字排在前面及較短的字根
+def buildReverseMap(cin, maxIndex):
+    codes = {}
+    for code, candidates in cin.chardefs.items():
+        if not all(charToKeyCode(key) for key in code):
+            continue
+        for index, candidate in enumerate(candidates[:maxIndex]):
+            rank = (index, len(code), code)
+            if not candidate in codes or rank < codes[candidate]:
+                codes[candidate] = rank
+    return dict([(char, rank[2]) for char, rank in codes.items()])
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def createTextService(modname, clsname, selCinType=None):
+    import importlib
+    module = importlib.import_module("input_methods.%s.%s_ime" % (modname, modname))
+    textServiceClass = getattr(module, clsname)
+    CinTable = module.CinTable
+
+    def waitForTable(ts):
+        while CinTable.loading or CinTable.cin is None or not CinTable.curCinType == ts.cfg.selCinType:
+            time.sleep(0.001)
+
+    start = time.perf_counter()
+    ts = textServiceClass(Client())
+    if not os.path.exists(os.path.join(ts.jsondir, ts.cinFileList[ts.cfg.selCinType if selCinType is None else selCinType])):
+        return ts, None
+    if selCinType is not None and not selCinType == ts.cfg.selCinType:
+        # 同一個輸入法的設定共用，改變碼表後重新建立 TextService 載入新的碼表
+        waitForTable(ts)
+        ts.cfg.selCinType = selCinType
+        start = time.perf_counter()
+        ts = textServiceClass(Client())
+    waitForTable(ts)
+    loadTime = time.perf_counter() - start
+    ts.cin = CinTable.cin
+    ts.handleRequest({"method": "onActivate", "isKeyboardOpen": True, "seqNum": 0})
+    return ts, loadTime
+
+
+def benchmarkTable(modname, clsname, corpus, selCinType=None, repeat=1):
+    rssBefore = getRss()
+    ts, loadTime = createTextService(modname, clsname, selCinType)
+    rssAfter = getRss()
+    if loadTime is None:
+        return {"ime": modname, "table": ts.cinFileList[selCinType or 0], "tableCount": len(ts.cinFileList), "skipped": True}
+
+    codes = buildReverseMap(ts.cin, ts.candPerPage)
+    typist = Typist(ts)
+    typed = missed = 0
+    start = time.perf_counter()
+    for i in range(repeat):
+        for char in corpus:
+            code = codes.get(char)
+            if code is None:
+                missed += 1
+                continue
+            if typist.typeChar(char, code):
+                typed += 1
+            else:
+                missed += 1
+    elapsed = time.perf_counter() - start
+
+    latencies = typist.latencies
+    return {
+        "ime": modname,
+        "table": ts.cinFileList[ts.cfg.selCinType],
+        "tableCount": len(ts.cinFileList),
+        "skipped": False,
+        "keys": len(latencies),
+        "typed": typed,
+        "missed": missed,
+        "keysPerSec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50Ms": percentile(latencies, 0.5) * 1000,
+        "p99Ms": percentile(latencies, 0.99) * 1000,
+        "loadMs": loadTime * 1000,
+        "rssMb": rssAfter / 1048576.0 if rssAfter is not None else None,
+        "rssDeltaMb": (rssAfter - rssBefore) / 1048576.0 if rssAfter is not None and rssBefore is not None else None,
+    }
+
+
+def formatResult(result):
+    if result["skipped"]:
+        return "%-12s %-20s skipped (table not found)" % (result["ime"], result["table"])
+    rss = "%7.1f MB (%+.1f)" % (result["rssMb"], result["rssDeltaMb"]) if result["rssMb"] is not None else "n/a"
+    return "%-12s %-20s keys %6d  typed %4d  missed %4d  %8.0f keys/s  p50 %6.3f ms  p99 %6.3f ms  load %7.1f ms  rss %s" % (
+        result["ime"], result["table"], result["keys"], result["typed"], result["missed"],
+        result["keysPerSec"], result["p50Ms"], result["p99Ms"], result["loadMs"], rss)
+
+
+# pytest: 每個輸入法以預設碼表打一次文章，確認能正常出字並印出統計
+def test_benchmark_input_methods(tmp_path):
+    restore = prepareEnvironment(str(tmp_path))
+    try:
+        for modname, clsname in INPUT_METHODS:
+            result = benchmarkTable(modname, clsname, CORPUS)
+            print(formatResult(result))
+            if result["skipped"]:
+                continue
+            assert result["keys"] > 0
+            assert result["typed"] > 0
+    finally:
+        restore()
+
+
+def main():
+    args = sys.argv[1:]
+    allTables = "--all-tables" in args
+    repeat = 1
+    if "--repeat" in args:
+        repeat = int(args[args.index("--repeat") + 1])
+        del args[args.index("--repeat"):args.index("--repeat") + 2]
+    args = [arg for arg in args if not arg.startswith("--")]
+
+    corpus = CORPUS
+    if args:
+        with io.open(args[0], "r", encoding="utf8") as f:
+            corpus = f.read()
+
+    workdir = tempfile.mkdtemp(prefix="pime-bench-")
+    restore = prepareEnvironment(workdir)
+    try:
+        for modname, clsname in INPUT_METHODS:
+            if allTables:
+                selCinType = 0
+                while True:
+                    result = benchmarkTable(modname, clsname, corpus, selCinType, repeat)
+                    print(formatResult(result))
+                    selCinType += 1
+                    if selCinType >= result["tableCount"]:
+                        break
+            else:
+                print(formatResult(benchmarkTable(modname, clsname, corpus, None, repeat)))
+    finally:
+        restore()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()